@@ -0,0 +1,905 @@
+"""
+Queries and payload builders of the bank API, shared by app.py (Flask) and
+asgi_app.py (Quart).
+
+Nothing here depends on a web framework or on an application instance, and
+importing the module has no side effect: no app, cache, listener or thread
+is created (app.py builds those in create_app, asgi_app.py at import).
+"""
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+from typing import Iterable, List, Optional, Tuple
+import base64
+import json
+import math
+import string
+
+from sqlalchemy import and_, func, or_, update
+from sqlmodel import select
+
+import export
+from chat import ChatContext, reply as chat_reply
+from score_jobs import score_is_current
+from scoring import STATUS_TEXTS, score_clients
+from sketches import RunningStats, TDigest
+from shards import global_id_column, row_global_id
+from tables__projet import (
+    ALL_CLIENTS,
+    Transaction,
+    Client,
+    CategoryRollup,
+    ClientScore,
+    ClientSummary,
+    DailyRollup,
+    MonthlyRollup,
+    YearlyRollup,
+    Administrateur,
+    CreditRequest,
+    client_balance,
+)
+
+
+def _parse_date(arg_name: str, args) -> Tuple[Optional[date], Optional[str]]:
+    """
+    Try to parse a YYYY-MM-DD query parameter (of the `args` mapping) into a date.
+    Returns (value, error_message).
+    """
+    raw = args.get(arg_name)
+    if not raw:
+        return None, None
+    try:
+        return datetime.strptime(raw, "%Y-%m-%d").date(), None
+    except (TypeError, ValueError):
+        return None, f"Invalid {arg_name} format. Use YYYY-MM-DD."
+
+
+def _apply_common_filters(stmt, start: Optional[date], end: Optional[date], client_id: Optional[int]):
+    if start:
+        stmt = stmt.where(Transaction.date_transaction >= start)
+    if end:
+        stmt = stmt.where(Transaction.date_transaction <= end)
+    if client_id:
+        stmt = stmt.where(Transaction.id_client == client_id)
+    return stmt
+
+
+def _next_month(d: date) -> date:
+    if d.month == 12:
+        return date(d.year + 1, 1, 1)
+    return date(d.year, d.month + 1, 1)
+
+
+def _year_month(d: date) -> int:
+    return d.year * 100 + d.month
+
+
+def _split_month_range(
+    start: Optional[date], end: Optional[date]
+) -> Tuple[bool, Optional[date], Optional[date], List[Tuple[date, date]]]:
+    """
+    Split [start, end] into whole calendar months, answered from the monthly
+    rollups, and partial months at the edges, answered from finer-grained rows.
+    Returns (use_rollup, first_full_month, last_full_month, raw_ranges); the
+    month bounds are first-of-month dates, None meaning unbounded.
+    """
+    first_full = None
+    last_full = None
+    raw_ranges = []
+    if start:
+        first_full = start if start.day == 1 else _next_month(start)
+    if end:
+        if _next_month(end) - timedelta(days=1) == end:
+            last_full = end.replace(day=1)
+        else:
+            last_full = (end.replace(day=1) - timedelta(days=1)).replace(day=1)
+    if first_full and last_full and first_full > last_full:
+        # No complete month inside the range
+        return False, None, None, [(start, end)]
+    if start and start != first_full:
+        raw_ranges.append((start, first_full - timedelta(days=1)))
+    if end and end.replace(day=1) != last_full:
+        raw_ranges.append((end.replace(day=1), end))
+    return True, first_full, last_full, raw_ranges
+
+
+# Rows fetched from the cursor at a time when paging or streaming admin lists
+STREAM_CHUNK_SIZE = 500
+
+
+def _encode_cursor(*values) -> str:
+    """Opaque keyset cursor: url-safe base64 of the JSON sort key of the last row."""
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(raw: Optional[str]) -> Tuple[Optional[list], Optional[str]]:
+    """Returns (values, error_message)."""
+    if not raw:
+        return None, None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(raw + "=" * (-len(raw) % 4)))
+    except ValueError:
+        return None, "Invalid cursor."
+    if not isinstance(values, list):
+        return None, "Invalid cursor."
+    return values, None
+
+
+def _parse_page_size(args, config) -> Tuple[Optional[int], Optional[str]]:
+    """
+    Page size for keyset pagination, from the `limit` query parameter (of
+    `args`; default and maximum from the app `config`).
+    Returns (None, None) when neither `limit` nor `cursor` is given, i.e. the
+    caller asked for the whole list.
+    """
+    if "limit" not in args and "cursor" not in args:
+        return None, None
+    limit = args.get("limit", config["PAGE_SIZE"], type=int)
+    if limit is None or limit < 1:
+        return None, "Invalid limit. Use a positive integer."
+    return min(limit, config["MAX_PAGE_SIZE"]), None
+
+
+def _client_payloads(rows) -> List[dict]:
+    """
+    Admin list entries of a chunk of _admin_clients_stmt rows: the stored
+    ClientScore columns when they are current, else scored here from the
+    ClientSummary totals (see score_jobs.py).
+    """
+    stale = [i for i, row in enumerate(rows) if not score_is_current(row[0].solde_initial, *row[5:8])]
+    fresh = score_clients(
+        [rows[i][0].solde_initial for i in stale],
+        [rows[i][8] or 0.0 for i in stale],
+        [rows[i][9] or 0.0 for i in stale],
+        [rows[i][10] or 0 for i in stale],
+    )
+    rescored = {
+        i: (fresh["monthlyIncome"][k], fresh["creditScore"][k], fresh["endebtmentRatio"][k], fresh["status"][k])
+        for k, i in enumerate(stale)
+    }
+
+    result = []
+    for i, (client, *score, _, _, _, _, _, _, balance) in enumerate(rows):
+        monthly_income, credit_score, endebtment_ratio, status = rescored.get(i, score)
+        status = str(status)
+        result.append(
+            {
+                "id": client.client_id,
+                "firstName": client.prenom,
+                "lastName": client.nom,
+                "email": client.email,
+                "phone": client.telephone,
+                "birthdate": client.date_naissance.isoformat(),
+                "profession": client.profession,
+                "address": client.adresse,
+                "accountNumber": client.numero_compte,
+                "iban": client.IBAN,
+                "rib": client.RIB,
+                "cardNumber": client.numero_carte[-4:],
+                "cardExpiry": client.date_expiration,
+                "currentBalance": float(balance),
+                "monthlyIncome": float(monthly_income),
+                "creditScore": round(float(credit_score), 1),
+                "endebtmentRatio": round(float(endebtment_ratio), 2),
+                "status": status,
+                "statusText": STATUS_TEXTS[status],
+                "avatar": f"{client.prenom[0]}{client.nom[0]}".upper(),
+            }
+        )
+    return result
+
+
+def _credit_request_payloads(rows) -> List[dict]:
+    """Build the admin payload for a chunk of (CreditRequest, prenom, nom) rows."""
+    return [
+        {
+            "id": row_global_id(r.id, r.client_id),
+            "clientId": r.client_id,
+            "clientName": f"{prenom} {nom}" if nom is not None else f"Client {r.client_id}",
+            "amount": float(r.amount),
+            "duration": int(r.duration_months),
+            "purpose": r.purpose,
+            "status": r.status,
+            "created_at": r.created_at.isoformat()
+        }
+        for r, prenom, nom in rows
+    ]
+
+
+def _client_profile_stmt(client_id: int):
+    """(Client, current balance) of one client, for _client_profile."""
+    return select(Client, client_balance()).where(Client.client_id == client_id)
+
+
+def _balance_stmt(client_id: int, as_of: Optional[date]):
+    return select(client_balance(as_of)).where(Client.client_id == client_id)
+
+
+def _client_profile(client: Client, balance: float) -> dict:
+    return {
+        "id": client.client_id,
+        "firstName": client.prenom,
+        "lastName": client.nom,
+        "email": client.email,
+        "phone": client.telephone,
+        "profession": client.profession,
+        "address": client.adresse,
+        "accountNumber": client.numero_compte,
+        "balance": float(balance),
+        "avatar": f"{client.prenom[0]}{client.nom[0]}".upper()
+    }
+
+
+def _admin_profile(admin: Administrateur) -> dict:
+    return {
+        "id": admin.id,
+        "name": admin.nom,
+        "email": admin.email,
+        "role": admin.role,
+        "avatar": "AD"
+    }
+
+
+def _monthly_statements(start: Optional[date], end: Optional[date], client_id: Optional[int]) -> list:
+    """
+    Statements whose (year, month, income, expense_signed, net) rows add up
+    to the monthly comparison: MonthlyRollup for whole months, DailyRollup for
+    the partial months at the edges. They are independent and may run concurrently.
+    """
+    use_rollup, first_full, last_full, raw_ranges = _split_month_range(start, end)
+    statements = []
+
+    # Whole months: sum the pre-aggregated rollup rows
+    if use_rollup:
+        period = MonthlyRollup.year * 100 + MonthlyRollup.month
+        rollup_stmt = select(
+            MonthlyRollup.year,
+            MonthlyRollup.month,
+            func.sum(MonthlyRollup.income),
+            func.sum(MonthlyRollup.expense),
+            func.sum(MonthlyRollup.net),
+        ).group_by(MonthlyRollup.year, MonthlyRollup.month)
+        if first_full:
+            rollup_stmt = rollup_stmt.where(period >= _year_month(first_full))
+        if last_full:
+            rollup_stmt = rollup_stmt.where(period <= _year_month(last_full))
+        if client_id:
+            rollup_stmt = rollup_stmt.where(MonthlyRollup.client_id == client_id)
+        statements.append(rollup_stmt)
+
+    # Partial months at the filter edges: sum the daily rollup rows of those days
+    for range_start, range_end in raw_ranges:
+        stmt = (
+            select(
+                DailyRollup.year_month // 100,
+                DailyRollup.year_month % 100,
+                func.sum(DailyRollup.income),
+                func.sum(DailyRollup.expense),
+                func.sum(DailyRollup.net),
+            )
+            .where(DailyRollup.day.between(range_start, range_end))
+            .group_by(DailyRollup.year_month)
+        )
+        if client_id:
+            stmt = stmt.where(DailyRollup.client_id == client_id)
+        statements.append(stmt)
+    return statements
+
+
+def _monthly_payload(row_groups: Iterable[Iterable[tuple]]) -> List[dict]:
+    """Merge the rows of the _monthly_statements results into the API payload."""
+    totals = {}
+    for rows in row_groups:
+        for year, month, income, expense_signed, net in rows:
+            acc = totals.setdefault((int(year), int(month)), [0.0, 0.0, 0.0])
+            acc[0] += float(income or 0)
+            acc[1] += float(expense_signed or 0)
+            acc[2] += float(net or 0)
+
+    data = []
+    for (year, month), (income, expense_signed, net) in sorted(totals.items()):
+        data.append(
+            {
+                "year": year,
+                "month": month,
+                "income": income,
+                "expense": abs(expense_signed),
+                "net": net,
+                "label": f"{year}-{month:02d}",
+            }
+        )
+    return data
+
+
+TIMESERIES_GRANULARITIES = ("day", "week", "month", "quarter", "year")
+
+# Rollup tiers able to answer each granularity, coarsest first: the tier's
+# periods must nest in the buckets (ISO weeks straddle months, so only days)
+_TIMESERIES_TIERS = {
+    "day": ("day",),
+    "week": ("day",),
+    "month": ("month", "day"),
+    "quarter": ("month", "day"),
+    "year": ("year", "month", "day"),
+}
+
+
+def _period_start(d: date, granularity: str) -> date:
+    """First day of the `granularity` bucket holding d (ISO weeks start on Monday)."""
+    if granularity == "day":
+        return d
+    if granularity == "week":
+        return d - timedelta(days=d.weekday())
+    if granularity == "month":
+        return d.replace(day=1)
+    if granularity == "quarter":
+        return date(d.year, 3 * ((d.month - 1) // 3) + 1, 1)
+    return date(d.year, 1, 1)
+
+
+def _next_period(d: date, granularity: str) -> date:
+    """First day of the bucket after the one starting on d."""
+    if granularity == "day":
+        return d + timedelta(days=1)
+    if granularity == "week":
+        return d + timedelta(days=7)
+    if granularity == "month":
+        return _next_month(d)
+    if granularity == "quarter":
+        return _next_month(_next_month(_next_month(d)))
+    return date(d.year + 1, 1, 1)
+
+
+def _period_label(d: date, granularity: str) -> str:
+    if granularity == "day":
+        return d.isoformat()
+    if granularity == "week":
+        year, week, _ = d.isocalendar()
+        return f"{year}-W{week:02d}"
+    if granularity == "month":
+        return f"{d.year}-{d.month:02d}"
+    if granularity == "quarter":
+        return f"{d.year}-Q{(d.month - 1) // 3 + 1}"
+    return str(d.year)
+
+
+def _split_periods(lo: Optional[date], hi: Optional[date], unit: str):
+    """
+    Split the half-open range [lo, hi) (None: unbounded) into whole `unit`
+    periods and the partial periods at the edges.
+    Returns (whole, edges): whole is a (lo, hi) range of whole periods or
+    None, edges the list of (lo, hi) ranges left over.
+    """
+    whole_lo = lo
+    if lo is not None and lo != _period_start(lo, unit):
+        whole_lo = _next_period(_period_start(lo, unit), unit)
+    whole_hi = None if hi is None else _period_start(hi, unit)
+    if whole_lo is not None and whole_hi is not None and whole_lo >= whole_hi:
+        return None, [(lo, hi)]
+    edges = []
+    if lo is not None and lo < whole_lo:
+        edges.append((lo, whole_lo))
+    if hi is not None and whole_hi < hi:
+        edges.append((whole_hi, hi))
+    return (whole_lo, whole_hi), edges
+
+
+def _tier_stmt(tier: str, lo: Optional[date], hi: Optional[date], client_id: Optional[int]):
+    """(period columns..., income, expense_signed, net, count) per period of one rollup tier over [lo, hi)."""
+    if tier == "year":
+        model, columns = YearlyRollup, (YearlyRollup.year,)
+        period, bounds = YearlyRollup.year, [d and d.year for d in (lo, hi)]
+    elif tier == "month":
+        model, columns = MonthlyRollup, (MonthlyRollup.year, MonthlyRollup.month)
+        period, bounds = MonthlyRollup.year * 100 + MonthlyRollup.month, [d and _year_month(d) for d in (lo, hi)]
+    else:
+        model, columns = DailyRollup, (DailyRollup.day,)
+        period, bounds = DailyRollup.day, [lo, hi]
+    stmt = select(
+        *columns,
+        func.sum(model.income),
+        func.sum(model.expense),
+        func.sum(model.net),
+        func.sum(model.transaction_count),
+    ).group_by(*columns)
+    if bounds[0] is not None:
+        stmt = stmt.where(period >= bounds[0])
+    if bounds[1] is not None:
+        stmt = stmt.where(period < bounds[1])
+    if client_id:
+        stmt = stmt.where(model.client_id == client_id)
+    return stmt
+
+
+def _timeseries_statements(
+    granularity: str, start: Optional[date], end: Optional[date], client_id: Optional[int]
+) -> List[Tuple[str, object]]:
+    """
+    (tier, statement) pairs whose rows add up to the time series: whole years
+    from YearlyRollup, whole months from MonthlyRollup and the remaining days
+    from DailyRollup, using only the tiers whose periods nest in the buckets.
+    They are independent and may run concurrently.
+    """
+    statements = []
+    ranges = [(start, end + timedelta(days=1) if end else None)]
+    for tier in _TIMESERIES_TIERS[granularity]:
+        if tier == "day":
+            statements += [("day", _tier_stmt("day", lo, hi, client_id)) for lo, hi in ranges]
+            break
+        remaining = []
+        for lo, hi in ranges:
+            whole, edges = _split_periods(lo, hi, tier)
+            if whole is not None:
+                statements.append((tier, _tier_stmt(tier, whole[0], whole[1], client_id)))
+            remaining += edges
+        ranges = remaining
+    return statements
+
+
+def _timeseries_payload(
+    tier_row_groups: Iterable[Tuple[str, Iterable[tuple]]],
+    granularity: str,
+    start: Optional[date],
+    end: Optional[date],
+    max_buckets: int,
+) -> List[dict]:
+    """
+    Sum the _timeseries_statements rows into `granularity` buckets, filling
+    the gaps from start (or the first bucket with data) to end (or the last
+    one) with zero buckets. Raises ValueError past max_buckets buckets.
+    """
+    totals = {}
+    for tier, rows in tier_row_groups:
+        for row in rows:
+            if tier == "year":
+                d, values = date(int(row[0]), 1, 1), row[1:]
+            elif tier == "month":
+                d, values = date(int(row[0]), int(row[1]), 1), row[2:]
+            else:
+                d, values = row[0], row[1:]
+            acc = totals.setdefault(_period_start(d, granularity), [0.0, 0.0, 0.0, 0])
+            for i, value in enumerate(values):
+                acc[i] += value or 0
+
+    first = _period_start(start, granularity) if start else min(totals, default=None)
+    last = _period_start(end, granularity) if end else max(totals, default=None)
+    data = []
+    bucket = first
+    while first is not None and last is not None and bucket <= last:
+        if len(data) == max_buckets:
+            raise ValueError(f"More than {max_buckets} buckets: use a coarser granularity or a shorter range.")
+        income, expense_signed, net, count = totals.get(bucket, (0.0, 0.0, 0.0, 0))
+        next_bucket = _next_period(bucket, granularity)
+        data.append(
+            {
+                "label": _period_label(bucket, granularity),
+                "start": bucket.isoformat(),
+                "end": (next_bucket - timedelta(days=1)).isoformat(),
+                "income": float(income),
+                "expense": abs(float(expense_signed)),
+                "net": float(net),
+                "count": int(count),
+            }
+        )
+        bucket = next_bucket
+    return data
+
+
+def _category_statements(start: Optional[date], end: Optional[date], client_id: Optional[int]):
+    """
+    Returns (rollup_stmt, raw_stmts) for the per-category statistics:
+    CategoryRollup rows (year_month, categorie, count, income, expense_signed,
+    sum_squares, digest) for the whole months, or None, and raw
+    (year_month, categorie, montant) rows for the partial months at the edges.
+    They are independent and may run concurrently.
+    """
+    use_rollup, first_full, last_full, raw_ranges = _split_month_range(start, end)
+
+    rollup_stmt = None
+    if use_rollup:
+        rollup_stmt = select(
+            CategoryRollup.year_month,
+            CategoryRollup.categorie,
+            CategoryRollup.transaction_count,
+            CategoryRollup.income,
+            CategoryRollup.expense,
+            CategoryRollup.amount_sum_squares,
+            CategoryRollup.digest,
+        ).where(CategoryRollup.client_id == (client_id or ALL_CLIENTS))
+        if first_full:
+            rollup_stmt = rollup_stmt.where(CategoryRollup.year_month >= _year_month(first_full))
+        if last_full:
+            rollup_stmt = rollup_stmt.where(CategoryRollup.year_month <= _year_month(last_full))
+
+    raw_stmts = []
+    for range_start, range_end in raw_ranges:
+        stmt = select(Transaction.year_month, Transaction.categorie, Transaction.montant).where(
+            Transaction.year_month.between(_year_month(range_start), _year_month(range_end))
+        )
+        raw_stmts.append(_apply_common_filters(stmt, range_start, range_end, client_id))
+    return rollup_stmt, raw_stmts
+
+
+def _category_parts(rollup_rows, raw_row_groups) -> List[tuple]:
+    """
+    (year_month, categorie, income, expense_signed, RunningStats) for every
+    rollup row and every edge month x category of the _category_statements results.
+    """
+    parts = [
+        (year_month, categorie, income, expense,
+         RunningStats(count, income + expense, sum_squares, TDigest.from_bytes(digest)))
+        for year_month, categorie, count, income, expense, sum_squares, digest in rollup_rows
+    ]
+    amounts = {}
+    for rows in raw_row_groups:
+        for year_month, categorie, montant in rows:
+            amounts.setdefault((year_month, categorie), []).append(float(montant or 0))
+    for (year_month, categorie), values in amounts.items():
+        parts.append((
+            year_month,
+            categorie,
+            sum(v for v in values if v >= 0),
+            sum(v for v in values if v < 0),
+            RunningStats().update(values),
+        ))
+    return parts
+
+
+def _category_payload(parts) -> List[dict]:
+    """Per category: average, count, variance / stddev and sketch percentiles, merged over the months."""
+    per_category = {}
+    for _, categorie, _, _, stats in parts:
+        if categorie in per_category:
+            per_category[categorie].merge(stats)
+        else:
+            per_category[categorie] = stats
+
+    data = []
+    for categorie, stats in sorted(per_category.items()):
+        data.append(
+            {
+                "category": categorie,
+                "average": stats.mean,
+                "count": stats.count,
+                "variance": stats.variance,
+                "stddev": math.sqrt(stats.variance),
+                "median": stats.digest.quantile(0.5),
+                "p90": stats.digest.quantile(0.9),
+            }
+        )
+    return data
+
+
+def _dashboard_payload(parts) -> dict:
+    """
+    Monthly comparison and category statistics (same shapes as their endpoints)
+    from one set of _category_parts: the dashboard reads the data once for both.
+    """
+    return {
+        "monthly": _monthly_payload(
+            [[(year_month // 100, year_month % 100, income, expense_signed, income + expense_signed)
+              for year_month, _, income, expense_signed, _ in parts]]
+        ),
+        "categoryAverages": _category_payload(parts),
+    }
+
+
+def _admin_clients_stmt(cursor: Optional[list], limit: Optional[int]):
+    """Admin client list ordered by client_id, after the keyset cursor. Raises ValueError on a bad cursor."""
+    # Scores come precomputed from ClientScore; the ClientSummary totals are
+    # only scored for the rows whose stored score is stale. Both are
+    # outer-joined so clients without transactions or score still appear.
+    stmt = (
+        select(
+            Client,
+            ClientScore.monthly_income,
+            ClientScore.credit_score,
+            ClientScore.endebtment_ratio,
+            ClientScore.status,
+            # Inputs the score was computed from, then the current ones
+            ClientScore.solde_initial,
+            ClientScore.transaction_count,
+            ClientSummary.transaction_count,
+            ClientSummary.income_total,
+            ClientSummary.expense_total,
+            ClientSummary.month_count,
+            client_balance(),
+        )
+        .outerjoin(ClientScore, ClientScore.client_id == Client.client_id)
+        .outerjoin(ClientSummary, ClientSummary.client_id == Client.client_id)
+        .order_by(Client.client_id)
+    )
+    if cursor:
+        try:
+            stmt = stmt.where(Client.client_id > int(cursor[0]))
+        except (IndexError, TypeError) as exc:
+            raise ValueError("Invalid cursor.") from exc
+    if limit is not None:
+        stmt = stmt.limit(limit + 1)
+    return stmt
+
+
+def _admin_client_cursor(row) -> str:
+    return _encode_cursor(row[0].client_id)
+
+
+def _credit_requests_stmt(conditions: list, cursor: Optional[list], limit: Optional[int]):
+    """
+    Credit requests matching `conditions` (see _credit_filter_conditions), newest
+    first, after the keyset cursor (on the global id, see shards.py). Raises
+    ValueError on a bad cursor.
+    """
+    # Client names through a join projecting only the needed columns
+    stmt = (
+        select(CreditRequest, Client.prenom, Client.nom)
+        .outerjoin(Client, Client.client_id == CreditRequest.client_id)
+        .where(*conditions)
+        .order_by(CreditRequest.created_at.desc(), CreditRequest.id.desc())
+    )
+    if cursor:
+        try:
+            after_created = datetime.fromisoformat(cursor[0])
+            after_id = int(cursor[1])
+        except (IndexError, TypeError) as exc:
+            raise ValueError("Invalid cursor.") from exc
+        stmt = stmt.where(
+            or_(
+                CreditRequest.created_at < after_created,
+                and_(
+                    CreditRequest.created_at == after_created,
+                    global_id_column(CreditRequest.id, CreditRequest.client_id) < after_id,
+                ),
+            )
+        )
+    if limit is not None:
+        stmt = stmt.limit(limit + 1)
+    return stmt
+
+
+def _credit_request_sort_key(row):
+    return row[0].created_at, row_global_id(row[0].id, row[0].client_id)
+
+
+def _credit_request_cursor(row) -> str:
+    created_at, gid = _credit_request_sort_key(row)
+    return _encode_cursor(created_at.isoformat(), gid)
+
+
+def _credit_scores_stmt(client_id: Optional[int]):
+    stmt = (
+        select(
+            Client.client_id,
+            Client.solde_initial,
+            ClientSummary.income_total,
+            ClientSummary.expense_total,
+            ClientSummary.month_count,
+        )
+        .outerjoin(ClientSummary, ClientSummary.client_id == Client.client_id)
+        .order_by(Client.client_id)
+    )
+    if client_id:
+        stmt = stmt.where(Client.client_id == client_id)
+    return stmt
+
+
+def _credit_scores_payload(rows) -> List[dict]:
+    scores = score_clients(
+        [row[1] for row in rows],
+        [row[2] or 0.0 for row in rows],
+        [row[3] or 0.0 for row in rows],
+        [row[4] or 0 for row in rows],
+    )
+
+    data = []
+    for i, row in enumerate(rows):
+        status = str(scores["status"][i])
+        data.append({
+            "id": row[0],
+            "monthlyIncome": float(scores["monthlyIncome"][i]),
+            "creditScore": round(float(scores["creditScore"][i]), 1),
+            "endebtmentRatio": round(float(scores["endebtmentRatio"][i]), 2),
+            "status": status,
+            "statusText": STATUS_TEXTS[status],
+        })
+    return data
+
+
+def _credit_request_payload(credit: CreditRequest) -> dict:
+    return {
+        "id": row_global_id(credit.id, credit.client_id),
+        "clientId": credit.client_id,
+        "amount": credit.amount,
+        "duration": credit.duration_months,
+        "purpose": credit.purpose,
+        "status": credit.status,
+        "created_at": credit.created_at.isoformat()
+    }
+
+
+def _export_request(args) -> Tuple[Optional[str], bool, object, Optional[str]]:
+    """
+    Parse a transaction export request: format (csv, jsonl or parquet), gzip
+    (1) and the start / end / client_id filters. Returns (format, gzip, stmt, error_message).
+    """
+    fmt = args.get("format") or "csv"
+    if fmt not in export.FORMATS:
+        return None, False, None, f"Invalid format. Use one of: {', '.join(export.FORMATS)}."
+    start, err = _parse_date("start", args)
+    if err:
+        return None, False, None, err
+    end, err = _parse_date("end", args)
+    if err:
+        return None, False, None, err
+    client_id_raw = args.get("client_id")
+    try:
+        client_id = int(client_id_raw) if client_id_raw else None
+    except ValueError:
+        return None, False, None, "Invalid client_id."
+    stmt = _apply_common_filters(export.transactions_stmt(), start, end, client_id)
+    return fmt, args.get("gzip") == "1", stmt, None
+
+
+CREDIT_STATUSES = ("pending", "approved", "rejected")
+
+
+# SQLite's lower() (the name indexes) folds A-Z only: the name filter is folded
+# the same way, so "Élise" finds "Élise" but "élise" doesn't
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def _credit_filter_conditions(filters) -> Tuple[list, Optional[str]]:
+    """
+    WHERE clauses on CreditRequest for a filter mapping (query args or JSON):
+    status, client_id, start / end (YYYY-MM-DD, on created_at, inclusive),
+    min_amount / max_amount, name (prefix of the client's first or last name,
+    case-insensitive). Returns (conditions, error_message).
+    """
+    conditions = []
+    status = filters.get("status")
+    if status:
+        if status not in CREDIT_STATUSES:
+            return [], f"Invalid status. Use one of: {', '.join(CREDIT_STATUSES)}."
+        conditions.append(CreditRequest.status == status)
+    client_id = filters.get("client_id")
+    if client_id:
+        try:
+            conditions.append(CreditRequest.client_id == int(client_id))
+        except (TypeError, ValueError):
+            return [], "Invalid client_id."
+    start, err = _parse_date("start", filters)
+    if err:
+        return [], err
+    if start:
+        conditions.append(CreditRequest.created_at >= datetime.combine(start, datetime.min.time()))
+    end, err = _parse_date("end", filters)
+    if err:
+        return [], err
+    if end:
+        conditions.append(CreditRequest.created_at < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+    amounts = {}
+    for arg_name in ("min_amount", "max_amount"):
+        raw = filters.get(arg_name)
+        if raw not in (None, ""):
+            try:
+                amounts[arg_name] = float(raw)
+            except (TypeError, ValueError):
+                return [], f"Invalid {arg_name}."
+    if "min_amount" in amounts:
+        conditions.append(CreditRequest.amount >= amounts["min_amount"])
+    if "max_amount" in amounts:
+        conditions.append(CreditRequest.amount <= amounts["max_amount"])
+    name = str(filters.get("name") or "").strip().translate(_ASCII_LOWER)
+    if name:
+        # Range on lower(nom) / lower(prenom) rather than LIKE, so the expression indexes apply
+        upper = name + "\uffff"
+        matching_clients = select(Client.client_id).where(
+            or_(
+                and_(func.lower(Client.nom) >= name, func.lower(Client.nom) < upper),
+                and_(func.lower(Client.prenom) >= name, func.lower(Client.prenom) < upper),
+            )
+        )
+        conditions.append(CreditRequest.client_id.in_(matching_clients))
+    return conditions, None
+
+
+def _bulk_status_request(data: dict, max_ids: int) -> Tuple[Optional[str], Optional[List[int]], list, Optional[str]]:
+    """
+    Parse a bulk status body: {"status", "ids": [...]} or {"status", "filter": {...}}.
+    Returns (status, ids, conditions, error_message); ids is None for a filter.
+    """
+    if not isinstance(data, dict):
+        return None, None, [], "Expected a JSON object"
+    status = (data.get("status") or "").lower()
+    if status not in ("approved", "rejected"):
+        return None, None, [], "Status must be 'approved' or 'rejected'"
+    ids, filters = data.get("ids"), data.get("filter")
+    if (ids is None) == (filters is None):
+        return None, None, [], "Provide either ids or filter"
+
+    if ids is not None:
+        if not isinstance(ids, list) or not ids or not all(type(i) is int for i in ids):
+            return None, None, [], "ids must be a non-empty list of integers"
+        if len(ids) > max_ids:
+            return None, None, [], f"At most {max_ids} ids per request"
+        ids = list(dict.fromkeys(ids))
+        return status, ids, [CreditRequest.id.in_(ids)], None
+
+    if not isinstance(filters, dict) or not filters:
+        return None, None, [], "filter must be a non-empty object"
+    conditions, err = _credit_filter_conditions(filters)
+    return status, None, conditions, err
+
+
+def _bulk_status_update_stmt(status: str, conditions: list):
+    """One set-based UPDATE of the matching requests not already in `status`, returning their ids."""
+    return (
+        update(CreditRequest)
+        .where(*conditions, CreditRequest.status != status)
+        .values(status=status)
+        .returning(CreditRequest.id)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _bulk_status_outcomes(ids: Optional[List[int]], found: Iterable[int], updated: Iterable[int],
+                          failed: Iterable[int] = ()) -> List[dict]:
+    """
+    Per-id outcome: "updated", "unchanged" (already in that status), "not_found",
+    or "failed" (its shard's transaction rolled back).
+    """
+    updated = set(updated)
+    if ids is None:
+        return [{"id": req_id, "outcome": "updated"} for req_id in sorted(updated)]
+    found, failed = set(found), set(failed)
+    return [
+        {
+            "id": req_id,
+            "outcome": (
+                "failed" if req_id in failed
+                else "updated" if req_id in updated
+                else "unchanged" if req_id in found
+                else "not_found"
+            ),
+        }
+        for req_id in ids
+    ]
+
+
+def _chat_context_stmt(client_id: int):
+    # Current balance plus average transaction and count from the client's running summary
+    return (
+        select(client_balance(), ClientSummary.amount_total, ClientSummary.transaction_count)
+        .outerjoin(ClientSummary, ClientSummary.client_id == Client.client_id)
+        .where(Client.client_id == client_id)
+    )
+
+
+def _chat_context(row) -> ChatContext:
+    balance, amount_total, transaction_count = row
+    if transaction_count:
+        return ChatContext(float(balance), amount_total / transaction_count, transaction_count)
+    return ChatContext(float(balance), 0, 0)
+
+
+def _chat_batch_replies(items, context: ChatContext) -> Tuple[Optional[List[dict]], Optional[str]]:
+    """
+    Replies for a batch of messages, each a string or a {"message", "creditAmount",
+    "creditDuration"} object. Returns (replies, error_message).
+    """
+    if not isinstance(items, list) or not items:
+        return None, "messages must be a non-empty list"
+    replies = []
+    for item in items:
+        if isinstance(item, str):
+            item = {"message": item}
+        elif not isinstance(item, dict):
+            return None, "Each message must be a string or an object"
+        message = str(item.get("message") or "").strip()
+        if not message:
+            replies.append({"error": "Message is required"})
+            continue
+        replies.append({
+            "response": chat_reply(message, item.get("creditAmount"), item.get("creditDuration"), context)
+        })
+    return replies, None
@@ -1,55 +1,309 @@
 from __future__ import annotations
 
-from datetime import date, datetime
-from typing import Optional, Tuple
-import hashlib
-
-from flask import Flask, jsonify, request, send_from_directory, session
-from sqlalchemy import case, func
+from typing import Callable, Iterable, Iterator, List, Optional
+import inspect
+import os
+import threading
+
+from flask import (
+    Flask,
+    Response,
+    current_app,
+    g,
+    jsonify,
+    request,
+    send_from_directory,
+    session,
+    stream_with_context,
+)
+from sqlalchemy.exc import SQLAlchemyError
 from sqlmodel import Session, select
 
+import export
+from api_helpers import (
+    STREAM_CHUNK_SIZE,
+    TIMESERIES_GRANULARITIES,
+    _admin_client_cursor,
+    _admin_clients_stmt,
+    _admin_profile,
+    _balance_stmt,
+    _bulk_status_outcomes,
+    _bulk_status_request,
+    _bulk_status_update_stmt,
+    _category_parts,
+    _category_payload,
+    _category_statements,
+    _chat_batch_replies,
+    _chat_context,
+    _chat_context_stmt,
+    _client_payloads,
+    _client_profile,
+    _client_profile_stmt,
+    _credit_filter_conditions,
+    _credit_request_cursor,
+    _credit_request_payload,
+    _credit_request_payloads,
+    _credit_request_sort_key,
+    _credit_requests_stmt,
+    _credit_scores_payload,
+    _credit_scores_stmt,
+    _dashboard_payload,
+    _decode_cursor,
+    _export_request,
+    _monthly_payload,
+    _monthly_statements,
+    _parse_date,
+    _parse_page_size,
+    _timeseries_payload,
+    _timeseries_statements,
+)
+from cache import CachedResponse, ResponseCache
+from columnar import ColumnarStore
+from chat import ChatContext, ChatContextCache, reply as chat_reply
+from metrics import RequestMetrics, instrument_engine
+from score_jobs import ScoreScheduler, score_status_payload, score_status_stmt
+from sessions import MemorySessionStore, ServerSideSessionInterface, SessionStore
+from shards import fan_out, global_id, ids_by_shard, merge_sorted, split_global_id
+from storage import start_wal_checkpointer
 from tables__projet import (
-    Transaction,
+    SHARD_COUNT,
     Client,
     Administrateur,
     Connexion_client,
     CreditRequest,
+    add_profile_listener,
+    add_transaction_listener,
     create_db_and_table,
     engine,
+    engine_for,
     hash_mdp,
+    shard_engines,
+    shard_of,
 )
 
 
-def _parse_date(arg_name: str) -> Tuple[Optional[date], Optional[str]]:
+def _query_shards(statements: list, client_id: Optional[int]) -> List[List[list]]:
     """
-    Try to parse a YYYY-MM-DD query parameter into a date.
-    Returns (value, error_message).
+    Rows of each statement, per shard: from the client's shard only when
+    client_id is given, else from every shard concurrently (the payload
+    builders add the groups up).
     """
-    raw = request.args.get(arg_name)
-    if not raw:
-        return None, None
-    try:
-        return datetime.strptime(raw, "%Y-%m-%d").date(), None
-    except ValueError:
-        return None, f"Invalid {arg_name} format. Use YYYY-MM-DD."
-
-
-def _apply_common_filters(stmt, start: Optional[date], end: Optional[date], client_id: Optional[int]):
-    if start:
-        stmt = stmt.where(Transaction.date_transaction >= start)
-    if end:
-        stmt = stmt.where(Transaction.date_transaction <= end)
-    if client_id:
-        stmt = stmt.where(Transaction.id_client == client_id)
-    return stmt
+    def run(shard: int) -> List[list]:
+        with Session(shard_engines[shard]) as db_session:
+            return [db_session.exec(stmt).all() for stmt in statements]
 
+    if client_id:
+        return [run(shard_of(client_id))]
+    return fan_out(run)
+
+
+def _iter_payloads(
+    stmt,
+    limit: Optional[int],
+    build_payloads: Callable[[list], List[dict]],
+    cursor_of: Callable[[object], str],
+    page: dict,
+    sort_key: Optional[Callable[[object], object]] = None,
+    reverse: bool = False,
+) -> Iterator[dict]:
+    """
+    Execute stmt and yield payload dicts chunk by chunk as rows come off the cursor.
+    When paginating, stmt must fetch limit + 1 rows; once exhausted,
+    page["nextCursor"] holds the cursor after the last yielded row, or None.
+    With several shards, stmt runs on each of them and the rows are merged
+    on sort_key (stmt's ORDER BY) before the page is cut.
+    """
+    page["nextCursor"] = None
+    if SHARD_COUNT > 1:
+        def read(shard: int) -> list:
+            with Session(shard_engines[shard]) as db_session:
+                return db_session.exec(stmt).all()
+
+        rows = merge_sorted(fan_out(read), sort_key, reverse, None if limit is None else limit + 1)
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            page["nextCursor"] = cursor_of(rows[-1])
+        for i in range(0, len(rows), STREAM_CHUNK_SIZE):
+            yield from build_payloads(rows[i:i + STREAM_CHUNK_SIZE])
+        return
+
+    remaining = limit
+    last_row = None
+    with Session(engine) as db_session:
+        result = db_session.exec(stmt.execution_options(yield_per=STREAM_CHUNK_SIZE))
+        for chunk in result.partitions():
+            if remaining is not None and len(chunk) > remaining:
+                # Rows past the page size: the page is full and more rows follow
+                chunk = chunk[:remaining]
+                if chunk:
+                    last_row = chunk[-1]
+                    yield from build_payloads(chunk)
+                page["nextCursor"] = cursor_of(last_row)
+                return
+            if remaining is not None:
+                remaining -= len(chunk)
+            last_row = chunk[-1]
+            yield from build_payloads(chunk)
+
+
+def _list_response(key: str, payloads: Iterable[dict], page: dict, paginated: bool, stream: bool):
+    """
+    Either a regular JSON response, or (stream=True) a JSON document written
+    element by element while the payload generator is consumed.
+    """
+    if not stream:
+        body = {key: list(payloads)}
+        if paginated:
+            body["nextCursor"] = page["nextCursor"]
+        return jsonify(body)
+
+    def generate():
+        dumps = current_app.json.dumps
+        yield f'{{"{key}": ['
+        for i, item in enumerate(payloads):
+            yield ("," if i else "") + dumps(item)
+        yield "]"
+        if paginated:
+            yield ', "nextCursor": ' + dumps(page["nextCursor"])
+        yield "}"
+
+    return Response(stream_with_context(generate()), mimetype="application/json")
+
+
+def _etag_response(entry: CachedResponse):
+    """Serve a cached JSON body, or an empty 304 when If-None-Match already has this version."""
+    if entry.etag in request.if_none_match:
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.response_class(entry.body, mimetype="application/json")
+    response.set_etag(entry.etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def _columnar_credit_score_rows(store: ColumnarStore, client_id: Optional[int]) -> list:
+    """_credit_scores_stmt's rows, with the per-client totals summed from the columnar store."""
+    stmt = select(Client.client_id, Client.solde_initial).order_by(Client.client_id)
+    if client_id:
+        stmt = stmt.where(Client.client_id == client_id)
+    clients = merge_sorted((groups[0] for groups in _query_shards([stmt], client_id)), key=lambda row: row[0])
+    totals = store.client_totals()
+    rows = []
+    for cid, solde_initial in clients:
+        if cid < len(totals.count) and totals.count[cid]:
+            rows.append((cid, solde_initial, float(totals.income[cid]), float(totals.expense[cid]),
+                         int(totals.months[cid])))
+        else:
+            rows.append((cid, solde_initial, None, None, None))
+    return rows
 
-def create_app() -> Flask:
-    # Ensure tables exist before serving.
-    create_db_and_table()
 
+def create_app(session_store: Optional[SessionStore] = None) -> Flask:
+    """
+    Build the Flask app without touching the database: the schema is checked
+    (and migrated if needed) by the first request of each process, so
+    importing this module stays cheap in every worker.
+    """
     app = Flask(__name__)
     app.secret_key = "finaily-gc-secret-key-2025"  # Change in production
+    # Server-side sessions; the store also caches the logged-in user's profile
+    session_store = session_store or MemorySessionStore()
+    app.session_interface = ServerSideSessionInterface(session_store)
+    add_profile_listener(session_store.drop_profiles)
+    add_transaction_listener(session_store.drop_client_profiles)
+    # Keyset pagination of the admin lists (?limit=&cursor=)
+    app.config["PAGE_SIZE"] = 100
+    app.config["MAX_PAGE_SIZE"] = 1000
+    # Ids accepted by one bulk credit-request status update (SQLite binds each one)
+    app.config["BULK_STATUS_MAX_IDS"] = 10_000
+    # Longest time series answered (buckets, gaps included)
+    app.config["TIMESERIES_MAX_BUCKETS"] = 5000
+    # Rows read from the database per chunk of a transaction export
+    app.config["EXPORT_CHUNK_SIZE"] = export.DEFAULT_CHUNK_SIZE
+    # Analytics response cache, invalidated per client on transaction writes
+    app.config["RESPONSE_CACHE_SIZE"] = 256
+    app.config["RESPONSE_CACHE_TTL"] = 300  # seconds; bounds staleness from other processes' writes
+
+    response_cache = ResponseCache(app.config["RESPONSE_CACHE_SIZE"], app.config["RESPONSE_CACHE_TTL"])
+    app.extensions["response_cache"] = response_cache
+    add_transaction_listener(response_cache.invalidate_clients)
+
+    # Optional in-memory columnar copy of the transactions for the analytics
+    # (columnar.py), loaded with the storage by the first request
+    app.config["COLUMNAR_CACHE"] = os.environ.get("BANK_COLUMNAR_CACHE") == "1"
+    app.config["COLUMNAR_CACHE_TTL"] = 300  # seconds; bounds staleness from other processes' writes
+    app.extensions["columnar"] = None
+
+    # Per-client chat context (balance, average transaction, count)
+    app.config["CHAT_CONTEXT_CACHE_SIZE"] = 10_000
+    app.config["CHAT_BATCH_MAX"] = 100
+
+    chat_contexts = ChatContextCache(app.config["CHAT_CONTEXT_CACHE_SIZE"])
+    app.extensions["chat_contexts"] = chat_contexts
+    add_transaction_listener(chat_contexts.invalidate_clients)
+    add_profile_listener(chat_contexts.invalidate_profiles)
+
+    # Per-request SQL statement count, DB time and wall time (GET /metrics);
+    # requests running more statements than this are logged with their SQL
+    app.config["METRICS_QUERY_THRESHOLD"] = 20
+
+    request_metrics = RequestMetrics(app.config["METRICS_QUERY_THRESHOLD"])
+    app.extensions["request_metrics"] = request_metrics
+    for bind in shard_engines:
+        instrument_engine(bind)
+
+    # Background rescoring into ClientScore (score_jobs.py), started with the
+    # storage; 0 disables it (the admin list then scores stale rows inline)
+    app.config["SCORE_REFRESH_INTERVAL"] = 300  # seconds between full rescoring jobs
+
+    score_scheduler = ScoreScheduler(app.config["SCORE_REFRESH_INTERVAL"])
+    app.extensions["score_scheduler"] = score_scheduler
+
+    storage_lock = threading.Lock()
+    storage_ready = threading.Event()
+
+    @app.before_request
+    def prepare_storage():
+        if storage_ready.is_set():
+            return
+        with storage_lock:
+            if not storage_ready.is_set():
+                # Ensure tables exist before serving (one PRAGMA read per shard when current)
+                create_db_and_table()
+                # Periodic WAL checkpoints when the storage profile uses WAL (one per
+                # shard file), started in the serving process rather than before a fork
+                for bind in shard_engines:
+                    start_wal_checkpointer(bind)
+                if current_app.config["COLUMNAR_CACHE"]:
+                    store = ColumnarStore(current_app.config["COLUMNAR_CACHE_TTL"])
+                    store.refresh()
+                    add_transaction_listener(store.mark_stale)
+                    current_app.extensions["columnar"] = store
+                if current_app.config["SCORE_REFRESH_INTERVAL"]:
+                    score_scheduler.interval = current_app.config["SCORE_REFRESH_INTERVAL"]
+                    # Only a running scheduler collects changed clients (else its backlog would only grow)
+                    add_transaction_listener(score_scheduler.mark_clients)
+                    add_profile_listener(score_scheduler.mark_profiles)
+                    score_scheduler.start()
+                storage_ready.set()
+
+    @app.before_request
+    def start_request_metrics():
+        request_metrics.query_threshold = current_app.config["METRICS_QUERY_THRESHOLD"]
+        g.request_stats = request_metrics.start()
+
+    @app.after_request
+    def finish_request_metrics(response):
+        stats = g.pop("request_stats", None)
+        if stats is not None:
+            route = request.url_rule.rule if request.url_rule else "<unmatched>"
+            method, status = request.method, response.status_code
+            if inspect.isgenerator(response.response):
+                # Streamed body: recorded once it has been sent, so the streamed queries are included
+                response.call_on_close(lambda: request_metrics.finish(stats, route, method, status))
+            else:
+                request_metrics.finish(stats, route, method, status)
+        return response
 
     @app.get("/api/transactions/monthly")
     def monthly_comparison():
@@ -61,91 +315,150 @@ def create_app() -> Flask:
           - end (YYYY-MM-DD)
           - client_id (int)
         """
-        start, err = _parse_date("start")
+        start, err = _parse_date("start", request.args)
         if err:
             return jsonify({"error": err}), 400
-        end, err = _parse_date("end")
+        end, err = _parse_date("end", request.args)
         if err:
             return jsonify({"error": err}), 400
 
         client_id_raw = request.args.get("client_id")
         client_id = int(client_id_raw) if client_id_raw else None
 
-        stmt = (
-            select(
-                func.strftime("%Y", Transaction.date_transaction).label("year"),
-                func.strftime("%m", Transaction.date_transaction).label("month"),
-                func.sum(
-                    case((Transaction.montant >= 0, Transaction.montant), else_=0)
-                ).label("income"),
-                func.sum(
-                    case((Transaction.montant < 0, Transaction.montant), else_=0)
-                ).label("expense_signed"),
-                func.sum(Transaction.montant).label("net"),
-            )
-            .group_by("year", "month")
-            .order_by("year", "month")
-        )
-        stmt = _apply_common_filters(stmt, start, end, client_id)
-
-        with Session(engine) as session:
-            rows = session.exec(stmt).all()
-
-        data = []
-        for year, month, income, expense_signed, net in rows:
-            data.append(
-                {
-                    "year": int(year),
-                    "month": int(month),
-                    "income": float(income or 0),
-                    "expense": float(abs(expense_signed or 0)),
-                    "net": float(net or 0),
-                    "label": f"{year}-{str(month).zfill(2)}",
-                }
+        cache_key = ("monthly", start, end, client_id or None)
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            return _etag_response(cached)
+        generation = response_cache.generation
+
+        store = current_app.extensions["columnar"]
+        if store is not None:
+            row_groups = [store.monthly_rows(start, end, client_id)]
+        else:
+            shard_row_groups = _query_shards(_monthly_statements(start, end, client_id), client_id)
+            row_groups = [rows for groups in shard_row_groups for rows in groups]
+
+        body = jsonify({"data": _monthly_payload(row_groups)}).get_data()
+        return _etag_response(response_cache.put(cache_key, client_id or None, body, generation))
+
+    @app.get("/api/transactions/timeseries")
+    def transactions_timeseries():
+        """
+        Income / expense / net / count per day, ISO week, month, quarter or year,
+        summed from the coarsest rollup tiers that fit, with zero buckets for gaps.
+        Optional query params:
+          - granularity: day, week, month (default), quarter or year
+          - start (YYYY-MM-DD)
+          - end (YYYY-MM-DD)
+          - client_id (int)
+        """
+        granularity = request.args.get("granularity") or "month"
+        if granularity not in TIMESERIES_GRANULARITIES:
+            return jsonify({"error": f"Invalid granularity. Use one of: {', '.join(TIMESERIES_GRANULARITIES)}."}), 400
+        start, err = _parse_date("start", request.args)
+        if err:
+            return jsonify({"error": err}), 400
+        end, err = _parse_date("end", request.args)
+        if err:
+            return jsonify({"error": err}), 400
+
+        client_id_raw = request.args.get("client_id")
+        client_id = int(client_id_raw) if client_id_raw else None
+
+        cache_key = ("timeseries", granularity, start, end, client_id or None)
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            return _etag_response(cached)
+        generation = response_cache.generation
+
+        statements = _timeseries_statements(granularity, start, end, client_id)
+        tier_row_groups = [
+            (tier, rows)
+            for groups in _query_shards([stmt for _, stmt in statements], client_id)
+            for (tier, _), rows in zip(statements, groups)
+        ]
+        try:
+            data = _timeseries_payload(
+                tier_row_groups, granularity, start, end, current_app.config["TIMESERIES_MAX_BUCKETS"]
             )
-        return jsonify({"data": data})
+        except ValueError as exc:
+            return jsonify({"error": str(exc)}), 400
+
+        body = jsonify({"granularity": granularity, "data": data}).get_data()
+        return _etag_response(response_cache.put(cache_key, client_id or None, body, generation))
 
     @app.get("/api/transactions/category-averages")
     def category_averages():
         """
-        Average amount per category.
+        Per category: average, count, variance / stddev, median and p90 of the
+        amounts, merged from the stored monthly CategoryRollup statistics.
         Optional query params:
           - start (YYYY-MM-DD)
           - end (YYYY-MM-DD)
           - client_id (int)
         """
-        start, err = _parse_date("start")
+        start, err = _parse_date("start", request.args)
         if err:
             return jsonify({"error": err}), 400
-        end, err = _parse_date("end")
+        end, err = _parse_date("end", request.args)
         if err:
             return jsonify({"error": err}), 400
 
         client_id_raw = request.args.get("client_id")
         client_id = int(client_id_raw) if client_id_raw else None
 
-        stmt = (
-            select(
-                Transaction.categorie,
-                func.avg(Transaction.montant).label("average_amount"),
-            )
-            .group_by(Transaction.categorie)
-            .order_by(Transaction.categorie)
-        )
-        stmt = _apply_common_filters(stmt, start, end, client_id)
-
-        with Session(engine) as session:
-            rows = session.exec(stmt).all()
-
-        data = []
-        for categorie, average in rows:
-            data.append(
-                {
-                    "category": categorie,
-                    "average": float(average or 0),
-                }
-            )
-        return jsonify({"data": data})
+        cache_key = ("category-averages", start, end, client_id or None)
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            return _etag_response(cached)
+        generation = response_cache.generation
+
+        store = current_app.extensions["columnar"]
+        if store is not None:
+            parts = store.category_parts(start, end, client_id)
+        else:
+            rollup_stmt, raw_stmts = _category_statements(start, end, client_id)
+            # Bank-wide rollup rows are per-shard partials; _category_payload merges them
+            rollup_rows, raw_row_groups = [], []
+            statements = [rollup_stmt, *raw_stmts] if rollup_stmt is not None else raw_stmts
+            for groups in _query_shards(statements, client_id):
+                if rollup_stmt is not None:
+                    rollup_rows += groups[0]
+                    groups = groups[1:]
+                raw_row_groups += groups
+            parts = _category_parts(rollup_rows, raw_row_groups)
+
+        body = jsonify({"data": _category_payload(parts)}).get_data()
+        return _etag_response(response_cache.put(cache_key, client_id or None, body, generation))
+
+    @app.get("/api/balance")
+    def get_balance():
+        """
+        Balance of a client at the end of a day: its latest snapshot up to that
+        day plus the daily rollups after it. Clients get their own; admins pass client_id.
+        Optional query params:
+          - as_of (YYYY-MM-DD): current balance when omitted
+        """
+        user_type = session.get("user_type")
+        user_id = session.get("user_id")
+        if not user_type or not user_id:
+            return jsonify({"error": "Not authenticated"}), 401
+        if user_type == "client":
+            client_id = user_id
+        else:
+            client_id = request.args.get("client_id", type=int)
+            if not client_id:
+                return jsonify({"error": "client_id is required"}), 400
+
+        as_of, err = _parse_date("as_of", request.args)
+        if err:
+            return jsonify({"error": err}), 400
+
+        with Session(engine_for(client_id)) as db_session:
+            balance = db_session.exec(_balance_stmt(client_id, as_of)).first()
+        if balance is None:
+            return jsonify({"error": "Client not found"}), 404
+        return jsonify({"clientId": client_id, "asOf": as_of.isoformat() if as_of else None, "balance": float(balance)})
 
     @app.post("/api/auth/login/client")
     def login_client():
@@ -159,41 +472,34 @@ def create_app() -> Flask:
 
         hashed_password = hash_mdp(password)
 
-        with Session(engine) as db_session:
-            # Find client login credentials
-            login_stmt = select(Connexion_client).where(Connexion_client.email == email)
-            login_cred = db_session.exec(login_stmt).first()
-
-            if not login_cred or login_cred.mot_de_passe != hashed_password:
-                return jsonify({"error": "Invalid email or password"}), 401
-
-            # Get full client information
-            client_stmt = select(Client).where(Client.client_id == login_cred.client_id)
-            client = db_session.exec(client_stmt).first()
-
-            if not client:
-                return jsonify({"error": "Client not found"}), 404
-
-            # Set session
-            session["user_type"] = "client"
-            session["user_id"] = client.client_id
-            session["email"] = client.email
-
-            return jsonify({
-                "success": True,
-                "user": {
-                    "id": client.client_id,
-                    "firstName": client.prenom,
-                    "lastName": client.nom,
-                    "email": client.email,
-                    "phone": client.telephone,
-                    "profession": client.profession,
-                    "address": client.adresse,
-                    "accountNumber": client.numero_compte,
-                    "balance": float(client.solde_initial),
-                    "avatar": f"{client.prenom[0]}{client.nom[0]}".upper()
-                }
-            })
+        def find_login(shard: int):
+            # Find client login credentials, and the client (on the same shard)
+            with Session(shard_engines[shard]) as db_session:
+                login_stmt = select(Connexion_client).where(Connexion_client.email == email)
+                login_cred = db_session.exec(login_stmt).first()
+                if not login_cred:
+                    return None
+                return login_cred, db_session.exec(_client_profile_stmt(login_cred.client_id)).first()
+
+        # The email doesn't tell the shard: ask all of them
+        matches = [match for match in fan_out(find_login) if match]
+        if not matches or matches[0][0].mot_de_passe != hashed_password:
+            return jsonify({"error": "Invalid email or password"}), 401
+        login_cred, row = matches[0]
+
+        # Get full client information
+        if not row:
+            return jsonify({"error": "Client not found"}), 404
+        client = row[0]
+
+        # Set session, under a fresh id (an id planted before login is dropped)
+        session.regenerate()
+        session["user_type"] = "client"
+        session["user_id"] = client.client_id
+        session["email"] = client.email
+        session.profile = _client_profile(*row)
+
+        return jsonify({"success": True, "user": session.profile})
 
     @app.post("/api/auth/login/admin")
     def login_admin():
@@ -214,21 +520,14 @@ def create_app() -> Flask:
             if not admin or admin.mot_de_passe != hashed_password:
                 return jsonify({"error": "Invalid email or password"}), 401
 
-            # Set session
+            # Set session, under a fresh id (an id planted before login is dropped)
+            session.regenerate()
             session["user_type"] = "admin"
             session["user_id"] = admin.id
             session["email"] = admin.email
+            session.profile = _admin_profile(admin)
 
-            return jsonify({
-                "success": True,
-                "user": {
-                    "id": admin.id,
-                    "name": admin.nom,
-                    "email": admin.email,
-                    "role": admin.role,
-                    "avatar": "AD"
-                }
-            })
+            return jsonify({"success": True, "user": session.profile})
 
     @app.post("/api/auth/logout")
     def logout():
@@ -245,29 +544,19 @@ def create_app() -> Flask:
         if not user_type or not user_id:
             return jsonify({"error": "Not authenticated"}), 401
 
-        with Session(engine) as db_session:
+        # Profile cached in the session store since login (dropped when the row or its transactions change)
+        if session.profile is not None:
+            return jsonify({"userType": user_type, "user": session.profile})
+
+        with Session(engine_for(user_id) if user_type == "client" else engine) as db_session:
             if user_type == "client":
-                client_stmt = select(Client).where(Client.client_id == user_id)
-                client = db_session.exec(client_stmt).first()
-                if not client:
+                row = db_session.exec(_client_profile_stmt(user_id)).first()
+                if not row:
                     session.clear()
                     return jsonify({"error": "Client not found"}), 404
 
-                return jsonify({
-                    "userType": "client",
-                    "user": {
-                        "id": client.client_id,
-                        "firstName": client.prenom,
-                        "lastName": client.nom,
-                        "email": client.email,
-                        "phone": client.telephone,
-                        "profession": client.profession,
-                        "address": client.adresse,
-                        "accountNumber": client.numero_compte,
-                        "balance": float(client.solde_initial),
-                        "avatar": f"{client.prenom[0]}{client.nom[0]}".upper()
-                    }
-                })
+                session.profile = _client_profile(*row)
+                return jsonify({"userType": "client", "user": session.profile})
             else:  # admin
                 admin_stmt = select(Administrateur).where(Administrateur.id == user_id)
                 admin = db_session.exec(admin_stmt).first()
@@ -275,16 +564,75 @@ def create_app() -> Flask:
                     session.clear()
                     return jsonify({"error": "Admin not found"}), 404
 
-                return jsonify({
-                    "userType": "admin",
-                    "user": {
-                        "id": admin.id,
-                        "name": admin.nom,
-                        "email": admin.email,
-                        "role": admin.role,
-                        "avatar": "AD"
-                    }
-                })
+                session.profile = _admin_profile(admin)
+                return jsonify({"userType": "admin", "user": session.profile})
+
+    @app.get("/api/dashboard")
+    def dashboard():
+        """
+        Everything the dashboard shows in one request and one DB session: the
+        current user, the monthly comparison and the category statistics of a client.
+        Clients get their own data; admins pass client_id.
+        Optional query params: start, end (YYYY-MM-DD)
+        """
+        user_type = session.get("user_type")
+        user_id = session.get("user_id")
+        if not user_type or not user_id:
+            return jsonify({"error": "Not authenticated"}), 401
+        if user_type == "client":
+            client_id = user_id
+        else:
+            client_id = request.args.get("client_id", type=int)
+            if not client_id:
+                return jsonify({"error": "client_id is required"}), 400
+
+        start, err = _parse_date("start", request.args)
+        if err:
+            return jsonify({"error": err}), 400
+        end, err = _parse_date("end", request.args)
+        if err:
+            return jsonify({"error": err}), 400
+
+        def load_profile(db_session):
+            if user_type == "client":
+                row = db_session.exec(_client_profile_stmt(user_id)).first()
+                return _client_profile(*row) if row else None
+            user = db_session.get(Administrateur, user_id)
+            return _admin_profile(user) if user else None
+
+        cache_key = ("dashboard", start, end, client_id)
+        analytics = response_cache.get(cache_key)
+        bind = engine_for(client_id)
+        # Administrators live on the main file: when the client is on another
+        # shard, their profile is read first, in a session of its own
+        if session.profile is None and user_type == "admin" and bind is not engine:
+            with Session(engine) as admin_session:
+                session.profile = load_profile(admin_session)
+            if session.profile is None:
+                session.clear()
+                return jsonify({"error": "User not found"}), 404
+        with Session(bind) as db_session:
+            if session.profile is None:
+                session.profile = load_profile(db_session)
+                if session.profile is None:
+                    session.clear()
+                    return jsonify({"error": "User not found"}), 404
+            if analytics is None:
+                generation = response_cache.generation
+                rollup_stmt, raw_stmts = _category_statements(start, end, client_id)
+                rollup_rows = db_session.exec(rollup_stmt).all() if rollup_stmt is not None else []
+                raw_row_groups = [db_session.exec(stmt).all() for stmt in raw_stmts]
+                body = jsonify(_dashboard_payload(_category_parts(rollup_rows, raw_row_groups))).get_data()
+                analytics = response_cache.put(cache_key, client_id, body, generation)
+
+        # The cached analytics JSON is spliced in as is
+        dumps = current_app.json.dumps
+        body = (
+            f'{{"userType": {dumps(user_type)}, "user": {dumps(session.profile)}, "analytics": '.encode()
+            + analytics.body.strip()
+            + b"}"
+        )
+        return Response(body, mimetype="application/json")
 
     @app.post("/api/credit-request")
     def submit_credit_request():
@@ -303,7 +651,7 @@ def create_app() -> Flask:
         if not amount or not duration or not purpose:
             return jsonify({"error": "Amount, duration, and purpose are required"}), 400
 
-        with Session(engine) as db_session:
+        with Session(engine_for(user_id)) as db_session:
             credit = CreditRequest(
                 client_id=user_id,
                 amount=float(amount),
@@ -318,17 +666,23 @@ def create_app() -> Flask:
             return jsonify({
                 "success": True,
                 "message": "Credit request submitted successfully",
-                "request": {
-                    "id": credit.id,
-                    "clientId": credit.client_id,
-                    "amount": credit.amount,
-                    "duration": credit.duration_months,
-                    "purpose": credit.purpose,
-                    "status": credit.status,
-                    "created_at": credit.created_at.isoformat()
-                }
+                "request": _credit_request_payload(credit),
             })
 
+    def _client_chat_context(client_id: int) -> Optional[ChatContext]:
+        """Chat context of the client, cached until its transactions or profile change."""
+        context = chat_contexts.get(client_id)
+        if context is not None:
+            return context
+        generation = chat_contexts.generation
+        with Session(engine_for(client_id)) as db_session:
+            row = db_session.exec(_chat_context_stmt(client_id)).first()
+        if row is None:
+            return None
+        context = _chat_context(row)
+        chat_contexts.put(client_id, context, generation)
+        return context
+
     @app.post("/api/chat/predict")
     def chat_predict():
         """AI chat endpoint for banking predictions based on credit request"""
@@ -346,98 +700,70 @@ def create_app() -> Flask:
         if not message:
             return jsonify({"error": "Message is required"}), 400
 
-        # Get client's financial data for context
-        with Session(engine) as db_session:
-            client_stmt = select(Client).where(Client.client_id == user_id)
-            client = db_session.exec(client_stmt).first()
-
-            if not client:
-                return jsonify({"error": "Client not found"}), 404
-
-            # Calculate average monthly transactions
-            trans_stmt = select(
-                func.avg(Transaction.montant).label("avg_amount"),
-                func.count(Transaction.id_transaction).label("count")
-            ).where(Transaction.id_client == user_id)
-            trans_result = db_session.exec(trans_stmt).first()
-
-            avg_transaction = float(trans_result[0] or 0) if trans_result else 0
-            transaction_count = trans_result[1] if trans_result else 0
-
-        # Simple AI-like prediction logic based on client data
-        message_lower = message.lower()
-        response = ""
-
-        if any(word in message_lower for word in ["crédit", "prêt", "loan", "credit"]):
-            if credit_amount and credit_duration:
-                monthly_payment = float(credit_amount) / int(credit_duration)
-                balance = float(client.solde_initial)
-
-                if balance > monthly_payment * 3:
-                    response = f"Basé sur votre solde actuel ({balance:,.0f} FCFA) et votre demande de crédit ({credit_amount:,.0f} FCFA sur {credit_duration} mois), votre profil semble favorable. La mensualité estimée serait d'environ {monthly_payment:,.0f} FCFA, ce qui représente un ratio d'endettement raisonnable."
-                else:
-                    response = f"Votre demande de crédit nécessite une analyse approfondie. Avec un solde de {balance:,.0f} FCFA, il serait recommandé d'augmenter votre épargne avant de contracter un crédit de {credit_amount:,.0f} FCFA."
-            else:
-                response = "Pour une analyse précise de votre demande de crédit, veuillez fournir le montant et la durée souhaités."
-        elif any(word in message_lower for word in ["solde", "balance", "compte"]):
-            response = f"Votre solde actuel est de {client.solde_initial:,.0f} FCFA. Vous avez effectué {transaction_count} transaction(s) avec une moyenne de {avg_transaction:,.0f} FCFA par transaction."
-        elif any(word in message_lower for word in ["éligibilité", "eligible", "score"]):
-            # Simple eligibility calculation
-            balance = float(client.solde_initial)
-            if balance > 1000000:
-                score = 9.0
-            elif balance > 500000:
-                score = 7.5
-            else:
-                score = 6.0
-
-            response = f"Basé sur votre profil financier, votre score d'éligibilité estimé est de {score}/10. Votre solde actuel de {balance:,.0f} FCFA et votre historique de transactions sont pris en compte dans cette évaluation."
-        else:
-            response = "Je peux vous aider avec des questions sur votre crédit, votre solde, votre éligibilité, ou d'autres aspects de vos finances. Posez-moi une question spécifique !"
+        context = _client_chat_context(user_id)
+        if context is None:
+            return jsonify({"error": "Client not found"}), 404
 
         return jsonify({
             "success": True,
-            "response": response,
-            "context": {
-                "balance": float(client.solde_initial),
-                "avgTransaction": avg_transaction,
-                "transactionCount": transaction_count
-            }
+            "response": chat_reply(message, credit_amount, credit_duration, context),
+            "context": context.as_payload(),
         })
 
+    @app.post("/api/chat/predict/batch")
+    def chat_predict_batch():
+        """Answer several chat messages in one request (same client context for all)."""
+        if session.get("user_type") != "client":
+            return jsonify({"error": "Only clients can use the chat"}), 403
+
+        items = (request.get_json(silent=True) or {}).get("messages")
+        if isinstance(items, list) and len(items) > current_app.config["CHAT_BATCH_MAX"]:
+            return jsonify({"error": f"At most {current_app.config['CHAT_BATCH_MAX']} messages per batch"}), 400
+
+        context = _client_chat_context(session.get("user_id"))
+        if context is None:
+            return jsonify({"error": "Client not found"}), 404
+
+        replies, err = _chat_batch_replies(items, context)
+        if err:
+            return jsonify({"error": err}), 400
+        return jsonify({"success": True, "responses": replies, "context": context.as_payload()})
+
     @app.get("/api/admin/credit-requests")
     def admin_credit_requests():
-        """List credit requests (optionally filtered by client_id). Admin only."""
+        """
+        Search credit requests, newest first. Admin only.
+        Optional query params:
+          - status, client_id, start / end (YYYY-MM-DD, created_at),
+            min_amount / max_amount, name (client first or last name prefix)
+          - limit (int), cursor: keyset pagination on (created_at, id)
+          - stream (1): write the JSON array while rows are read
+        """
         if session.get("user_type") != "admin":
             return jsonify({"error": "Admin authentication required"}), 403
 
-        client_id = request.args.get("client_id", type=int)
-
-        with Session(engine) as db_session:
-            stmt = select(CreditRequest)
-            if client_id:
-                stmt = stmt.where(CreditRequest.client_id == client_id)
-            stmt = stmt.order_by(CreditRequest.created_at.desc())
-            requests_list = db_session.exec(stmt).all()
-
-            # preload client mapping for names
-            clients = db_session.exec(select(Client)).all()
-            client_map = {c.client_id: c for c in clients}
-
-            data = []
-            for r in requests_list:
-                c = client_map.get(r.client_id)
-                data.append({
-                    "id": r.id,
-                    "clientId": r.client_id,
-                    "clientName": f"{c.prenom} {c.nom}" if c else f"Client {r.client_id}",
-                    "amount": float(r.amount),
-                    "duration": int(r.duration_months),
-                    "purpose": r.purpose,
-                    "status": r.status,
-                    "created_at": r.created_at.isoformat()
-                })
-        return jsonify({"requests": data})
+        conditions, err = _credit_filter_conditions(request.args)
+        if err:
+            return jsonify({"error": err}), 400
+        limit, err = _parse_page_size(request.args, current_app.config)
+        if err:
+            return jsonify({"error": err}), 400
+        cursor, err = _decode_cursor(request.args.get("cursor"))
+        if err:
+            return jsonify({"error": err}), 400
+        try:
+            stmt = _credit_requests_stmt(conditions, cursor, limit)
+        except ValueError as exc:
+            return jsonify({"error": str(exc)}), 400
+
+        page = {}
+        payloads = _iter_payloads(
+            stmt, limit, _credit_request_payloads, _credit_request_cursor, page,
+            sort_key=_credit_request_sort_key, reverse=True,
+        )
+        return _list_response(
+            "requests", payloads, page, limit is not None, request.args.get("stream") == "1"
+        )
 
     @app.post("/api/admin/credit-requests/<int:req_id>/status")
     def admin_update_credit_request(req_id: int):
@@ -450,8 +776,9 @@ def create_app() -> Flask:
         if status not in ("approved", "rejected"):
             return jsonify({"error": "Status must be 'approved' or 'rejected'"}), 400
 
-        with Session(engine) as db_session:
-            credit = db_session.get(CreditRequest, req_id)
+        shard, local_id = split_global_id(req_id)
+        with Session(shard_engines[shard]) as db_session:
+            credit = db_session.get(CreditRequest, local_id)
             if not credit:
                 return jsonify({"error": "Credit request not found"}), 404
             credit.status = status
@@ -459,143 +786,179 @@ def create_app() -> Flask:
             db_session.commit()
             db_session.refresh(credit)
 
-            return jsonify({
-                "success": True,
-                "request": {
-                    "id": credit.id,
-                    "clientId": credit.client_id,
-                    "status": credit.status,
-                    "amount": credit.amount,
-                    "duration": credit.duration_months,
-                    "purpose": credit.purpose,
-                    "created_at": credit.created_at.isoformat(),
-                }
-            })
+            return jsonify({"success": True, "request": _credit_request_payload(credit)})
+
+    @app.post("/api/admin/credit-requests/bulk-status")
+    def admin_bulk_update_credit_requests():
+        """
+        Approve or reject many credit requests, one transaction per shard. Admin only.
+        Body: {"status": "approved" | "rejected", "ids": [...]}
+           or {"status": ..., "filter": {...}} with the search filters of GET /api/admin/credit-requests
+        Not atomic across shards: each shard commits on its own, so when one
+        fails the others' updates stand; the ids of the failed shards are
+        reported "failed" (unchanged) and the response is a 500.
+        """
+        if session.get("user_type") != "admin":
+            return jsonify({"error": "Admin authentication required"}), 403
+
+        status, ids, conditions, err = _bulk_status_request(
+            request.get_json(silent=True) or {}, current_app.config["BULK_STATUS_MAX_IDS"]
+        )
+        if err:
+            return jsonify({"error": err}), 400
+
+        # One transaction per shard: ids are grouped by shard, a filter runs on every shard
+        local_ids = ids_by_shard(ids) if ids is not None else {}
+
+        def update_shard(shard: int):
+            shard_conditions = conditions
+            if ids is not None:
+                if shard not in local_ids:
+                    return [], [], None
+                shard_conditions = [CreditRequest.id.in_(local_ids[shard])]
+            try:
+                with Session(shard_engines[shard]) as db_session:
+                    found = ()
+                    if ids is not None:
+                        # Write lock first, so no other writer changes the rows
+                        # between this read and the UPDATE (one transaction)
+                        db_session.connection().exec_driver_sql("BEGIN IMMEDIATE")
+                        found = db_session.exec(select(CreditRequest.id).where(*shard_conditions)).all()
+                    updated = db_session.exec(_bulk_status_update_stmt(status, shard_conditions)).scalars().all()
+                    db_session.commit()
+            except SQLAlchemyError as exc:
+                # Rolled back on this shard only: the other shards commit regardless
+                return [], [], exc
+            return [global_id(i, shard) for i in found], [global_id(i, shard) for i in updated], None
+
+        results = fan_out(update_shard)
+        found = [gid for shard_found, _, _ in results for gid in shard_found]
+        updated = [gid for _, shard_updated, _ in results for gid in shard_updated]
+        failed_shards = {shard for shard, (_, _, exc) in enumerate(results) if exc is not None}
+        for shard in sorted(failed_shards):
+            current_app.logger.error("Bulk status update failed on shard %d: %s", shard, results[shard][2])
+        failed = [gid for gid in ids or () if split_global_id(gid)[0] in failed_shards]
+
+        body = {
+            "success": not failed_shards,
+            "status": status,
+            "updated": len(updated),
+            "results": _bulk_status_outcomes(ids, found, updated, failed),
+        }
+        if failed_shards:
+            body["error"] = (f"The update failed on {len(failed_shards)} of {SHARD_COUNT} shards; "
+                             "their requests are unchanged, the other updates were committed")
+            return jsonify(body), 500
+        return jsonify(body)
 
     @app.get("/api/admin/clients")
     def admin_list_clients():
-        """Return enriched client list for admin dashboard (with simple credit metrics)."""
+        """
+        Return enriched client list for admin dashboard (with simple credit metrics).
+        Optional query params:
+          - limit (int), cursor: keyset pagination on client_id
+          - stream (1): write the JSON array while rows are read
+        """
         # Only allow admins
         if session.get("user_type") != "admin":
             return jsonify({"error": "Admin authentication required"}), 403
 
-        with Session(engine) as db_session:
-            clients = db_session.exec(select(Client)).all()
-
-            result = []
-
-            for client in clients:
-                # Aggregate transactions for this client
-                tx_filter = Transaction.id_client == client.client_id
-
-                income_stmt = select(func.sum(Transaction.montant)).where(
-                    tx_filter, Transaction.montant > 0
-                )
-                expense_stmt = select(func.sum(Transaction.montant)).where(
-                    tx_filter, Transaction.montant < 0
-                )
-                month_count_stmt = select(
-                    func.count(
-                        func.distinct(
-                            func.strftime("%Y-%m", Transaction.date_transaction)
-                        )
-                    )
-                ).where(tx_filter)
-
-                # SQLModel's exec() on a scalar select returns the scalar directly in first()
-                income_val = db_session.exec(income_stmt).first()
-                expense_val = db_session.exec(expense_stmt).first()
-                month_count_val = db_session.exec(month_count_stmt).first()
-
-                income_total = float(income_val or 0.0)
-                expenses_signed = float(expense_val or 0.0)
-                month_count = int(month_count_val or 1)
-
-                # Simple monthly aggregates
-                avg_income = float(income_total / month_count) if income_total > 0 else 0.0
-                avg_expense = float(abs(expenses_signed) / month_count) if expenses_signed < 0 else 0.0
-
-                # Robust debt ratio heuristic (0 <= debt_ratio <= 1)
-                denom = avg_income + (float(client.solde_initial) / 12.0) + 1.0
-                debt_ratio = avg_expense / denom
-                debt_ratio = max(0.0, min(debt_ratio, 1.0))
-
-                # Continuous credit score based on balance level and debt ratio
-                balance = float(client.solde_initial)
-
-                # Balance contribution: from 0 to +4 points
-                if balance <= 0:
-                    balance_score = 0.0
-                elif balance < 250_000:
-                    balance_score = 1.0
-                elif balance < 500_000:
-                    balance_score = 2.0
-                elif balance < 1_000_000:
-                    balance_score = 3.0
-                else:
-                    balance_score = 4.0
-
-                # Debt ratio contribution: from -3 (très endetté) to +1 (peu endetté)
-                if debt_ratio > 0.8:
-                    debt_score = -3.0
-                elif debt_ratio > 0.6:
-                    debt_score = -2.0
-                elif debt_ratio > 0.45:
-                    debt_score = -1.0
-                elif debt_ratio > 0.30:
-                    debt_score = 0.0
-                else:
-                    debt_score = 1.0
-
-                # Base score + contributions, borné entre 3 et 9
-                raw_score = 5.0 + balance_score + debt_score
-                credit_score = max(3.0, min(raw_score, 9.0))
-
-                # Mapping statut plus intuitif :
-                #  - score >= 8.0  => premium (même si le taux d'endettement est un peu élevé)
-                #  - 6.5 <= score < 8.0 => conditionnel
-                #  - sinon => risque élevé
-                if credit_score >= 8.0:
-                    status = "premium"
-                    status_text = "Excellent"
-                elif credit_score >= 6.5:
-                    status = "warning"
-                    status_text = "Conditionnel"
-                else:
-                    status = "danger"
-                    status_text = "Risque élevé"
-
-                result.append(
-                    {
-                        "id": client.client_id,
-                        "firstName": client.prenom,
-                        "lastName": client.nom,
-                        "email": client.email,
-                        "phone": client.telephone,
-                        "birthdate": client.date_naissance.isoformat(),
-                        "profession": client.profession,
-                        "address": client.adresse,
-                        "accountNumber": client.numero_compte,
-                        "iban": client.IBAN,
-                        "rib": client.RIB,
-                        "cardNumber": client.numero_carte[-4:],
-                        "cardExpiry": client.date_expiration,
-                        "currentBalance": balance,
-                        "monthlyIncome": avg_income,
-                        "creditScore": round(credit_score, 1),
-                        "endebtmentRatio": round(debt_ratio, 2),
-                        "status": status,
-                        "statusText": status_text,
-                        "avatar": f"{client.prenom[0]}{client.nom[0]}".upper(),
-                    }
-                )
-
-        return jsonify({"clients": result})
+        limit, err = _parse_page_size(request.args, current_app.config)
+        if err:
+            return jsonify({"error": err}), 400
+        cursor, err = _decode_cursor(request.args.get("cursor"))
+        if err:
+            return jsonify({"error": err}), 400
+        try:
+            stmt = _admin_clients_stmt(cursor, limit)
+        except ValueError as exc:
+            return jsonify({"error": str(exc)}), 400
+
+        page = {}
+        payloads = _iter_payloads(
+            stmt, limit, _client_payloads, _admin_client_cursor, page, sort_key=lambda row: row[0].client_id
+        )
+        return _list_response(
+            "clients", payloads, page, limit is not None, request.args.get("stream") == "1"
+        )
+
+    @app.get("/api/admin/credit-scores")
+    def admin_credit_scores():
+        """Score every client (or the given client_id) in one vectorized pass. Admin only."""
+        if session.get("user_type") != "admin":
+            return jsonify({"error": "Admin authentication required"}), 403
+
+        client_id = request.args.get("client_id", type=int)
+
+        store = current_app.extensions["columnar"]
+        if store is not None:
+            rows = _columnar_credit_score_rows(store, client_id)
+        else:
+            stmt = _credit_scores_stmt(client_id)
+            rows = merge_sorted((groups[0] for groups in _query_shards([stmt], client_id)), key=lambda row: row[0])
+
+        return jsonify({"scores": _credit_scores_payload(rows)})
+
+    @app.get("/api/admin/score-jobs")
+    def admin_score_jobs():
+        """
+        Background credit scoring: last job (trigger, duration, clients), backlog
+        of clients waiting to be rescored, and how stale the stored scores are. Admin only.
+        """
+        if session.get("user_type") != "admin":
+            return jsonify({"error": "Admin authentication required"}), 403
+
+        rows = [groups[0][0] for groups in _query_shards([score_status_stmt()], None)]
+        scheduler = score_scheduler if current_app.config["SCORE_REFRESH_INTERVAL"] else None
+        return jsonify(score_status_payload(rows, scheduler))
+
+    @app.get("/api/admin/transactions/export")
+    def admin_export_transactions():
+        """
+        Stream the transactions as a file download, chunk by chunk. Admin only.
+        Optional query params:
+          - format: csv (default), jsonl or parquet
+          - gzip (1): gzip the file
+          - start / end (YYYY-MM-DD), client_id (int)
+        """
+        if session.get("user_type") != "admin":
+            return jsonify({"error": "Admin authentication required"}), 403
+
+        fmt, compress, stmt, err = _export_request(request.args)
+        if err:
+            return jsonify({"error": err}), 400
+        try:
+            encoder = export.make_encoder(fmt, compress)
+        except ValueError as exc:
+            return jsonify({"error": str(exc)}), 400
+
+        chunks = export.iter_export(
+            stmt, encoder, current_app.config["EXPORT_CHUNK_SIZE"], request.args.get("client_id", type=int)
+        )
+        response = Response(stream_with_context(chunks), mimetype=export.media_type(fmt, compress))
+        response.headers["Content-Disposition"] = f'attachment; filename="{export.file_name(fmt, compress)}"'
+        return response
+
+    @app.get("/api/admin/cache-stats")
+    def admin_cache_stats():
+        """Hit/miss/eviction counters of the analytics response cache. Admin only."""
+        if session.get("user_type") != "admin":
+            return jsonify({"error": "Admin authentication required"}), 403
+        store = current_app.extensions["columnar"]
+        return jsonify({
+            "responseCache": response_cache.stats(),
+            "columnarCache": store.stats() if store is not None else None,
+        })
 
     @app.get("/health")
     def health():
         return jsonify({"status": "ok"})
 
+    @app.get("/metrics")
+    def metrics():
+        """Prometheus-style request and SQL metrics."""
+        return Response(request_metrics.render(), mimetype="text/plain; version=0.0.4")
+
     @app.get("/")
     def index():
         return send_from_directory(".", "main.html")
@@ -608,5 +971,3 @@ app = create_app()
 
 if __name__ == "__main__":
     app.run(debug=True)
-
-
@@ -0,0 +1,733 @@
+"""
+ASGI entry point: the API of app.py as async Quart views.
+
+Route handlers await SQLite through an aiosqlite engine instead of pinning a
+worker thread on blocking queries, so slow aggregates (admin client list,
+credit scores) no longer hold up the other requests of the process. The
+independent statements of the monthly comparison run concurrently.
+
+URLs, query parameters, JSON shapes and the response cache are the same as
+app.py, and so is GET /metrics; the query and payload helpers are shared
+with it through api_helpers.py (app.py itself isn't imported). It is not
+the same server otherwise, so WSGI/ASGI load-test numbers aren't like for like:
+
+- sessions are Quart's signed cookies, not the sessions.py store: a login
+  clears the cookie session instead of issuing a new session id, and no
+  profile is cached, so GET /api/auth/current-user and the profile part of
+  /api/dashboard query the database on every call;
+- the metrics of a streamed response (export, stream=1 lists) are recorded
+  when the response is returned, before its body is produced: the rows it
+  reads and the time spent writing it are left out;
+- it serves a single database file: sharded deployments (BANK_SHARDS > 1)
+  use app.py.
+
+    uvicorn asgi_app:app --workers 1
+"""
+from __future__ import annotations
+
+import asyncio
+from typing import AsyncIterator, Callable, List, Optional
+
+from quart import (
+    Quart,
+    Response,
+    current_app,
+    g,
+    jsonify,
+    request,
+    send_from_directory,
+    session,
+)
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from api_helpers import (
+    STREAM_CHUNK_SIZE,
+    TIMESERIES_GRANULARITIES,
+    _admin_client_cursor,
+    _admin_clients_stmt,
+    _admin_profile,
+    _balance_stmt,
+    _bulk_status_outcomes,
+    _bulk_status_request,
+    _bulk_status_update_stmt,
+    _category_parts,
+    _category_payload,
+    _category_statements,
+    _chat_batch_replies,
+    _chat_context,
+    _chat_context_stmt,
+    _client_payloads,
+    _client_profile,
+    _client_profile_stmt,
+    _credit_filter_conditions,
+    _credit_request_cursor,
+    _credit_request_payload,
+    _credit_request_payloads,
+    _credit_requests_stmt,
+    _credit_scores_payload,
+    _credit_scores_stmt,
+    _dashboard_payload,
+    _decode_cursor,
+    _export_request,
+    _monthly_payload,
+    _monthly_statements,
+    _parse_date,
+    _parse_page_size,
+    _timeseries_payload,
+    _timeseries_statements,
+)
+import export
+from cache import CachedResponse, ResponseCache
+from chat import ChatContext, ChatContextCache, reply as chat_reply
+from metrics import RequestMetrics, instrument_engine
+from score_jobs import ScoreScheduler, score_status_payload, score_status_stmt
+from storage import make_async_engine, start_wal_checkpointer
+from tables__projet import (
+    SHARD_COUNT,
+    Administrateur,
+    Connexion_client,
+    CreditRequest,
+    add_profile_listener,
+    add_transaction_listener,
+    create_db_and_table,
+    engine,
+    hash_mdp,
+    sqlite_file_name,
+    storage_profile,
+)
+
+async_engine = make_async_engine(sqlite_file_name, storage_profile)
+
+
+def _session() -> AsyncSession:
+    return AsyncSession(async_engine)
+
+
+async def _iter_payloads(
+    stmt,
+    limit: Optional[int],
+    build_payloads: Callable[[list], List[dict]],
+    cursor_of: Callable[[object], str],
+    page: dict,
+) -> AsyncIterator[dict]:
+    """Async version of app._iter_payloads (stmt fetches limit + 1 rows when paginating)."""
+    page["nextCursor"] = None
+    remaining = limit
+    last_row = None
+    async with _session() as db_session:
+        result = await db_session.stream(stmt.execution_options(yield_per=STREAM_CHUNK_SIZE))
+        async for chunk in result.partitions():
+            if remaining is not None and len(chunk) > remaining:
+                chunk = chunk[:remaining]
+                if chunk:
+                    last_row = chunk[-1]
+                    for payload in build_payloads(chunk):
+                        yield payload
+                page["nextCursor"] = cursor_of(last_row)
+                return
+            if remaining is not None:
+                remaining -= len(chunk)
+            last_row = chunk[-1]
+            for payload in build_payloads(chunk):
+                yield payload
+
+
+async def _list_response(key: str, payloads: AsyncIterator[dict], page: dict, paginated: bool, stream: bool):
+    if not stream:
+        body = {key: [item async for item in payloads]}
+        if paginated:
+            body["nextCursor"] = page["nextCursor"]
+        return jsonify(body)
+
+    dumps = current_app.json.dumps
+
+    async def generate():
+        yield f'{{"{key}": ['
+        i = 0
+        async for item in payloads:
+            yield ("," if i else "") + dumps(item)
+            i += 1
+        yield "]"
+        if paginated:
+            yield ', "nextCursor": ' + dumps(page["nextCursor"])
+        yield "}"
+
+    return Response(generate(), mimetype="application/json")
+
+
+def _etag_response(entry: CachedResponse):
+    if entry.etag in request.if_none_match:
+        response = current_app.response_class("", status=304)
+    else:
+        response = current_app.response_class(entry.body, mimetype="application/json")
+    response.set_etag(entry.etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+async def _fetch_all(stmt) -> list:
+    """Rows of stmt in a session of its own, so independent statements can overlap (none: [])."""
+    if stmt is None:
+        return []
+    async with _session() as db_session:
+        return (await db_session.exec(stmt)).all()
+
+
+async def _json_body() -> dict:
+    return await request.get_json(silent=True) or {}
+
+
+def create_asgi_app() -> Quart:
+    if SHARD_COUNT > 1:
+        raise RuntimeError("asgi_app serves a single database file; run app.py when BANK_SHARDS > 1")
+    app = Quart(__name__)
+    app.secret_key = "finaily-gc-secret-key-2025"  # Signed-cookie sessions (app.py keeps them server-side)
+    app.config["PAGE_SIZE"] = 100
+    app.config["MAX_PAGE_SIZE"] = 1000
+    app.config["BULK_STATUS_MAX_IDS"] = 10_000
+    app.config["TIMESERIES_MAX_BUCKETS"] = 5000
+    app.config["EXPORT_CHUNK_SIZE"] = export.DEFAULT_CHUNK_SIZE
+    app.config["RESPONSE_CACHE_SIZE"] = 256
+    app.config["RESPONSE_CACHE_TTL"] = 300
+
+    response_cache = ResponseCache(app.config["RESPONSE_CACHE_SIZE"], app.config["RESPONSE_CACHE_TTL"])
+    app.extensions["response_cache"] = response_cache
+    add_transaction_listener(response_cache.invalidate_clients)
+
+    app.config["CHAT_CONTEXT_CACHE_SIZE"] = 10_000
+    app.config["CHAT_BATCH_MAX"] = 100
+    chat_contexts = ChatContextCache(app.config["CHAT_CONTEXT_CACHE_SIZE"])
+    app.extensions["chat_contexts"] = chat_contexts
+    add_transaction_listener(chat_contexts.invalidate_clients)
+    add_profile_listener(chat_contexts.invalidate_profiles)
+
+    # Per-request SQL statement count, DB time and wall time (GET /metrics);
+    # the statements run on the async engine's sync core
+    app.config["METRICS_QUERY_THRESHOLD"] = 20
+    request_metrics = RequestMetrics(app.config["METRICS_QUERY_THRESHOLD"])
+    app.extensions["request_metrics"] = request_metrics
+    instrument_engine(async_engine.sync_engine)
+
+    app.config["SCORE_REFRESH_INTERVAL"] = 300
+    score_scheduler = ScoreScheduler(app.config["SCORE_REFRESH_INTERVAL"])
+    app.extensions["score_scheduler"] = score_scheduler
+
+    @app.before_serving
+    async def startup():
+        # Ensure tables exist before serving (one PRAGMA read when the schema is current)
+        create_db_and_table()
+        start_wal_checkpointer(engine)
+        # The scoring jobs run on the synchronous engine, in their own thread
+        if app.config["SCORE_REFRESH_INTERVAL"]:
+            score_scheduler.interval = app.config["SCORE_REFRESH_INTERVAL"]
+            add_transaction_listener(score_scheduler.mark_clients)
+            add_profile_listener(score_scheduler.mark_profiles)
+            score_scheduler.start()
+
+    @app.after_serving
+    async def shutdown():
+        score_scheduler.stop()
+        await async_engine.dispose()
+
+    @app.before_request
+    async def start_request_metrics():
+        # A coroutine, so the collector is set in the task that runs the view
+        request_metrics.query_threshold = current_app.config["METRICS_QUERY_THRESHOLD"]
+        g.request_stats = request_metrics.start()
+
+    @app.after_request
+    async def finish_request_metrics(response):
+        # Streamed bodies (export, stream=1 lists) are recorded before their rows are read
+        stats = g.pop("request_stats", None)
+        if stats is not None:
+            route = request.url_rule.rule if request.url_rule else "<unmatched>"
+            request_metrics.finish(stats, route, request.method, response.status_code)
+        return response
+
+    def _range_args():
+        start, err = _parse_date("start", request.args)
+        if err:
+            return None, None, None, err
+        end, err = _parse_date("end", request.args)
+        if err:
+            return None, None, None, err
+        client_id_raw = request.args.get("client_id")
+        return start, end, int(client_id_raw) if client_id_raw else None, None
+
+    @app.get("/api/transactions/monthly")
+    async def monthly_comparison():
+        """Monthly income/expense/net totals (see app.py)."""
+        start, end, client_id, err = _range_args()
+        if err:
+            return jsonify({"error": err}), 400
+
+        cache_key = ("monthly", start, end, client_id or None)
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            return _etag_response(cached)
+        generation = response_cache.generation
+
+        row_groups = await asyncio.gather(*(_fetch_all(stmt) for stmt in _monthly_statements(start, end, client_id)))
+        body = await jsonify({"data": _monthly_payload(row_groups)}).get_data()
+        return _etag_response(response_cache.put(cache_key, client_id or None, body, generation))
+
+    @app.get("/api/transactions/timeseries")
+    async def transactions_timeseries():
+        """Totals per day / week / month / quarter / year, gaps filled (see app.py)."""
+        granularity = request.args.get("granularity") or "month"
+        if granularity not in TIMESERIES_GRANULARITIES:
+            return jsonify({"error": f"Invalid granularity. Use one of: {', '.join(TIMESERIES_GRANULARITIES)}."}), 400
+        start, end, client_id, err = _range_args()
+        if err:
+            return jsonify({"error": err}), 400
+
+        cache_key = ("timeseries", granularity, start, end, client_id or None)
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            return _etag_response(cached)
+        generation = response_cache.generation
+
+        statements = _timeseries_statements(granularity, start, end, client_id)
+        row_groups = await asyncio.gather(*(_fetch_all(stmt) for _, stmt in statements))
+        try:
+            data = _timeseries_payload(
+                [(tier, rows) for (tier, _), rows in zip(statements, row_groups)],
+                granularity, start, end, current_app.config["TIMESERIES_MAX_BUCKETS"],
+            )
+        except ValueError as exc:
+            return jsonify({"error": str(exc)}), 400
+
+        body = await jsonify({"granularity": granularity, "data": data}).get_data()
+        return _etag_response(response_cache.put(cache_key, client_id or None, body, generation))
+
+    @app.get("/api/transactions/category-averages")
+    async def category_averages():
+        """Average amount per category (see app.py)."""
+        start, end, client_id, err = _range_args()
+        if err:
+            return jsonify({"error": err}), 400
+
+        cache_key = ("category-averages", start, end, client_id or None)
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            return _etag_response(cached)
+        generation = response_cache.generation
+
+        rollup_stmt, raw_stmts = _category_statements(start, end, client_id)
+        rollup_rows, *raw_row_groups = await asyncio.gather(
+            _fetch_all(rollup_stmt), *(_fetch_all(stmt) for stmt in raw_stmts)
+        )
+
+        body = await jsonify({"data": _category_payload(_category_parts(rollup_rows, raw_row_groups))}).get_data()
+        return _etag_response(response_cache.put(cache_key, client_id or None, body, generation))
+
+    @app.get("/api/dashboard")
+    async def dashboard():
+        """Current user, monthly comparison and category averages in one request (see app.py)."""
+        user_type = session.get("user_type")
+        user_id = session.get("user_id")
+        if not user_type or not user_id:
+            return jsonify({"error": "Not authenticated"}), 401
+        if user_type == "client":
+            client_id = user_id
+        else:
+            client_id = request.args.get("client_id", type=int)
+            if not client_id:
+                return jsonify({"error": "client_id is required"}), 400
+
+        start, err = _parse_date("start", request.args)
+        if err:
+            return jsonify({"error": err}), 400
+        end, err = _parse_date("end", request.args)
+        if err:
+            return jsonify({"error": err}), 400
+
+        cache_key = ("dashboard", start, end, client_id)
+        analytics = response_cache.get(cache_key)
+        async with _session() as db_session:
+            if user_type == "client":
+                row = (await db_session.exec(_client_profile_stmt(user_id))).first()
+                profile = _client_profile(*row) if row else None
+            else:
+                user = await db_session.get(Administrateur, user_id)
+                profile = _admin_profile(user) if user else None
+            if profile is None:
+                session.clear()
+                return jsonify({"error": "User not found"}), 404
+            if analytics is None:
+                generation = response_cache.generation
+                rollup_stmt, raw_stmts = _category_statements(start, end, client_id)
+                rollup_rows = (await db_session.exec(rollup_stmt)).all() if rollup_stmt is not None else []
+                raw_row_groups = [(await db_session.exec(stmt)).all() for stmt in raw_stmts]
+                body = await jsonify(_dashboard_payload(_category_parts(rollup_rows, raw_row_groups))).get_data()
+                analytics = response_cache.put(cache_key, client_id, body, generation)
+
+        dumps = current_app.json.dumps
+        body = (
+            f'{{"userType": {dumps(user_type)}, "user": {dumps(profile)}, "analytics": '.encode()
+            + analytics.body.strip()
+            + b"}"
+        )
+        return Response(body, mimetype="application/json")
+
+    @app.get("/api/balance")
+    async def get_balance():
+        """Balance of a client, current or at the end of as_of (see app.py)."""
+        user_type = session.get("user_type")
+        user_id = session.get("user_id")
+        if not user_type or not user_id:
+            return jsonify({"error": "Not authenticated"}), 401
+        if user_type == "client":
+            client_id = user_id
+        else:
+            client_id = request.args.get("client_id", type=int)
+            if not client_id:
+                return jsonify({"error": "client_id is required"}), 400
+
+        as_of, err = _parse_date("as_of", request.args)
+        if err:
+            return jsonify({"error": err}), 400
+
+        async with _session() as db_session:
+            balance = (await db_session.exec(_balance_stmt(client_id, as_of))).first()
+        if balance is None:
+            return jsonify({"error": "Client not found"}), 404
+        return jsonify({"clientId": client_id, "asOf": as_of.isoformat() if as_of else None, "balance": float(balance)})
+
+    @app.post("/api/auth/login/client")
+    async def login_client():
+        data = await _json_body()
+        email = data.get("email", "").strip()
+        password = data.get("password", "")
+
+        if not email or not password:
+            return jsonify({"error": "Email and password are required"}), 400
+
+        hashed_password = hash_mdp(password)
+
+        async with _session() as db_session:
+            login_cred = (await db_session.exec(
+                select(Connexion_client).where(Connexion_client.email == email)
+            )).first()
+            if not login_cred or login_cred.mot_de_passe != hashed_password:
+                return jsonify({"error": "Invalid email or password"}), 401
+
+            row = (await db_session.exec(_client_profile_stmt(login_cred.client_id))).first()
+            if not row:
+                return jsonify({"error": "Client not found"}), 404
+            client = row[0]
+
+            session.clear()   # nothing set before the login carries over
+            session["user_type"] = "client"
+            session["user_id"] = client.client_id
+            session["email"] = client.email
+            return jsonify({"success": True, "user": _client_profile(*row)})
+
+    @app.post("/api/auth/login/admin")
+    async def login_admin():
+        data = await _json_body()
+        email = data.get("email", "").strip()
+        password = data.get("password", "")
+
+        if not email or not password:
+            return jsonify({"error": "Email and password are required"}), 400
+
+        hashed_password = hash_mdp(password)
+
+        async with _session() as db_session:
+            admin = (await db_session.exec(
+                select(Administrateur).where(Administrateur.email == email)
+            )).first()
+            if not admin or admin.mot_de_passe != hashed_password:
+                return jsonify({"error": "Invalid email or password"}), 401
+
+            session.clear()   # nothing set before the login carries over
+            session["user_type"] = "admin"
+            session["user_id"] = admin.id
+            session["email"] = admin.email
+            return jsonify({"success": True, "user": _admin_profile(admin)})
+
+    @app.post("/api/auth/logout")
+    async def logout():
+        session.clear()
+        return jsonify({"success": True, "message": "Logged out successfully"})
+
+    @app.get("/api/auth/current-user")
+    async def get_current_user():
+        user_type = session.get("user_type")
+        user_id = session.get("user_id")
+
+        if not user_type or not user_id:
+            return jsonify({"error": "Not authenticated"}), 401
+
+        async with _session() as db_session:
+            if user_type == "client":
+                row = (await db_session.exec(_client_profile_stmt(user_id))).first()
+                if not row:
+                    session.clear()
+                    return jsonify({"error": "Client not found"}), 404
+                return jsonify({"userType": "client", "user": _client_profile(*row)})
+
+            admin = await db_session.get(Administrateur, user_id)
+            if not admin:
+                session.clear()
+                return jsonify({"error": "Admin not found"}), 404
+            return jsonify({"userType": "admin", "user": _admin_profile(admin)})
+
+    @app.post("/api/credit-request")
+    async def submit_credit_request():
+        user_type = session.get("user_type")
+        user_id = session.get("user_id")
+
+        if user_type != "client":
+            return jsonify({"error": "Only clients can submit credit requests"}), 403
+
+        data = await _json_body()
+        amount = data.get("amount")
+        duration = data.get("duration")
+        purpose = data.get("purpose")
+
+        if not amount or not duration or not purpose:
+            return jsonify({"error": "Amount, duration, and purpose are required"}), 400
+
+        async with _session() as db_session:
+            credit = CreditRequest(
+                client_id=user_id,
+                amount=float(amount),
+                duration_months=int(duration),
+                purpose=purpose,
+                status="pending",
+            )
+            db_session.add(credit)
+            await db_session.commit()
+            await db_session.refresh(credit)
+
+            return jsonify({
+                "success": True,
+                "message": "Credit request submitted successfully",
+                "request": _credit_request_payload(credit),
+            })
+
+    async def _client_chat_context(client_id: int) -> Optional[ChatContext]:
+        context = chat_contexts.get(client_id)
+        if context is not None:
+            return context
+        generation = chat_contexts.generation
+        async with _session() as db_session:
+            row = (await db_session.exec(_chat_context_stmt(client_id))).first()
+        if row is None:
+            return None
+        context = _chat_context(row)
+        chat_contexts.put(client_id, context, generation)
+        return context
+
+    @app.post("/api/chat/predict")
+    async def chat_predict():
+        user_type = session.get("user_type")
+        user_id = session.get("user_id")
+
+        if user_type != "client":
+            return jsonify({"error": "Only clients can use the chat"}), 403
+
+        data = await _json_body()
+        message = data.get("message", "").strip()
+        credit_amount = data.get("creditAmount")
+        credit_duration = data.get("creditDuration")
+
+        if not message:
+            return jsonify({"error": "Message is required"}), 400
+
+        context = await _client_chat_context(user_id)
+        if context is None:
+            return jsonify({"error": "Client not found"}), 404
+
+        return jsonify({
+            "success": True,
+            "response": chat_reply(message, credit_amount, credit_duration, context),
+            "context": context.as_payload(),
+        })
+
+    @app.post("/api/chat/predict/batch")
+    async def chat_predict_batch():
+        if session.get("user_type") != "client":
+            return jsonify({"error": "Only clients can use the chat"}), 403
+
+        items = (await _json_body()).get("messages")
+        if isinstance(items, list) and len(items) > current_app.config["CHAT_BATCH_MAX"]:
+            return jsonify({"error": f"At most {current_app.config['CHAT_BATCH_MAX']} messages per batch"}), 400
+
+        context = await _client_chat_context(session.get("user_id"))
+        if context is None:
+            return jsonify({"error": "Client not found"}), 404
+
+        replies, err = _chat_batch_replies(items, context)
+        if err:
+            return jsonify({"error": err}), 400
+        return jsonify({"success": True, "responses": replies, "context": context.as_payload()})
+
+    @app.get("/api/admin/credit-requests")
+    async def admin_credit_requests():
+        if session.get("user_type") != "admin":
+            return jsonify({"error": "Admin authentication required"}), 403
+
+        conditions, err = _credit_filter_conditions(request.args)
+        if err:
+            return jsonify({"error": err}), 400
+        limit, err = _parse_page_size(request.args, current_app.config)
+        if err:
+            return jsonify({"error": err}), 400
+        cursor, err = _decode_cursor(request.args.get("cursor"))
+        if err:
+            return jsonify({"error": err}), 400
+        try:
+            stmt = _credit_requests_stmt(conditions, cursor, limit)
+        except ValueError as exc:
+            return jsonify({"error": str(exc)}), 400
+
+        page = {}
+        payloads = _iter_payloads(stmt, limit, _credit_request_payloads, _credit_request_cursor, page)
+        return await _list_response(
+            "requests", payloads, page, limit is not None, request.args.get("stream") == "1"
+        )
+
+    @app.post("/api/admin/credit-requests/<int:req_id>/status")
+    async def admin_update_credit_request(req_id: int):
+        if session.get("user_type") != "admin":
+            return jsonify({"error": "Admin authentication required"}), 403
+
+        data = await _json_body()
+        status = (data.get("status") or "").lower()
+        if status not in ("approved", "rejected"):
+            return jsonify({"error": "Status must be 'approved' or 'rejected'"}), 400
+
+        async with _session() as db_session:
+            credit = await db_session.get(CreditRequest, req_id)
+            if not credit:
+                return jsonify({"error": "Credit request not found"}), 404
+            credit.status = status
+            db_session.add(credit)
+            await db_session.commit()
+            await db_session.refresh(credit)
+
+            return jsonify({"success": True, "request": _credit_request_payload(credit)})
+
+    @app.post("/api/admin/credit-requests/bulk-status")
+    async def admin_bulk_update_credit_requests():
+        if session.get("user_type") != "admin":
+            return jsonify({"error": "Admin authentication required"}), 403
+
+        status, ids, conditions, err = _bulk_status_request(
+            await _json_body(), current_app.config["BULK_STATUS_MAX_IDS"]
+        )
+        if err:
+            return jsonify({"error": err}), 400
+
+        async with _session() as db_session:
+            found = ()
+            if ids is not None:
+                # Write lock first: the read and the UPDATE see the same rows (see app.py)
+                await (await db_session.connection()).exec_driver_sql("BEGIN IMMEDIATE")
+                found = (await db_session.exec(select(CreditRequest.id).where(*conditions))).all()
+            updated = (await db_session.exec(_bulk_status_update_stmt(status, conditions))).scalars().all()
+            await db_session.commit()
+
+        return jsonify({
+            "success": True,
+            "status": status,
+            "updated": len(updated),
+            "results": _bulk_status_outcomes(ids, found, updated),
+        })
+
+    @app.get("/api/admin/clients")
+    async def admin_list_clients():
+        if session.get("user_type") != "admin":
+            return jsonify({"error": "Admin authentication required"}), 403
+
+        limit, err = _parse_page_size(request.args, current_app.config)
+        if err:
+            return jsonify({"error": err}), 400
+        cursor, err = _decode_cursor(request.args.get("cursor"))
+        if err:
+            return jsonify({"error": err}), 400
+        try:
+            stmt = _admin_clients_stmt(cursor, limit)
+        except ValueError as exc:
+            return jsonify({"error": str(exc)}), 400
+
+        page = {}
+        payloads = _iter_payloads(stmt, limit, _client_payloads, _admin_client_cursor, page)
+        return await _list_response(
+            "clients", payloads, page, limit is not None, request.args.get("stream") == "1"
+        )
+
+    @app.get("/api/admin/credit-scores")
+    async def admin_credit_scores():
+        if session.get("user_type") != "admin":
+            return jsonify({"error": "Admin authentication required"}), 403
+
+        client_id = request.args.get("client_id", type=int)
+
+        async with _session() as db_session:
+            rows = (await db_session.exec(_credit_scores_stmt(client_id))).all()
+
+        return jsonify({"scores": _credit_scores_payload(rows)})
+
+    @app.get("/api/admin/score-jobs")
+    async def admin_score_jobs():
+        if session.get("user_type") != "admin":
+            return jsonify({"error": "Admin authentication required"}), 403
+
+        rows = await _fetch_all(score_status_stmt())
+        scheduler = score_scheduler if current_app.config["SCORE_REFRESH_INTERVAL"] else None
+        return jsonify(score_status_payload(rows, scheduler))
+
+    @app.get("/api/admin/transactions/export")
+    async def admin_export_transactions():
+        if session.get("user_type") != "admin":
+            return jsonify({"error": "Admin authentication required"}), 403
+
+        fmt, compress, stmt, err = _export_request(request.args)
+        if err:
+            return jsonify({"error": err}), 400
+        try:
+            encoder = export.make_encoder(fmt, compress)
+        except ValueError as exc:
+            return jsonify({"error": str(exc)}), 400
+        chunk_size = current_app.config["EXPORT_CHUNK_SIZE"]
+
+        async def generate():
+            yield encoder.begin()
+            async with _session() as db_session:
+                result = await db_session.stream(stmt.execution_options(yield_per=chunk_size))
+                async for rows in result.partitions():
+                    yield encoder.encode(rows)
+            yield encoder.end()
+
+        response = Response(generate(), mimetype=export.media_type(fmt, compress))
+        response.headers["Content-Disposition"] = f'attachment; filename="{export.file_name(fmt, compress)}"'
+        return response
+
+    @app.get("/api/admin/cache-stats")
+    async def admin_cache_stats():
+        if session.get("user_type") != "admin":
+            return jsonify({"error": "Admin authentication required"}), 403
+        return jsonify({"responseCache": response_cache.stats()})
+
+    @app.get("/metrics")
+    async def metrics():
+        """Prometheus-style request and SQL metrics."""
+        return Response(request_metrics.render(), mimetype="text/plain; version=0.0.4")
+
+    @app.get("/health")
+    async def health():
+        return jsonify({"status": "ok"})
+
+    @app.get("/")
+    async def index():
+        return await send_from_directory(".", "main.html")
+
+    return app
+
+
+app = create_asgi_app()
@@ -0,0 +1,382 @@
+"""
+Endpoint benchmark suite.
+
+Generates a synthetic database (see datagen.py), then calls every route of
+create_app() through the Flask test client and reports p50/p95/p99 latency
+and peak Python memory per route, plus the cold-start time of a fresh
+process to its first served request. Results are written as JSON, tagged
+with the current git commit, so runs can be compared across commits.
+
+Usage:
+    python benchmark.py --clients 1000 --transactions 100 [--requests 50]
+    python benchmark.py --skip-generate --compare benchmark_results/<previous>.json
+    python benchmark.py --skip-generate --explain
+    python benchmark.py --skip-generate --startup-only [--startup-runs 10]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def route_specs(n_clients: int):
+    """
+    One request description per route: (name, role, method, url, json body).
+    role is "admin", "client" or None (anonymous). Writes (credit request,
+    status update) are included since they are part of the served surface.
+    """
+    mid = max(1, n_clients // 2)
+    return [
+        ("GET /", None, "GET", "/", None),
+        ("GET /health", None, "GET", "/health", None),
+        ("GET /metrics", None, "GET", "/metrics", None),
+        ("POST /api/auth/login/client", None, "POST", "/api/auth/login/client",
+         {"email": f"client{mid}@example.com", "password": "1234"}),
+        ("POST /api/auth/login/admin", None, "POST", "/api/auth/login/admin",
+         {"email": "admin1@bankapp.com", "password": "0123"}),
+        ("POST /api/auth/logout", None, "POST", "/api/auth/logout", None),
+        ("GET /api/auth/current-user", "client", "GET", "/api/auth/current-user", None),
+        ("GET /api/transactions/monthly", "admin", "GET", "/api/transactions/monthly", None),
+        ("GET /api/transactions/monthly?client_id", "admin", "GET",
+         f"/api/transactions/monthly?client_id={mid}", None),
+        ("GET /api/transactions/monthly?start&end", "admin", "GET",
+         "/api/transactions/monthly?start=2024-03-15&end=2025-06-20", None),
+        ("GET /api/transactions/timeseries?granularity=day", "admin", "GET",
+         "/api/transactions/timeseries?granularity=day", None),
+        ("GET /api/transactions/timeseries?granularity=week&client_id", "admin", "GET",
+         f"/api/transactions/timeseries?granularity=week&client_id={mid}", None),
+        ("GET /api/transactions/timeseries?granularity=quarter&start&end", "admin", "GET",
+         "/api/transactions/timeseries?granularity=quarter&start=2024-03-15&end=2025-06-20", None),
+        ("GET /api/transactions/category-averages", "admin", "GET", "/api/transactions/category-averages", None),
+        ("GET /api/transactions/category-averages?client_id", "admin", "GET",
+         f"/api/transactions/category-averages?client_id={mid}", None),
+        ("GET /api/balance", "client", "GET", "/api/balance", None),
+        ("GET /api/balance?as_of", "client", "GET", "/api/balance?as_of=2024-06-15", None),
+        ("GET /api/dashboard", "client", "GET", "/api/dashboard", None),
+        ("GET /api/dashboard?client_id", "admin", "GET", f"/api/dashboard?client_id={mid}", None),
+        ("POST /api/credit-request", "client", "POST", "/api/credit-request",
+         {"amount": 500000, "duration": 12, "purpose": "Benchmark"}),
+        ("POST /api/chat/predict", "client", "POST", "/api/chat/predict",
+         {"message": "Quel est mon solde ?"}),
+        ("POST /api/chat/predict/batch", "client", "POST", "/api/chat/predict/batch",
+         {"messages": ["Quel est mon solde ?", "Mon score d'éligibilité ?", "Bonjour"] * 33}),
+        ("GET /api/admin/credit-requests", "admin", "GET", "/api/admin/credit-requests", None),
+        ("GET /api/admin/credit-requests?limit", "admin", "GET", "/api/admin/credit-requests?limit=100", None),
+        ("GET /api/admin/credit-requests?status&name&limit", "admin", "GET",
+         "/api/admin/credit-requests?status=pending&name=cl&limit=100", None),
+        ("POST /api/admin/credit-requests/<id>/status", "admin", "POST",
+         "/api/admin/credit-requests/1/status", {"status": "approved"}),
+        ("POST /api/admin/credit-requests/bulk-status", "admin", "POST",
+         "/api/admin/credit-requests/bulk-status", {"status": "approved", "ids": list(range(1, 101))}),
+        ("GET /api/admin/clients", "admin", "GET", "/api/admin/clients", None),
+        ("GET /api/admin/clients?limit", "admin", "GET", "/api/admin/clients?limit=100", None),
+        ("GET /api/admin/credit-scores", "admin", "GET", "/api/admin/credit-scores", None),
+        ("GET /api/admin/transactions/export?client_id", "admin", "GET",
+         f"/api/admin/transactions/export?client_id={mid}", None),
+        ("GET /api/admin/transactions/export?client_id&gzip", "admin", "GET",
+         f"/api/admin/transactions/export?client_id={mid}&format=jsonl&gzip=1", None),
+    ]
+
+
+def run(n_requests: int, warmup: int, n_clients: int, only=None):
+    from app import create_app
+    import datagen
+
+    app = create_app()
+    clients = {None: app.test_client(), "admin": app.test_client(), "client": app.test_client()}
+    clients["admin"].post("/api/auth/login/admin", json={"email": datagen.ADMIN_EMAIL, "password": datagen.ADMIN_PASSWORD})
+    clients["client"].post("/api/auth/login/client",
+                           json={"email": f"client{max(1, n_clients // 2)}@example.com", "password": datagen.CLIENT_PASSWORD})
+
+    specs = route_specs(n_clients)
+    covered = {url.split("?")[0].replace("/1/", "/<int:req_id>/") for _, _, _, url, _ in specs}
+    for rule in app.url_map.iter_rules():
+        if rule.endpoint != "static" and rule.rule not in covered:
+            print(f"warning: route {rule.rule} is not benchmarked")
+
+    results = {}
+    for name, role, method, url, body in specs:
+        if only and only not in name:
+            continue
+        client = clients[role]
+
+        def call():
+            response = client.open(url, method=method, json=body)
+            response.get_data()
+            if response.status_code >= 400:
+                raise RuntimeError(f"{name}: HTTP {response.status_code} {response.get_data(as_text=True)[:200]}")
+
+        for _ in range(warmup):
+            call()
+        timings = []
+        for _ in range(n_requests):
+            t0 = time.perf_counter()
+            call()
+            timings.append((time.perf_counter() - t0) * 1000)
+        timings.sort()
+
+        tracemalloc.start()
+        call()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        results[name] = {
+            "p50_ms": round(_percentile(timings, 50), 3),
+            "p95_ms": round(_percentile(timings, 95), 3),
+            "p99_ms": round(_percentile(timings, 99), 3),
+            "mean_ms": round(statistics.fmean(timings), 3),
+            "peak_kib": round(peak / 1024, 1),
+        }
+        r = results[name]
+        print(f"{name:55s} p50 {r['p50_ms']:9.2f}ms  p95 {r['p95_ms']:9.2f}ms  "
+              f"p99 {r['p99_ms']:9.2f}ms  peak {r['peak_kib']:10.1f} KiB")
+    return results
+
+
+# Runs in a fresh interpreter: wall-clock times once app.py is imported and
+# once the first request (which checks the schema) has been answered
+_STARTUP_SCRIPT = """
+import time
+import app
+imported = time.time()
+response = app.app.test_client().get("/health")
+assert response.status_code == 200, response.status_code
+print(imported, time.time())
+"""
+
+
+def startup(runs: int) -> dict:
+    """
+    Cold start, `runs` times: spawn an interpreter that imports app.py and
+    serves GET /health. Reports the p50 from spawn to the end of the imports
+    and to the first response, and of the first request alone.
+    """
+    imports, firsts, totals = [], [], []
+    for _ in range(runs):
+        spawned = time.time()
+        out = subprocess.run([sys.executable, "-c", _STARTUP_SCRIPT], capture_output=True, text=True, check=True)
+        imported, answered = map(float, out.stdout.split()[-2:])
+        imports.append((imported - spawned) * 1000)
+        firsts.append((answered - imported) * 1000)
+        totals.append((answered - spawned) * 1000)
+    result = {
+        "runs": runs,
+        "import_p50_ms": round(statistics.median(imports), 1),
+        "first_request_p50_ms": round(statistics.median(firsts), 1),
+        "to_first_response_p50_ms": round(statistics.median(totals), 1),
+    }
+    print(f"{'cold start to first response':55s} p50 {result['to_first_response_p50_ms']:9.1f}ms  "
+          f"(imports {result['import_p50_ms']:.1f}ms, first request {result['first_request_p50_ms']:.1f}ms)")
+    return result
+
+
+def query_plan_checks(n_clients: int) -> list:
+    """
+    (name, statements, index) of the analytics and credit-request search
+    queries: each statement must be answered through that index (checked by
+    explain_analytics, and by tests/test_query_plans.py).
+    """
+    from datetime import date
+
+    import api_helpers
+
+    mid = max(1, n_clients // 2)
+    start, end = date(2024, 3, 15), date(2025, 6, 20)
+
+    def timeseries(tier, client_id):
+        statements = api_helpers._timeseries_statements("year", date(2023, 3, 15), date(2025, 6, 20), client_id)
+        return [stmt for stmt_tier, stmt in statements if stmt_tier == tier]
+
+    checks = [
+        ("monthly edge months, all clients", api_helpers._monthly_statements(start, end, None)[1:],
+         "ix_dailyrollup_day"),
+        ("monthly edge months, one client", api_helpers._monthly_statements(start, end, mid)[1:],
+         "sqlite_autoindex_dailyrollup_1"),
+        ("monthly inside one month", api_helpers._monthly_statements(date(2025, 2, 3), date(2025, 2, 20), None),
+         "ix_dailyrollup_day"),
+        ("timeseries edge days, all clients", timeseries("day", None), "ix_dailyrollup_day"),
+        ("timeseries edge days, one client", timeseries("day", mid), "sqlite_autoindex_dailyrollup_1"),
+        ("timeseries whole months, one client", timeseries("month", mid), "sqlite_autoindex_monthlyrollup_1"),
+        ("timeseries whole years, one client", timeseries("year", mid), "sqlite_autoindex_yearlyrollup_1"),
+        ("balance snapshot, one client", [api_helpers._balance_stmt(mid, None)], "sqlite_autoindex_balancesnapshot_1"),
+        ("balance tail days, one client", [api_helpers._balance_stmt(mid, date(2024, 6, 15))],
+         "sqlite_autoindex_dailyrollup_1"),
+        ("category stats rollup, all clients", api_helpers._category_statements(start, end, None)[:1],
+         "sqlite_autoindex_categoryrollup_1"),
+        ("category stats rollup, one client", api_helpers._category_statements(start, end, mid)[:1],
+         "sqlite_autoindex_categoryrollup_1"),
+        ("category stats edge months, all clients", api_helpers._category_statements(start, end, None)[1],
+         "ix_transaction_year_month"),
+        ("category stats edge months, one client", api_helpers._category_statements(start, end, mid)[1],
+         "ix_transaction_client_date"),
+    ]
+
+    def credit_search(**filters):
+        conditions, _ = api_helpers._credit_filter_conditions(filters)
+        return [api_helpers._credit_requests_stmt(conditions, None, 100)]
+
+    checks += [
+        ("credit requests, newest first", credit_search(), "ix_creditrequest_created"),
+        ("credit requests, pending", credit_search(status="pending"), "ix_creditrequest_status_created"),
+        ("credit requests, one client", credit_search(client_id=mid), "ix_creditrequest_client_created"),
+        ("credit requests, client name prefix", credit_search(name="cl"), "ix_client_nom_lower"),
+    ]
+    return checks
+
+
+def query_plan(conn, stmt) -> list:
+    """The EXPLAIN QUERY PLAN steps of stmt (its parameters inlined)."""
+    sql = str(stmt.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+    return [row[3] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql)]
+
+
+def explain_analytics(n_clients: int) -> bool:
+    """
+    Print the EXPLAIN QUERY PLAN of the analytics and credit-request search
+    queries and check that each one is answered through the expected index.
+    Returns True if all are.
+    """
+    from tables__projet import engine
+
+    ok = True
+    with engine.connect() as conn:
+        for name, statements, index in query_plan_checks(n_clients):
+            for stmt in statements:
+                plan = query_plan(conn, stmt)
+                uses_index = any(f"USING INDEX {index}" in step for step in plan)
+                ok = ok and uses_index
+                print(f"{'ok  ' if uses_index else 'FAIL'} {name:40s} {' | '.join(plan)}")
+    return ok
+
+
+# Calls the dashboard page made before GET /api/dashboard bundled them
+DASHBOARD_PARTS = (
+    "GET /api/auth/current-user",
+    "GET /api/transactions/monthly?client_id",
+    "GET /api/transactions/category-averages?client_id",
+)
+
+
+def dashboard_vs_separate(routes: dict):
+    """p50 of GET /api/dashboard next to the summed p50 of the separate calls it replaces."""
+    if "GET /api/dashboard" not in routes or any(part not in routes for part in DASHBOARD_PARTS):
+        return None
+    bundle = routes["GET /api/dashboard"]["p50_ms"]
+    separate = sum(routes[part]["p50_ms"] for part in DASHBOARD_PARTS)
+    print(f"\nGET /api/dashboard p50 {bundle:.2f}ms vs {separate:.2f}ms for the {len(DASHBOARD_PARTS)} separate calls")
+    return {"bundle_p50_ms": bundle, "separate_p50_ms": round(separate, 3)}
+
+
+def compare(current: dict, previous_path: str):
+    with open(previous_path, encoding="utf-8") as f:
+        previous = json.load(f)
+    print(f"\nComparison with {previous.get('commit')} ({previous_path}):")
+    for name, r in current["routes"].items():
+        old = previous.get("routes", {}).get(name)
+        if not old:
+            continue
+        delta = (r["p50_ms"] - old["p50_ms"]) / old["p50_ms"] * 100 if old["p50_ms"] else 0.0
+        print(f"{name:55s} p50 {old['p50_ms']:9.2f}ms -> {r['p50_ms']:9.2f}ms ({delta:+.1f}%)")
+    old, new = previous.get("startup"), current.get("startup")
+    if old and new:
+        print(f"{'cold start to first response':55s} p50 {old['to_first_response_p50_ms']:9.1f}ms -> "
+              f"{new['to_first_response_p50_ms']:9.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every API route on a synthetic data set.")
+    parser.add_argument("--db", default="benchmark.db", help="SQLite file used for the benchmark")
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--transactions", type=int, default=100, help="transactions per client")
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--requests", type=int, default=50, help="timed requests per route")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--only", help="only benchmark routes whose name contains this text")
+    parser.add_argument("--skip-generate", action="store_true", help="reuse the existing --db file")
+    parser.add_argument("--output-dir", default="benchmark_results")
+    parser.add_argument("--compare", help="previous result file to compare with")
+    parser.add_argument("--explain", action="store_true",
+                        help="only check the query plans of the analytics and credit-request search queries "
+                             "(exit status 1 if an index is unused)")
+    parser.add_argument("--startup-runs", type=int, default=5, help="cold starts timed (0: skip)")
+    parser.add_argument("--startup-only", action="store_true", help="only time the cold starts")
+    args = parser.parse_args()
+
+    # The engine is created at import time from BANK_DB_FILE
+    os.environ["BANK_DB_FILE"] = args.db
+    logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
+    from tables__projet import shard_engines
+    import datagen
+
+    for bind in shard_engines:
+        bind.echo = False
+    if not args.skip_generate:
+        datagen.generate(args.clients, args.transactions, args.years, seed=args.seed)
+
+    if args.explain:
+        raise SystemExit(0 if explain_analytics(args.clients) else 1)
+    if args.startup_only:
+        startup(max(1, args.startup_runs))
+        return
+
+    routes = run(args.requests, args.warmup, args.clients, args.only)
+    # Generated and migrated above, so this times a worker starting on a current schema
+    cold_start = startup(args.startup_runs) if args.startup_runs else None
+    report = {
+        "commit": _git_commit(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "params": {
+            "clients": args.clients,
+            "transactions_per_client": args.transactions,
+            "years": args.years,
+            "seed": args.seed,
+            "requests": args.requests,
+        },
+        "routes": routes,
+        "dashboard_vs_separate": dashboard_vs_separate(routes),
+        "startup": cold_start,
+    }
+    os.makedirs(args.output_dir, exist_ok=True)
+    path = os.path.join(
+        args.output_dir,
+        f"{datetime.now():%Y%m%d-%H%M%S}-{report['commit']}-{args.clients}x{args.transactions}.json",
+    )
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\nResults written to {path}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
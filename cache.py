@@ -0,0 +1,118 @@
+"""
+In-process LRU cache for the analytics responses.
+
+Entries are keyed on the endpoint and its normalized query parameters and
+remember which client they were computed for. They carry an ETag (hash of
+the body), so a request with a matching If-None-Match is answered with 304
+without touching SQLite. When a client's transactions change, its entries and
+the all-clients entries are dropped (see add_transaction_listener in
+tables__projet.py).
+
+Only writes made by this process invalidate the cache; `ttl` bounds how long
+an entry may survive writes made elsewhere (bulk imports from the CLI).
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Hashable, Iterable, Optional, Set
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    body: bytes
+    etag: str
+    client_id: Optional[int]
+    created: float
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = 256, ttl: Optional[float] = 300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+        self._keys_by_client: Dict[Optional[int], Set[Hashable]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._generation = 0
+
+    @property
+    def generation(self) -> int:
+        """Bumped by every invalidation; pass it to put() to avoid caching a result computed before one."""
+        return self._generation
+
+    def get(self, key: Hashable) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None and time.monotonic() - entry.created > self.ttl:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(
+        self, key: Hashable, client_id: Optional[int], body: bytes, generation: Optional[int] = None
+    ) -> CachedResponse:
+        entry = CachedResponse(
+            body=body,
+            etag=hashlib.sha1(body).hexdigest(),
+            client_id=client_id,
+            created=time.monotonic(),
+        )
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                # Transactions changed while the body was computed: serve it, don't keep it
+                return entry
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._keys_by_client.setdefault(client_id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+        return entry
+
+    def invalidate_clients(self, client_ids: Iterable[int]) -> None:
+        """Drop the entries of these clients and every all-clients entry."""
+        with self._lock:
+            self._generation += 1
+            for client_id in {None, *client_ids}:
+                for key in list(self._keys_by_client.get(client_id, ())):
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._keys_by_client.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "maxEntries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key)
+        keys = self._keys_by_client.get(entry.client_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_client[entry.client_id]
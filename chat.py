@@ -0,0 +1,190 @@
+"""
+Chat assistant of the client space: intent matching, replies and the
+per-client context they are built from.
+
+All intent keywords are compiled into one regular expression, matched once
+against the accent-folded, lower-cased message ("eligibilite" and
+"éligibilité" are the same word). When several intents match, the first
+one of INTENTS wins, as with the original chain of keyword scans
+(`classify_intent_scan`, kept as the reference).
+
+The context (balance, average transaction, transaction count) is cached per
+client and dropped when the client's transactions or profile change.
+
+    python chat.py [N]
+
+benchmarks N messages through the scan and the compiled matcher.
+"""
+from __future__ import annotations
+
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+# (intent, keywords) in priority order
+INTENTS = (
+    ("credit", ("crédit", "prêt", "loan", "credit")),
+    ("balance", ("solde", "balance", "compte")),
+    ("eligibility", ("éligibilité", "eligible", "score")),
+)
+
+
+def fold(text: str) -> str:
+    """Lower-case `text` and drop its accents (and any other non-ASCII character)."""
+    text = text.lower()
+    if text.isascii():
+        return text
+    return unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+
+
+# Folded keyword -> index of its intent in INTENTS
+_KEYWORD_PRIORITY = {}
+for _priority, (_intent, _keywords) in reversed(list(enumerate(INTENTS))):
+    _KEYWORD_PRIORITY.update({fold(word): _priority for word in _keywords})
+
+# One alternation of plain literals, longest first (named groups or character
+# classes would disable the regex engine's first-character prefilter)
+_MATCHER = re.compile("|".join(map(re.escape, sorted(_KEYWORD_PRIORITY, key=len, reverse=True))))
+
+
+def classify_intent(message: str) -> Optional[str]:
+    """Highest-priority intent whose keywords appear in `message`, or None."""
+    best = None
+    for word in _MATCHER.findall(fold(message)):
+        priority = _KEYWORD_PRIORITY[word]
+        if best is None or priority < best:
+            best = priority
+    return None if best is None else INTENTS[best][0]
+
+
+def classify_intent_scan(message: str) -> Optional[str]:
+    """Reference implementation: one substring scan per keyword list, accents significant."""
+    message_lower = message.lower()
+    for intent, keywords in INTENTS:
+        if any(word in message_lower for word in keywords):
+            return intent
+    return None
+
+
+@dataclass(frozen=True)
+class ChatContext:
+    balance: float
+    avg_transaction: float
+    transaction_count: int
+
+    def as_payload(self) -> dict:
+        return {
+            "balance": self.balance,
+            "avgTransaction": self.avg_transaction,
+            "transactionCount": self.transaction_count,
+        }
+
+
+def reply(message: str, credit_amount, credit_duration, context: ChatContext) -> str:
+    """Simple AI-like prediction logic based on client data."""
+    intent = classify_intent(message)
+    balance = context.balance
+
+    if intent == "credit":
+        if credit_amount and credit_duration:
+            monthly_payment = float(credit_amount) / int(credit_duration)
+
+            if balance > monthly_payment * 3:
+                return f"Basé sur votre solde actuel ({balance:,.0f} FCFA) et votre demande de crédit ({credit_amount:,.0f} FCFA sur {credit_duration} mois), votre profil semble favorable. La mensualité estimée serait d'environ {monthly_payment:,.0f} FCFA, ce qui représente un ratio d'endettement raisonnable."
+            return f"Votre demande de crédit nécessite une analyse approfondie. Avec un solde de {balance:,.0f} FCFA, il serait recommandé d'augmenter votre épargne avant de contracter un crédit de {credit_amount:,.0f} FCFA."
+        return "Pour une analyse précise de votre demande de crédit, veuillez fournir le montant et la durée souhaités."
+    if intent == "balance":
+        return f"Votre solde actuel est de {balance:,.0f} FCFA. Vous avez effectué {context.transaction_count} transaction(s) avec une moyenne de {context.avg_transaction:,.0f} FCFA par transaction."
+    if intent == "eligibility":
+        # Simple eligibility calculation
+        if balance > 1000000:
+            score = 9.0
+        elif balance > 500000:
+            score = 7.5
+        else:
+            score = 6.0
+
+        return f"Basé sur votre profil financier, votre score d'éligibilité estimé est de {score}/10. Votre solde actuel de {balance:,.0f} FCFA et votre historique de transactions sont pris en compte dans cette évaluation."
+    return "Je peux vous aider avec des questions sur votre crédit, votre solde, votre éligibilité, ou d'autres aspects de vos finances. Posez-moi une question spécifique !"
+
+
+class ChatContextCache:
+    """Bounded LRU of ChatContext per client id."""
+
+    def __init__(self, max_entries: int = 10_000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, ChatContext]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    @property
+    def generation(self) -> int:
+        """Bumped by every invalidation; pass it to put() to avoid caching a stale context."""
+        return self._generation
+
+    def get(self, client_id: int) -> Optional[ChatContext]:
+        with self._lock:
+            context = self._entries.get(client_id)
+            if context is not None:
+                self._entries.move_to_end(client_id)
+            return context
+
+    def put(self, client_id: int, context: ChatContext, generation: Optional[int] = None) -> None:
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[client_id] = context
+            self._entries.move_to_end(client_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_clients(self, client_ids: Iterable[int]) -> None:
+        with self._lock:
+            self._generation += 1
+            for client_id in client_ids:
+                self._entries.pop(client_id, None)
+
+    def invalidate_profiles(self, users: Iterable) -> None:
+        """add_profile_listener callback: ("client" | "admin", id) pairs."""
+        self.invalidate_clients([user_id for user_type, user_id in users if user_type == "client"])
+
+
+def benchmark(n: int = 100_000) -> None:
+    """Messages/second of the keyword scans vs the compiled matcher (intent + reply)."""
+    samples = [
+        "Quel est mon solde ?",
+        "Je voudrais un crédit pour une voiture",
+        "Suis-je éligible à un prêt immobilier ?",
+        "Mon score d'eligibilite",
+        "Bonjour, comment allez-vous aujourd'hui ?",
+        "Pouvez-vous m'expliquer les frais de tenue de compte et les options d'épargne disponibles ?",
+    ]
+    messages = [samples[i % len(samples)] for i in range(n)]
+    context = ChatContext(balance=750_000.0, avg_transaction=42_000.0, transaction_count=31)
+
+    t0 = time.perf_counter()
+    scanned = [classify_intent_scan(m) for m in messages]
+    t1 = time.perf_counter()
+    matched = [classify_intent(m) for m in messages]
+    t2 = time.perf_counter()
+    for m in messages:
+        reply(m, 1_000_000, 12, context)
+    t3 = time.perf_counter()
+
+    differences = {(m, a, b) for m, a, b in zip(messages, scanned, matched) if a != b}
+    print(f"{n} messages")
+    print(f"  keyword scans:    {n / (t1 - t0):12,.0f} messages/s")
+    print(f"  compiled matcher: {n / (t2 - t1):12,.0f} messages/s")
+    print(f"  matcher + reply:  {n / (t3 - t2):12,.0f} messages/s")
+    for m, a, b in sorted(differences, key=str):
+        print(f"  accent-insensitive match: {m!r}: {a} -> {b}")
+
+
+if __name__ == "__main__":
+    import sys
+
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,322 @@
+"""
+Optional in-process columnar copy of the Transaction table for the analytics.
+
+One NumPy array per column: client id (int32), day ordinal (int32), month
+index (year * 12 + month - 1, int32), category code (int16, dictionary-encoded:
+`categories` holds the strings) and amount (float64), about 22 bytes per
+transaction. The monthly comparison, the category statistics and the
+per-client totals are then vectorized group-bys (np.bincount over the small
+integer codes) instead of SQL round trips and per-row tuples.
+
+The store is loaded from every shard by the first request of the process,
+then appended to: transactions are never updated or deleted, so a refresh
+only loads the rows past the largest id seen on each shard. A transaction
+write made by this process marks the store stale (see add_transaction_listener
+in tables__projet.py); `ttl` bounds how long writes made elsewhere (bulk
+imports from the CLI) stay unseen, as for the response cache.
+
+Enabled with app.config["COLUMNAR_CACHE"] (BANK_COLUMNAR_CACHE=1).
+
+    python columnar.py [--repeat 20]
+
+compares its memory footprint and latency with the SQL path on BANK_DB_FILE.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import Integer, cast, func
+from sqlmodel import Session, select
+
+from sketches import RunningStats
+from tables__projet import Transaction, shard_engines
+
+COLUMN_TYPES = {
+    "client": np.int32,
+    "day": np.int32,
+    "month": np.int32,
+    "category": np.int16,
+    "amount": np.float64,
+}
+LOAD_CHUNK_SIZE = 10_000
+# date.toordinal() of date_transaction (julianday('0001-01-01') is 1721425.5)
+DAY_ORDINAL = cast(func.julianday(Transaction.date_transaction) - 1721424.5, Integer)
+
+
+@dataclass(frozen=True)
+class ClientTotals:
+    """Per-client totals, indexed by client id (ClientSummary's columns)."""
+    income: np.ndarray      # sum of the positive amounts
+    expense: np.ndarray     # sum of the negative amounts
+    count: np.ndarray
+    months: np.ndarray      # months with at least one transaction
+
+
+class ColumnarStore:
+    def __init__(self, ttl: Optional[float] = 300.0):
+        self.ttl = ttl
+        self.categories: List[str] = []
+        self._codes: Dict[str, int] = {}
+        self._columns = {name: np.empty(0, dtype) for name, dtype in COLUMN_TYPES.items()}
+        self._size = 0
+        self._last_ids = [0] * len(shard_engines)
+        self._lock = threading.Lock()
+        self._stale = True
+        self._refreshed = 0.0
+        self._totals: Optional[Tuple[int, ClientTotals]] = None   # (rows covered, client_totals())
+        self.refreshes = 0
+
+    def mark_stale(self, client_ids=None) -> None:
+        """Transaction listener: load the new rows on the next read."""
+        self._stale = True
+
+    def refresh(self) -> int:
+        """Load the transactions added since the last refresh (all of them the first time); returns how many."""
+        with self._lock:
+            # Cleared first: a write committed while loading marks the store stale again
+            self._stale = False
+            added = 0
+            for shard, bind in enumerate(shard_engines):
+                stmt = (
+                    select(Transaction.id_transaction, Transaction.id_client, DAY_ORDINAL,
+                           Transaction.year_month, Transaction.categorie, Transaction.montant)
+                    .where(Transaction.id_transaction > self._last_ids[shard])
+                    .order_by(Transaction.id_transaction)
+                )
+                # Core rows: no ORM entities, and SQLite computes the day ordinals
+                with bind.connect() as conn:
+                    for rows in conn.execute(stmt).yield_per(LOAD_CHUNK_SIZE).partitions():
+                        self._append(rows)
+                        self._last_ids[shard] = rows[-1][0]
+                        added += len(rows)
+            self._refreshed = time.monotonic()
+            self.refreshes += 1
+            return added
+
+    def _append(self, rows) -> None:
+        _, clients, days, year_months, categories, amounts = zip(*rows)
+        codes = self._codes
+        for categorie in set(categories).difference(codes):
+            codes[categorie] = len(self.categories)
+            self.categories.append(categorie)
+        year_months = np.array(year_months, dtype=np.int32)
+        new = {
+            "client": clients,
+            "day": days,
+            "month": year_months // 100 * 12 + year_months % 100 - 1,
+            "category": [codes[c] for c in categories],
+            "amount": np.array(amounts, dtype=np.float64),
+        }
+        size, end = self._size, self._size + len(rows)
+        capacity = len(self._columns["client"])
+        for name, values in new.items():
+            column = self._columns[name]
+            if end > capacity:
+                # Grow geometrically; readers keep views of the old buffers
+                grown = np.empty(max(end, 2 * capacity, 1024), dtype=column.dtype)
+                grown[:size] = column[:size]
+                column = self._columns[name] = grown
+            column[size:end] = values
+        self._size = end
+
+    def _snapshot(self) -> Dict[str, np.ndarray]:
+        """The loaded columns, refreshed first when stale or older than ttl."""
+        if self._stale or (self.ttl is not None and time.monotonic() - self._refreshed > self.ttl):
+            self.refresh()
+        with self._lock:
+            size = self._size
+            return {name: column[:size] for name, column in self._columns.items()}
+
+    def _select(self, start: Optional[date], end: Optional[date], client_id: Optional[int]) -> Dict[str, np.ndarray]:
+        """Columns of the transactions between start and end (inclusive) of client_id (all clients: None)."""
+        columns = self._snapshot()
+        mask = None
+        for condition in (
+            columns["day"] >= start.toordinal() if start else None,
+            columns["day"] <= end.toordinal() if end else None,
+            columns["client"] == client_id if client_id else None,
+        ):
+            if condition is not None:
+                mask = condition if mask is None else mask & condition
+        if mask is None:
+            return columns
+        return {name: column[mask] for name, column in columns.items()}
+
+    def monthly_rows(self, start: Optional[date], end: Optional[date], client_id: Optional[int]) -> List[tuple]:
+        """(year, month, income, expense_signed, net) per month, as api_helpers._monthly_payload takes them."""
+        columns = self._select(start, end, client_id)
+        if not columns["month"].size:
+            return []
+        first = int(columns["month"].min())
+        months = columns["month"] - first
+        amount = columns["amount"]
+        income = np.bincount(months, weights=np.where(amount >= 0, amount, 0.0))
+        expense = np.bincount(months, weights=np.where(amount < 0, amount, 0.0))
+        present = np.flatnonzero(np.bincount(months))
+        return [
+            ((first + i) // 12, (first + i) % 12 + 1, float(income[i]), float(expense[i]), float(income[i] + expense[i]))
+            for i in present.tolist()
+        ]
+
+    def category_parts(self, start: Optional[date], end: Optional[date], client_id: Optional[int]) -> List[tuple]:
+        """
+        (None, categorie, income, expense_signed, RunningStats) per category,
+        as api_helpers._category_payload takes them (one digest over all the months).
+        """
+        columns = self._select(start, end, client_id)
+        codes, amount = columns["category"], columns["amount"]
+        parts = []
+        for code in np.flatnonzero(np.bincount(codes)).tolist() if codes.size else ():
+            values = amount[codes == code]
+            parts.append((
+                None,
+                self.categories[code],
+                float(values[values >= 0].sum()),
+                float(values[values < 0].sum()),
+                RunningStats().update(values),
+            ))
+        return parts
+
+    def client_totals(self) -> ClientTotals:
+        """Income, expense, transaction count and active months of every client, in one pass."""
+        columns = self._snapshot()
+        with self._lock:
+            if self._totals is not None and self._totals[0] == len(columns["client"]):
+                return self._totals[1]
+        clients, amount, months = columns["client"], columns["amount"], columns["month"]
+        size = int(clients.max()) + 1 if clients.size else 0
+        if clients.size:
+            first = int(months.min())
+            span = int(months.max()) - first + 1
+            if size * span <= 4 * clients.size:
+                # Dense client x month grid: counted in one linear bincount
+                grid = np.bincount(clients.astype(np.intp) * span + (months - first), minlength=size * span)
+                active = np.count_nonzero(grid.reshape(size, span), axis=1)
+            else:
+                pairs = np.unique(clients.astype(np.int64) << 32 | months.astype(np.int64))
+                active = np.bincount((pairs >> 32).astype(np.intp), minlength=size)
+        else:
+            active = np.zeros(0, dtype=np.intp)
+        totals = ClientTotals(
+            income=np.bincount(clients, weights=np.where(amount > 0, amount, 0.0), minlength=size),
+            expense=np.bincount(clients, weights=np.where(amount < 0, amount, 0.0), minlength=size),
+            count=np.bincount(clients, minlength=size),
+            months=active,
+        )
+        with self._lock:
+            self._totals = (len(clients), totals)
+        return totals
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "rows": self._size,
+                "categories": len(self.categories),
+                "bytes": int(sum(column[:self._size].nbytes for column in self._columns.values())),
+                "allocatedBytes": int(sum(column.nbytes for column in self._columns.values())),
+                "refreshes": self.refreshes,
+                "stale": self._stale,
+            }
+
+
+def benchmark(repeat: int = 20) -> None:
+    """Memory footprint of the store, and p50 latency of each analytic from it vs from SQL."""
+    import tracemalloc
+
+    import app as app_module   # not at module level: app imports this module
+
+    t0 = time.perf_counter()
+    store = ColumnarStore(ttl=None)
+    n_rows = store.refresh()
+    load = time.perf_counter() - t0
+    # Loaded again under tracemalloc (which slows it down) for the peak
+    tracemalloc.start()
+    ColumnarStore(ttl=None).refresh()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    stats = store.stats()
+    print(f"{n_rows:,} transactions loaded in {load:.2f}s: {stats['bytes'] / 2**20:.1f} MiB of arrays "
+          f"({stats['allocatedBytes'] / 2**20:.1f} MiB allocated, {peak / 2**20:.1f} MiB peak while loading)")
+
+    with Session(shard_engines[0]) as session:
+        mid = session.exec(select(Transaction.id_client).limit(1)).first() or 1
+    ranges = [
+        ("all time", None, None, None),
+        ("one year + edges", date(2024, 3, 15), date(2025, 6, 20), None),
+        ("one client", None, None, mid),
+    ]
+
+    def sql_monthly(start, end, client_id):
+        groups = app_module._query_shards(app_module._monthly_statements(start, end, client_id), client_id)
+        return app_module._monthly_payload([rows for shard_groups in groups for rows in shard_groups])
+
+    def sql_category(start, end, client_id):
+        rollup_stmt, raw_stmts = app_module._category_statements(start, end, client_id)
+        rollup_rows, raw_row_groups = [], []
+        statements = [rollup_stmt, *raw_stmts] if rollup_stmt is not None else raw_stmts
+        for groups in app_module._query_shards(statements, client_id):
+            if rollup_stmt is not None:
+                rollup_rows += groups[0]
+                groups = groups[1:]
+            raw_row_groups += groups
+        return app_module._category_payload(app_module._category_parts(rollup_rows, raw_row_groups))
+
+    def sql_client_totals():
+        rows = app_module._query_shards([app_module._credit_scores_stmt(None)], None)
+        return [row for groups in rows for row in groups[0]]
+
+    def timed(fn, *args) -> Tuple[float, object]:
+        timings = []
+        for _ in range(repeat):
+            t = time.perf_counter()
+            result = fn(*args)
+            timings.append((time.perf_counter() - t) * 1000)
+        return float(np.median(timings)), result
+
+    print(f"{'p50 over ' + str(repeat) + ' runs':40s} {'SQL':>10s} {'columnar':>10s}")
+    for label, start, end, client_id in ranges:
+        sql_ms, sql_data = timed(sql_monthly, start, end, client_id)
+        col_ms, col_data = timed(lambda *a: app_module._monthly_payload([store.monthly_rows(*a)]), start, end, client_id)
+        same = all(a["label"] == b["label"] and abs(a["net"] - b["net"]) < 1e-6 * max(1.0, abs(a["net"]))
+                   for a, b in zip(sql_data, col_data)) and len(sql_data) == len(col_data)
+        print(f"{'monthly, ' + label:40s} {sql_ms:8.2f}ms {col_ms:8.2f}ms  {'same totals' if same else 'DIFFERENT'}")
+    for label, start, end, client_id in ranges:
+        sql_ms, sql_data = timed(sql_category, start, end, client_id)
+        col_ms, col_data = timed(lambda *a: app_module._category_payload(store.category_parts(*a)), start, end, client_id)
+        same = [(d["category"], d["count"], round(d["average"], 6)) for d in sql_data] == \
+               [(d["category"], d["count"], round(d["average"], 6)) for d in col_data]
+        print(f"{'category stats, ' + label:40s} {sql_ms:8.2f}ms {col_ms:8.2f}ms  "
+              f"{'same counts / averages' if same else 'DIFFERENT'}")
+    def fresh_client_totals():
+        store._totals = None
+        return store.client_totals()
+
+    sql_ms, sql_rows = timed(sql_client_totals)
+    col_ms, totals = timed(fresh_client_totals)
+    same = all(
+        (row[4] or 0) == (int(totals.months[row[0]]) if row[0] < len(totals.months) else 0)
+        and abs((row[2] or 0) - (float(totals.income[row[0]]) if row[0] < len(totals.income) else 0)) < 1e-6
+        for row in sql_rows
+    )
+    print(f"{'per-client totals, all clients':40s} {sql_ms:8.2f}ms {col_ms:8.2f}ms  "
+          f"{'same totals' if same else 'DIFFERENT'}")
+    memo_ms, _ = timed(store.client_totals)
+    print(f"{'per-client totals, unchanged store':40s} {'':>10s} {memo_ms:8.2f}ms")
+
+
+if __name__ == "__main__":
+    import argparse
+    import logging
+
+    parser = argparse.ArgumentParser(description="Columnar store vs SQL: memory footprint and latency.")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
+    for bind in shard_engines:
+        bind.echo = False
+    benchmark(args.repeat)
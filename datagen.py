@@ -0,0 +1,199 @@
+"""
+Deterministic synthetic data set for load testing.
+
+Creates N clients (with login credentials), M transactions per client spread
+over several years and categories, and credit requests. The same arguments
+and seed always produce the same database (the same rows, spread over the
+BANK_SHARDS files when sharded).
+
+Usage (writes to the file named by BANK_DB_FILE, default database.db):
+    BANK_DB_FILE=benchmark.db python datagen.py --clients 1000 --transactions 200 [--years 3] [--seed 42]
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from contextlib import ExitStack
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import insert
+from sqlmodel import Session
+
+from tables__projet import (
+    Administrateur,
+    Client,
+    Connexion_client,
+    CreditRequest,
+    add_transactions_batch,
+    compact_balance_snapshots,
+    hash_mdp,
+    reset_db,
+    shard_engines,
+    shard_of,
+)
+
+CLIENT_PASSWORD = "1234"
+ADMIN_EMAIL = "admin1@bankapp.com"
+ADMIN_PASSWORD = "0123"
+
+FIRST_NAMES = ["Paul", "Clarisse", "Didier", "Aline", "Serge", "Mireille", "Jean", "Brigitte", "Hervé", "Nadège"]
+LAST_NAMES = ["Ngono", "Mbia", "Fouda", "Atangana", "Essomba", "Tchami", "Nkodo", "Abena", "Owona", "Kamga"]
+CITIES = ["Yaoundé", "Douala", "Bafoussam", "Garoua", "Bamenda", "Kribi"]
+PROFESSIONS = ["Ingénieur logiciel", "Comptable", "Entrepreneur", "Enseignant", "Médecin", "Commerçant"]
+
+# (type_transaction, categorie, sign, typical amount)
+CATEGORIES = [
+    ("dépôt", "Dépôt guichet", 1, 150_000),
+    ("dépôt", "Dépôt mobile money", 1, 50_000),
+    ("virement", "Salaire", 1, 400_000),
+    ("virement", "Virement vers compte épargne", -1, 80_000),
+    ("paiement", "Paiement supermarché DOVV", -1, 25_000),
+    ("paiement", "Station-service Tradex", -1, 30_000),
+    ("paiement", "Restaurant Le Président", -1, 20_000),
+    ("retrait", "Retrait ATM BICEC", -1, 100_000),
+    ("prélèvement", "Abonnement Canal+", -1, 15_000),
+    ("prélèvement", "Paiement assurance", -1, 50_000),
+]
+CREDIT_PURPOSES = ["Achat véhicule", "Crédit à la consommation", "Achat immobilier", "Travaux", "Études"]
+CREDIT_STATUSES = ["pending", "approved", "rejected"]
+
+
+def _client_rows(rng: random.Random, n_clients: int):
+    for client_id in range(1, n_clients + 1):
+        nom = rng.choice(LAST_NAMES)
+        prenom = rng.choice(FIRST_NAMES)
+        yield {
+            "client_id": client_id,
+            "nom": nom,
+            "prenom": prenom,
+            "date_naissance": date(1950, 1, 1) + timedelta(days=rng.randint(0, 365 * 55)),
+            "email": f"client{client_id}@example.com",
+            "telephone": f"6{rng.randint(10_000_000, 99_999_999)}",
+            "adresse": f"{rng.choice(CITIES)}, quartier {rng.randint(1, 50)}",
+            "profession": rng.choice(PROFESSIONS),
+            "solde_initial": float(rng.choice([0, 100_000, 300_000, 700_000, 1_500_000]) + rng.randint(0, 99_999)),
+            "IBAN": f"CM79 {client_id:026d}",
+            "RIB": f"{client_id:023d}",
+            "numero_compte": f"ACC{client_id:08d}",
+            "numero_carte": f"4{client_id:015d}",
+            "date_expiration": f"{rng.randint(1, 12):02d}/{rng.randint(26, 31)}",
+            "cryptogramme": rng.randint(100, 999),
+        }
+
+
+def _transaction_rows(rng: random.Random, client_id: int, n_transactions: int, first_day: date, n_days: int):
+    for i in range(n_transactions):
+        type_transaction, categorie, sign, typical = rng.choice(CATEGORIES)
+        yield {
+            "id_client": client_id,
+            "nom_transaction": f"TR{i + 1}-{client_id:06d}",
+            "date_transaction": first_day + timedelta(days=rng.randrange(n_days)),
+            "type_transaction": type_transaction,
+            "categorie": categorie,
+            "montant": float(sign * round(rng.uniform(0.2, 2.0) * typical, -2)),
+        }
+
+
+def generate(
+    n_clients: int,
+    transactions_per_client: int,
+    years: int = 3,
+    credit_requests_per_client: int = 1,
+    seed: int = 42,
+    end_year: int = 2025,
+    batch_size: int = 50_000,
+    verbose: bool = True,
+) -> dict:
+    """Reset the database and fill it with the synthetic data set. Returns the row counts."""
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    reset_db()
+
+    first_day = date(end_year - years + 1, 1, 1)
+    n_days = (date(end_year, 12, 31) - first_day).days + 1
+    password = hash_mdp(CLIENT_PASSWORD)
+
+    with ExitStack() as stack:
+        sessions = [stack.enter_context(Session(bind)) for bind in shard_engines]
+        # Administrators live on the main file; each client's rows on its shard
+        session = sessions[0]
+        session.add(Administrateur(id=1, nom="AdminPrincipal", mot_de_passe=hash_mdp(ADMIN_PASSWORD),
+                                   email=ADMIN_EMAIL, role="admin"))
+        session.commit()
+
+        clients = list(_client_rows(rng, n_clients))
+        for i in range(0, n_clients, batch_size):
+            chunk = clients[i:i + batch_size]
+            for shard, session in enumerate(sessions):
+                shard_chunk = [c for c in chunk if shard_of(c["client_id"]) == shard]
+                if not shard_chunk:
+                    continue
+                session.execute(insert(Client.__table__), shard_chunk)
+                session.execute(insert(Connexion_client.__table__), [
+                    {"client_id": c["client_id"], "email": c["email"], "mot_de_passe": password} for c in shard_chunk
+                ])
+        for session in sessions:
+            session.commit()
+
+        batches = [[] for _ in sessions]
+        n_transactions = 0
+        for client_id in range(1, n_clients + 1):
+            shard = shard_of(client_id)
+            batch = batches[shard]
+            batch.extend(_transaction_rows(rng, client_id, transactions_per_client, first_day, n_days))
+            if len(batch) >= batch_size:
+                add_transactions_batch(sessions[shard], batch)
+                sessions[shard].commit()
+                n_transactions += len(batch)
+                batches[shard] = []
+                if verbose:
+                    print(f"  {n_transactions} transactions")
+        for session, batch in zip(sessions, batches):
+            add_transactions_batch(session, batch)
+            session.commit()
+            n_transactions += len(batch)
+
+        requests_rows = []
+        for client_id in range(1, n_clients + 1):
+            for _ in range(credit_requests_per_client):
+                requests_rows.append({
+                    "client_id": client_id,
+                    "amount": float(rng.randint(1, 100) * 50_000),
+                    "duration_months": rng.choice([6, 12, 24, 36, 60]),
+                    "purpose": rng.choice(CREDIT_PURPOSES),
+                    "status": rng.choice(CREDIT_STATUSES),
+                    "created_at": datetime(end_year, 1, 1) + timedelta(seconds=rng.randrange(365 * 86_400)),
+                })
+        for shard, session in enumerate(sessions):
+            shard_rows = [r for r in requests_rows if shard_of(r["client_id"]) == shard]
+            for i in range(0, len(shard_rows), batch_size):
+                session.execute(insert(CreditRequest.__table__), shard_rows[i:i + batch_size])
+            session.commit()
+
+    # Snapshots as the periodic compaction job leaves them: current balances
+    # then only sum the last month of daily rollups
+    for bind in shard_engines:
+        compact_balance_snapshots(date(end_year, 11, 30), bind)
+
+    counts = {
+        "clients": n_clients,
+        "transactions": n_transactions,
+        "credit_requests": len(requests_rows),
+    }
+    if verbose:
+        print(f"Generated {counts} in {time.perf_counter() - started:.1f}s")
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a deterministic synthetic data set.")
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--transactions", type=int, default=100, help="transactions per client")
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--credit-requests", type=int, default=1, help="credit requests per client")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    for bind in shard_engines:
+        bind.echo = False
+    generate(args.clients, args.transactions, args.years, args.credit_requests, args.seed)
@@ -0,0 +1,288 @@
+"""
+Bulk export of the Transaction table for offline analysis.
+
+Rows are read `chunk_size` at a time from a server-side cursor and encoded
+chunk by chunk as CSV, JSON-lines or Parquet (one row group per chunk),
+optionally gzip-compressed on the fly, so memory stays flat whatever the
+number of rows. The same encoders feed the admin export endpoint
+(GET /api/admin/transactions/export) and this CLI. With several shards
+(BANK_SHARDS) the per-shard cursors are merged on the global transaction id.
+
+Parquet needs pyarrow (pip install pyarrow); CSV and JSON-lines have no
+extra dependency.
+
+Usage:
+    python export.py transactions.csv.gz [--format csv|jsonl|parquet] [--gzip]
+                     [--start YYYY-MM-DD] [--end YYYY-MM-DD] [--client-id N] [--chunk-size 5000]
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import json
+import sys
+import time
+import zlib
+from datetime import date
+from heapq import merge
+from itertools import islice
+from typing import Iterator, Optional
+
+from sqlmodel import Session, select
+
+from shards import global_id
+from tables__projet import SHARD_COUNT, Transaction, engine, shard_engines, shard_of
+
+COLUMNS = ("id_transaction", "id_client", "nom_transaction", "date_transaction", "type_transaction", "categorie", "montant")
+# format -> (media type, file extension)
+FORMATS = {
+    "csv": ("text/csv", ".csv"),
+    "jsonl": ("application/x-ndjson", ".jsonl"),
+    "parquet": ("application/vnd.apache.parquet", ".parquet"),
+}
+DEFAULT_CHUNK_SIZE = 5000
+
+
+def transactions_stmt():
+    """The exported Transaction columns, in id order (filter with api_helpers._apply_common_filters)."""
+    return select(*(getattr(Transaction, name) for name in COLUMNS)).order_by(Transaction.id_transaction)
+
+
+class _CsvEncoder:
+    def begin(self) -> bytes:
+        return self._write([COLUMNS])
+
+    def encode(self, rows) -> bytes:
+        return self._write(rows)
+
+    def end(self) -> bytes:
+        return b""
+
+    @staticmethod
+    def _write(rows) -> bytes:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue().encode("utf-8")
+
+
+class _JsonLinesEncoder:
+    def begin(self) -> bytes:
+        return b""
+
+    def encode(self, rows) -> bytes:
+        return "".join(
+            json.dumps(dict(zip(COLUMNS, row)), ensure_ascii=False, default=date.isoformat) + "\n"
+            for row in rows
+        ).encode("utf-8")
+
+    def end(self) -> bytes:
+        return b""
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands out what was written since the last take()."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        # Parquet footer offsets are absolute: count what was already handed out
+        return self._position
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class _ParquetEncoder:
+    def __init__(self):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("Parquet export needs pyarrow (pip install pyarrow).") from None
+        self._pa = pa
+        self._schema = pa.schema([
+            ("id_transaction", pa.int64()),
+            ("id_client", pa.int64()),
+            ("nom_transaction", pa.string()),
+            ("date_transaction", pa.date32()),
+            ("type_transaction", pa.string()),
+            ("categorie", pa.string()),
+            ("montant", pa.float64()),
+        ])
+        self._sink = _ChunkSink()
+        self._writer = pq.ParquetWriter(self._sink, self._schema)
+
+    def begin(self) -> bytes:
+        return self._sink.take()
+
+    def encode(self, rows) -> bytes:
+        columns = list(zip(*rows))
+        self._writer.write_table(self._pa.Table.from_arrays(
+            [self._pa.array(values, type=field.type) for values, field in zip(columns, self._schema)],
+            schema=self._schema,
+        ))
+        return self._sink.take()
+
+    def end(self) -> bytes:
+        self._writer.close()
+        return self._sink.take()
+
+
+class _GzipEncoder:
+    """Compresses the output of another encoder as one gzip stream."""
+
+    def __init__(self, inner):
+        self._inner = inner
+        self._compressor = zlib.compressobj(wbits=31)   # 31: gzip header and trailer
+
+    def begin(self) -> bytes:
+        return self._compressor.compress(self._inner.begin())
+
+    def encode(self, rows) -> bytes:
+        return self._compressor.compress(self._inner.encode(rows))
+
+    def end(self) -> bytes:
+        return self._compressor.compress(self._inner.end()) + self._compressor.flush()
+
+
+def make_encoder(fmt: str, compress: bool = False):
+    """
+    Encoder with begin() / encode(rows) / end() methods, each returning the
+    next bytes of the file. Raises ValueError on an unknown format, or for
+    Parquet without pyarrow.
+    """
+    if fmt == "csv":
+        encoder = _CsvEncoder()
+    elif fmt == "jsonl":
+        encoder = _JsonLinesEncoder()
+    elif fmt == "parquet":
+        encoder = _ParquetEncoder()
+    else:
+        raise ValueError(f"Unknown export format {fmt!r}. Use one of: {', '.join(FORMATS)}.")
+    return _GzipEncoder(encoder) if compress else encoder
+
+
+def media_type(fmt: str, compress: bool = False) -> str:
+    return "application/gzip" if compress else FORMATS[fmt][0]
+
+
+def file_name(fmt: str, compress: bool = False) -> str:
+    return "transactions" + FORMATS[fmt][1] + (".gz" if compress else "")
+
+
+def _shard_rows(stmt, shard: int, chunk_size: int) -> Iterator[tuple]:
+    """Rows of stmt on one shard, with global transaction ids."""
+    with Session(shard_engines[shard]) as session:
+        for row in session.exec(stmt.execution_options(yield_per=chunk_size)):
+            yield (global_id(row[0], shard), *row[1:])
+
+
+def iter_export(
+    stmt, encoder, chunk_size: int = DEFAULT_CHUNK_SIZE, client_id: Optional[int] = None
+) -> Iterator[bytes]:
+    """
+    Encoded file contents of the rows of stmt, read chunk_size rows at a time.
+    With several shards, only client_id's shard is read when given.
+    """
+    data = encoder.begin()
+    if data:
+        yield data
+    if SHARD_COUNT == 1:
+        with Session(engine) as session:
+            result = session.exec(stmt.execution_options(yield_per=chunk_size))
+            for rows in result.partitions():
+                data = encoder.encode(rows)
+                if data:
+                    yield data
+    else:
+        shards = [shard_of(client_id)] if client_id else range(SHARD_COUNT)
+        rows = merge(*(_shard_rows(stmt, shard, chunk_size) for shard in shards), key=lambda row: row[0])
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            data = encoder.encode(chunk)
+            if data:
+                yield data
+    data = encoder.end()
+    if data:
+        yield data
+
+
+def export_transactions(
+    path: str,
+    fmt: str,
+    compress: bool = False,
+    start: date = None,
+    end: date = None,
+    client_id: int = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    verbose: bool = True,
+) -> int:
+    """Write the filtered transactions to `path` ("-": stdout). Returns the number of bytes written."""
+    from api_helpers import _apply_common_filters   # not at module level: api_helpers imports this module
+
+    stmt = _apply_common_filters(transactions_stmt(), start, end, client_id)
+    encoder = make_encoder(fmt, compress)
+    started = time.perf_counter()
+    written = 0
+    out = sys.stdout.buffer if path == "-" else open(path, "wb")
+    try:
+        for data in iter_export(stmt, encoder, chunk_size, client_id):
+            out.write(data)
+            written += len(data)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+    if verbose:
+        print(f"Exported {written:,} bytes of {fmt}{' (gzip)' if compress else ''} to {path} "
+              f"in {time.perf_counter() - started:.2f}s", file=sys.stderr)
+    return written
+
+
+def _format_of(path: str) -> str:
+    name = path[:-3] if path.endswith(".gz") else path
+    for fmt, (_, extension) in FORMATS.items():
+        if name.endswith(extension):
+            return fmt
+    return "csv"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export transactions as CSV, JSON-lines or Parquet.")
+    parser.add_argument("path", help='output file ("-" for stdout); the format follows its extension by default')
+    parser.add_argument("--format", choices=tuple(FORMATS), default=None)
+    parser.add_argument("--gzip", action="store_true", help="gzip the output (implied by a .gz path)")
+    parser.add_argument("--start", type=date.fromisoformat, default=None)
+    parser.add_argument("--end", type=date.fromisoformat, default=None)
+    parser.add_argument("--client-id", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+    for bind in shard_engines:
+        bind.echo = False
+    try:
+        export_transactions(
+            args.path,
+            args.format or _format_of(args.path),
+            args.gzip or args.path.endswith(".gz"),
+            args.start,
+            args.end,
+            args.client_id,
+            args.chunk_size,
+        )
+    except ValueError as exc:
+        parser.error(str(exc))
@@ -0,0 +1,228 @@
+"""
+Bulk import of bank statements into the Transaction table.
+
+Rows are streamed from a CSV file (header: id_client, nom_transaction,
+date_transaction, type_transaction, categorie, montant) or a JSON-lines file
+with the same keys, validated, and inserted batch by batch. Each batch is one
+database transaction that also records progress in IngestionJob, so an
+interrupted import resumes after the last committed batch. With several
+shards (BANK_SHARDS) each shard commits its rows with its own IngestionJob
+row, and a resumed import skips, per shard, the lines that shard already holds.
+
+The inserted rows don't record the file they came from, so they can't be
+taken out again: --restart (read the file from the first line, e.g. after
+adding the clients its rows were rejected for) is refused once the file has
+rows in the database, since they would be inserted a second time.
+
+Usage:
+    python ingestion.py releve.csv [--batch-size 5000] [--format csv|jsonl] [--restart]
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import os
+import time
+from contextlib import ExitStack
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+
+from sqlmodel import Session, select
+
+from tables__projet import (
+    Client,
+    IngestionJob,
+    add_transactions_batch,
+    create_db_and_table,
+    shard_engines,
+    shard_of,
+)
+
+COLUMNS = ("id_client", "nom_transaction", "date_transaction", "type_transaction", "categorie", "montant")
+MAX_LENGTHS = {"nom_transaction": 100, "type_transaction": 30, "categorie": 150}
+DEFAULT_BATCH_SIZE = 5000
+
+
+def _read_rows(path: str, fmt: str) -> Iterator[dict]:
+    """Yield raw records one at a time, without loading the file."""
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    yield {"__error__": "invalid JSON"}
+
+
+def validate_row(raw: dict, client_ids: set) -> Tuple[Optional[dict], Optional[str]]:
+    """
+    Convert one raw record into Transaction column values.
+    Returns (row, error_message).
+    """
+    if "__error__" in raw:
+        return None, raw["__error__"]
+    missing = [c for c in COLUMNS if raw.get(c) in (None, "")]
+    if missing:
+        return None, f"missing {', '.join(missing)}"
+    try:
+        id_client = int(raw["id_client"])
+    except (TypeError, ValueError):
+        return None, "id_client must be an integer"
+    if id_client not in client_ids:
+        return None, f"unknown client {id_client}"
+    try:
+        date_transaction = datetime.strptime(str(raw["date_transaction"]), "%Y-%m-%d").date()
+    except ValueError:
+        return None, "date_transaction must be YYYY-MM-DD"
+    try:
+        montant = float(raw["montant"])
+    except (TypeError, ValueError):
+        return None, "montant must be a number"
+    row = {
+        "id_client": id_client,
+        "date_transaction": date_transaction,
+        "montant": montant,
+    }
+    for column, max_length in MAX_LENGTHS.items():
+        value = str(raw[column]).strip()
+        if len(value) > max_length:
+            return None, f"{column} longer than {max_length} characters"
+        row[column] = value
+    return row, None
+
+
+def _combined_job(jobs: List[IngestionJob]) -> IngestionJob:
+    """The per-shard jobs of one import added up (the job itself with a single shard)."""
+    if len(jobs) == 1:
+        return jobs[0]
+    return IngestionJob(
+        source=jobs[0].source,
+        rows_read=max(job.rows_read for job in jobs),
+        rows_inserted=sum(job.rows_inserted for job in jobs),
+        rows_rejected=sum(job.rows_rejected for job in jobs),
+        finished=all(job.finished for job in jobs),
+        updated_at=max(job.updated_at for job in jobs),
+    )
+
+
+def ingest_transactions(
+    path: str,
+    fmt: Optional[str] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    restart: bool = False,
+    verbose: bool = True,
+) -> IngestionJob:
+    """
+    Import `path` into Transaction, committing every `batch_size` input rows.
+    Resumes from the last committed batch unless `restart` is set; raises
+    ValueError for a restart of a file that already has rows inserted.
+    Returns the final IngestionJob record (summed over the shards).
+    """
+    source = os.path.abspath(path)
+    fmt = fmt or ("jsonl" if path.endswith((".jsonl", ".ndjson", ".json")) else "csv")
+    create_db_and_table()
+
+    with ExitStack() as stack:
+        sessions = [stack.enter_context(Session(bind)) for bind in shard_engines]
+        client_ids = set()
+        jobs = []
+        for session in sessions:
+            client_ids.update(session.exec(select(Client.client_id)).all())
+            jobs.append(session.get(IngestionJob, source) or IngestionJob(source=source))
+        total = _combined_job(jobs)
+        if restart:
+            if total.rows_inserted:
+                raise ValueError(f"{total.rows_inserted} rows of {source} are already imported: "
+                                 "restarting would insert them a second time")
+            for job in jobs:
+                job.rows_read = job.rows_rejected = 0
+                job.finished = False
+        elif total.finished:
+            if verbose:
+                print(f"{source} already imported ({total.rows_inserted} rows)")
+            return total
+        # Shards commit one after the other: an interrupted batch may be on some of them only
+        skip = min(job.rows_read for job in jobs)
+        if skip and verbose:
+            print(f"Resuming {source} after {skip} rows")
+
+        started = time.perf_counter()
+        inserted_now = 0
+        batches: List[List[dict]] = [[] for _ in jobs]
+        rejected_in_batch = 0
+        read_in_batch = 0
+        line_number = skip
+
+        def commit_batch():
+            nonlocal rejected_in_batch, read_in_batch, inserted_now
+            # Rejected rows are counted on the first shard
+            jobs[0].rows_rejected += rejected_in_batch
+            for session, job, batch in zip(sessions, jobs, batches):
+                add_transactions_batch(session, batch)
+                job.rows_read = max(job.rows_read, line_number)
+                job.rows_inserted += len(batch)
+                job.updated_at = datetime.utcnow()
+                session.add(job)
+                session.commit()
+                inserted_now += len(batch)
+                batch.clear()
+            if verbose:
+                elapsed = time.perf_counter() - started
+                total = _combined_job(jobs)
+                print(f"  {total.rows_read} rows read, {total.rows_inserted} inserted, "
+                      f"{total.rows_rejected} rejected ({inserted_now / elapsed if elapsed else 0:,.0f} rows/s)")
+            rejected_in_batch, read_in_batch = 0, 0
+
+        for line_number, raw in enumerate(_read_rows(path, fmt), start=1):
+            if line_number <= skip:
+                continue
+            read_in_batch += 1
+            row, err = validate_row(raw, client_ids)
+            if err:
+                if line_number > jobs[0].rows_read:
+                    rejected_in_batch += 1
+                    if verbose:
+                        print(f"  row {line_number} rejected: {err}")
+            else:
+                shard = shard_of(row["id_client"])
+                if line_number > jobs[shard].rows_read:
+                    batches[shard].append(row)
+            if read_in_batch >= batch_size:
+                commit_batch()
+
+        commit_batch()
+        for session, job in zip(sessions, jobs):
+            job.finished = True
+            session.add(job)
+            session.commit()
+            session.refresh(job)
+        total = _combined_job(jobs)
+
+        if verbose:
+            elapsed = time.perf_counter() - started
+            print(f"Done: {inserted_now} rows inserted in {elapsed:.2f}s "
+                  f"({inserted_now / elapsed if elapsed else 0:,.0f} rows/s), "
+                  f"{total.rows_rejected} rejected in total")
+        return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk import transactions from CSV or JSON-lines.")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=("csv", "jsonl"), default=None)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--restart", action="store_true",
+                        help="read the file from the start again (only while none of its rows are imported)")
+    args = parser.parse_args()
+    for bind in shard_engines:
+        bind.echo = False
+    try:
+        ingest_transactions(args.path, args.format, args.batch_size, args.restart)
+    except ValueError as exc:
+        parser.error(str(exc))
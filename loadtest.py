@@ -0,0 +1,171 @@
+"""
+Throughput comparison of the WSGI app (app.py) and the ASGI app (asgi_app.py).
+
+Each server is started in its own process on the same database, then
+`--concurrency` threads call a mix of routes over keep-alive connections for
+`--seconds`. Reports requests/second and p50/p95 latency per server.
+
+Usage:
+    python loadtest.py --clients 1000 --transactions 100 [--concurrency 32] [--seconds 10]
+    python loadtest.py --skip-generate --routes /api/admin/clients,/api/admin/credit-scores
+"""
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from benchmark import _percentile
+
+DEFAULT_ROUTES = [
+    "/api/transactions/monthly?start=2024-03-15&end=2025-06-20",
+    "/api/transactions/category-averages",
+    "/api/admin/clients?limit=100",
+    "/api/admin/credit-requests?limit=100",
+    "/api/admin/credit-scores",
+    "/api/auth/current-user",
+]
+
+SERVERS = {
+    "wsgi": "from werkzeug.serving import run_simple; from app import app; "
+            "run_simple('127.0.0.1', {port}, app, threaded=True)",
+    "asgi": "import uvicorn; uvicorn.run('asgi_app:app', host='127.0.0.1', port={port}, log_level='warning')",
+}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_until_up(port: int, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+def _admin_cookie(port: int, email: str, password: str) -> str:
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    conn.request("POST", "/api/auth/login/admin", body=json.dumps({"email": email, "password": password}),
+                 headers={"Content-Type": "application/json"})
+    response = conn.getresponse()
+    response.read()
+    if response.status != 200:
+        raise RuntimeError(f"admin login failed: HTTP {response.status}")
+    return response.getheader("Set-Cookie").split(";", 1)[0]
+
+
+def load(port: int, routes, concurrency: int, seconds: float, cookie: str) -> dict:
+    timings = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker(offset):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        local, failed, i = [], 0, offset
+        while time.perf_counter() < deadline:
+            url = routes[i % len(routes)]
+            i += 1
+            t0 = time.perf_counter()
+            try:
+                conn.request("GET", url, headers={"Cookie": cookie})
+                response = conn.getresponse()
+                response.read()
+                if response.status >= 400:
+                    failed += 1
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+                continue
+            local.append((time.perf_counter() - t0) * 1000)
+        conn.close()
+        with lock:
+            timings.extend(local)
+            errors[0] += failed
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    timings.sort()
+    return {
+        "requests": len(timings),
+        "errors": errors[0],
+        "req_per_s": round(len(timings) / elapsed, 1),
+        "p50_ms": round(_percentile(timings, 50), 2),
+        "p95_ms": round(_percentile(timings, 95), 2),
+    }
+
+
+def run_server(kind: str, routes, concurrency: int, seconds: float) -> dict:
+    import datagen
+
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-c", SERVERS[kind].format(port=port)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        _wait_until_up(port)
+        cookie = _admin_cookie(port, datagen.ADMIN_EMAIL, datagen.ADMIN_PASSWORD)
+        # Warm up caches and pools before measuring
+        load(port, routes, concurrency, min(1.0, seconds), cookie)
+        return load(port, routes, concurrency, seconds, cookie)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare WSGI and ASGI throughput under concurrent load.")
+    parser.add_argument("--db", default="benchmark.db", help="SQLite file used for the load test")
+    parser.add_argument("--profile", default="production", help="storage profile of both servers")
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--transactions", type=int, default=100, help="transactions per client")
+    parser.add_argument("--skip-generate", action="store_true", help="reuse the existing --db file")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--routes", help="comma-separated URLs (default: a mix of read routes)")
+    parser.add_argument("--servers", default="wsgi,asgi")
+    args = parser.parse_args()
+
+    # Both the servers and the data generator read these at import time
+    os.environ["BANK_DB_FILE"] = args.db
+    os.environ["BANK_STORAGE_PROFILE"] = args.profile
+    if not args.skip_generate:
+        from tables__projet import shard_engines
+        import datagen
+
+        for bind in shard_engines:
+            bind.echo = False
+        datagen.generate(args.clients, args.transactions)
+
+    routes = args.routes.split(",") if args.routes else DEFAULT_ROUTES
+    for kind in args.servers.split(","):
+        r = run_server(kind, routes, args.concurrency, args.seconds)
+        print(f"{kind:5s} {r['req_per_s']:9,.1f} req/s  p50 {r['p50_ms']:8.2f}ms  p95 {r['p95_ms']:8.2f}ms  "
+              f"({r['requests']} requests, {r['errors']} errors)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Request-scoped instrumentation: SQL statement count, DB time and wall time
+per route, aggregated into histograms and rendered in the Prometheus text
+format (GET /metrics).
+
+The SQLAlchemy engine events add every statement to the collector of the
+request being served (a context variable, so concurrent requests on other
+threads don't mix). Requests that run more than `query_threshold`
+statements are logged with their statement list, which points at N+1 loops.
+"""
+from __future__ import annotations
+
+import bisect
+import contextvars
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger("bank.metrics")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # seconds
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+
+
+@dataclass
+class RequestStats:
+    started: float = field(default_factory=time.perf_counter)
+    statements: List[str] = field(default_factory=list)
+    db_time: float = 0.0
+
+
+_current: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar("request_stats", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)   # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        total = 0
+        result = []
+        for bound, n in zip([*(f"{b:g}" for b in self.buckets), "+Inf"], self.counts):
+            total += n
+            result.append((bound, total))
+        return result
+
+
+class RequestMetrics:
+    """Per-route histograms of wall time, DB time and statement count."""
+
+    def __init__(self, query_threshold: int = 20):
+        self.query_threshold = query_threshold
+        self._lock = threading.Lock()
+        self._requests: Dict[Tuple[str, str, int], int] = {}
+        self._wall: Dict[str, Histogram] = {}
+        self._db: Dict[str, Histogram] = {}
+        self._queries: Dict[str, Histogram] = {}
+
+    def start(self) -> RequestStats:
+        """Begin collecting the statements of the current request."""
+        stats = RequestStats()
+        _current.set(stats)
+        return stats
+
+    def finish(self, stats: RequestStats, route: str, method: str, status: int) -> None:
+        if _current.get() is stats:
+            _current.set(None)
+        wall = time.perf_counter() - stats.started
+        n_queries = len(stats.statements)
+        with self._lock:
+            key = (route, method, status)
+            self._requests[key] = self._requests.get(key, 0) + 1
+            self._wall.setdefault(route, Histogram(LATENCY_BUCKETS)).observe(wall)
+            self._db.setdefault(route, Histogram(LATENCY_BUCKETS)).observe(stats.db_time)
+            self._queries.setdefault(route, Histogram(QUERY_COUNT_BUCKETS)).observe(n_queries)
+        if self.query_threshold and n_queries > self.query_threshold:
+            logger.warning(
+                "%s %s ran %d SQL statements (%.1f ms in DB, %.1f ms total):\n%s",
+                method, route, n_queries, stats.db_time * 1000, wall * 1000,
+                "\n".join(f"  {i + 1}. {sql}" for i, sql in enumerate(stats.statements)),
+            )
+
+    def render(self) -> str:
+        """Prometheus text exposition format."""
+        lines = [
+            "# HELP bank_http_requests_total Requests served, by route, method and status.",
+            "# TYPE bank_http_requests_total counter",
+        ]
+        with self._lock:
+            for (route, method, status), n in sorted(self._requests.items()):
+                lines.append(f'bank_http_requests_total{{route="{route}",method="{method}",status="{status}"}} {n}')
+            for name, help_text, histograms in (
+                ("bank_http_request_duration_seconds", "Wall time per request.", self._wall),
+                ("bank_db_time_seconds", "Time spent executing SQL per request.", self._db),
+                ("bank_db_statements_per_request", "SQL statements executed per request.", self._queries),
+            ):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for route, histogram in sorted(histograms.items()):
+                    for bound, n in histogram.cumulative():
+                        lines.append(f'{name}_bucket{{route="{route}",le="{bound}"}} {n}')
+                    lines.append(f'{name}_sum{{route="{route}"}} {histogram.sum:.6f}')
+                    lines.append(f'{name}_count{{route="{route}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+
+_instrumented_engines = set()
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Attach (once) the statement counters to `engine`."""
+    if id(engine) in _instrumented_engines:
+        return
+    _instrumented_engines.add(id(engine))
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if _current.get() is not None:
+            conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        stats = _current.get()
+        if stats is None:
+            return
+        pending = conn.info.get("query_started")
+        if not pending:
+            return
+        started = pending.pop()
+        stats.db_time += time.perf_counter() - started
+        stats.statements.append(" ".join(statement.split()))
@@ -0,0 +1,285 @@
+"""
+Background precompute of the credit scores into ClientScore.
+
+ScoreScheduler is a daemon thread that rescores every client on a schedule
+(`interval` seconds, and once when it starts) and, in between, the clients
+whose transactions or profile changed: the transaction and profile listeners
+of tables__projet add them to a backlog, and the worker picks the backlog up
+after a short `debounce` so a burst of inserts is scored in one batch. A job
+runs on every shard at once, in a thread pool of the scheduler's own (the
+requests' fan_out pool stays free while it runs), `batch_size` clients per
+upsert transaction.
+
+Each ClientScore row records the inputs it was computed from (solde_initial
+and the client's transaction count), so readers can tell a stale row from a
+current one even when the change was made by another process (a CLI import):
+the admin client list scores those few rows inline until the next job.
+
+    python score_jobs.py    # rescore every client once and print the timing
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import case, func, or_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, select
+
+from scoring import score_clients
+from shards import fan_out
+from tables__projet import (
+    SHARD_COUNT,
+    Client,
+    ClientScore,
+    ClientSummary,
+    create_db_and_table,
+    shard_engines,
+    shard_of,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 5000
+
+
+def _score_inputs_stmt():
+    return (
+        select(
+            Client.client_id,
+            Client.solde_initial,
+            ClientSummary.income_total,
+            ClientSummary.expense_total,
+            ClientSummary.month_count,
+            ClientSummary.transaction_count,
+        )
+        .outerjoin(ClientSummary, ClientSummary.client_id == Client.client_id)
+        .order_by(Client.client_id)
+    )
+
+
+def _write_scores(session: Session, rows) -> None:
+    """Score (client_id, solde_initial, income, expense, months, count) rows and upsert them."""
+    scores = score_clients(
+        [row[1] for row in rows],
+        [row[2] or 0.0 for row in rows],
+        [row[3] or 0.0 for row in rows],
+        [row[4] or 0 for row in rows],
+    )
+    computed_at = datetime.utcnow()
+    table = ClientScore.__table__
+    stmt = sqlite_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.client_id],
+        set_={column.name: stmt.excluded[column.name] for column in table.c if column.name != "client_id"},
+    )
+    session.execute(stmt, [
+        {
+            "client_id": row[0],
+            "monthly_income": float(scores["monthlyIncome"][i]),
+            "credit_score": float(scores["creditScore"][i]),
+            "endebtment_ratio": float(scores["endebtmentRatio"][i]),
+            "status": str(scores["status"][i]),
+            "solde_initial": row[1],
+            "transaction_count": row[5] or 0,
+            "computed_at": computed_at,
+        }
+        for i, row in enumerate(rows)
+    ])
+    session.commit()
+
+
+def recompute_scores(bind, client_ids: Optional[Iterable[int]] = None,
+                     batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    Score the given clients of one shard (every client: None) into ClientScore,
+    one transaction per batch_size clients. Returns the number of clients scored.
+    """
+    scored = 0
+    with Session(bind) as session:
+        if client_ids is None:
+            # Keyset batches over the whole table
+            last_id = 0
+            while True:
+                rows = session.exec(
+                    _score_inputs_stmt().where(Client.client_id > last_id).limit(batch_size)
+                ).all()
+                if not rows:
+                    break
+                _write_scores(session, rows)
+                scored += len(rows)
+                last_id = rows[-1][0]
+        else:
+            ids = sorted(client_ids)
+            for start in range(0, len(ids), batch_size):
+                rows = session.exec(
+                    _score_inputs_stmt().where(Client.client_id.in_(ids[start:start + batch_size]))
+                ).all()
+                if rows:
+                    _write_scores(session, rows)
+                    scored += len(rows)
+    return scored
+
+
+def score_is_current(solde_initial: float, scored_solde_initial: Optional[float],
+                     scored_transaction_count: Optional[int], transaction_count: Optional[int]) -> bool:
+    """
+    Whether a client's ClientScore row (its solde_initial and transaction_count
+    columns; None without a row) was computed from the client's current inputs.
+    """
+    return (
+        scored_solde_initial is not None
+        and scored_solde_initial == solde_initial
+        and scored_transaction_count == (transaction_count or 0)
+    )
+
+
+def score_status_stmt():
+    """(clients, scored, stale, oldest computed_at) of one shard's ClientScore rows."""
+    stale = or_(
+        ClientScore.client_id.is_(None),
+        ClientScore.solde_initial != Client.solde_initial,
+        ClientScore.transaction_count != func.coalesce(ClientSummary.transaction_count, 0),
+    )
+    return (
+        select(
+            func.count(Client.client_id),
+            func.count(ClientScore.client_id),
+            func.coalesce(func.sum(case((stale, 1), else_=0)), 0),
+            func.min(ClientScore.computed_at),
+        )
+        .select_from(Client)
+        .outerjoin(ClientScore, ClientScore.client_id == Client.client_id)
+        .outerjoin(ClientSummary, ClientSummary.client_id == Client.client_id)
+    )
+
+
+def score_status_payload(rows, scheduler: Optional["ScoreScheduler"]) -> dict:
+    """Admin status: the scheduler's jobs and backlog, and the freshness of the stored scores (one row per shard)."""
+    oldest = min((row[3] for row in rows if row[3] is not None), default=None)
+    if isinstance(oldest, str):
+        oldest = datetime.fromisoformat(oldest)
+    return {
+        "scheduler": scheduler.stats() if scheduler is not None else None,
+        "scores": {
+            "clients": sum(row[0] for row in rows),
+            "scored": sum(row[1] for row in rows),
+            "stale": sum(row[2] for row in rows),
+            "oldestComputedAt": oldest.isoformat() if oldest else None,
+            "stalenessSeconds": (datetime.utcnow() - oldest).total_seconds() if oldest else None,
+        },
+    }
+
+
+class ScoreScheduler(threading.Thread):
+    """Daemon thread keeping ClientScore up to date (see the module docstring)."""
+
+    def __init__(self, interval: float = 300.0, debounce: float = 1.0, batch_size: int = DEFAULT_BATCH_SIZE):
+        super().__init__(name="score-scheduler", daemon=True)
+        self.interval = interval
+        self.debounce = debounce
+        self.batch_size = batch_size
+        self.runs = 0
+        self.failures = 0
+        self.last_run: Optional[dict] = None
+        self._backlog: Set[int] = set()
+        self._lock = threading.Lock()
+        self._running_since: Optional[datetime] = None
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=SHARD_COUNT, thread_name_prefix="score")
+
+    def mark_clients(self, client_ids) -> None:
+        """Transaction listener: rescore these clients soon."""
+        with self._lock:
+            self._backlog.update(client_ids)
+        self._wake.set()
+
+    def mark_profiles(self, changed) -> None:
+        """Profile listener: ("client", id) keys are rescored (solde_initial may have changed)."""
+        self.mark_clients(key[1] for key in changed if key[0] == "client")
+
+    def run(self):
+        full = True
+        while not self._stop_event.is_set():
+            self.run_job(full=full)
+            triggered = self._wake.wait(self.interval)
+            if triggered:
+                self._wake.clear()
+                # Let a burst of writes land in the backlog before scoring it
+                self._stop_event.wait(self.debounce)
+            full = not triggered
+        self._executor.shutdown(wait=False)
+
+    def run_job(self, full: bool = False) -> int:
+        """Rescore every client (full) or the backlog; returns the number of clients scored."""
+        with self._lock:
+            backlog, self._backlog = self._backlog, set()
+        if not full and not backlog:
+            return 0
+        started, t0 = datetime.utcnow(), time.perf_counter()
+        self._running_since = started
+        by_shard: Dict[int, List[int]] = {}
+        for client_id in backlog:
+            by_shard.setdefault(shard_of(client_id), []).append(client_id)
+
+        def score_shard(shard: int) -> int:
+            if full:
+                return recompute_scores(shard_engines[shard], None, self.batch_size)
+            if shard not in by_shard:
+                return 0
+            return recompute_scores(shard_engines[shard], by_shard[shard], self.batch_size)
+
+        try:
+            scored = sum(fan_out(score_shard, self._executor))
+        except Exception:
+            logger.exception("credit score job failed")
+            self.failures += 1
+            with self._lock:
+                self._backlog.update(backlog)
+            scored, error = 0, True
+        else:
+            error = False
+        finally:
+            self._running_since = None
+        self.runs += 1
+        self.last_run = {
+            "trigger": "schedule" if full else "transactions",
+            "startedAt": started.isoformat(),
+            "durationMs": round((time.perf_counter() - t0) * 1000, 1),
+            "clients": scored,
+            "failed": error,
+        }
+        return scored
+
+    def stats(self) -> dict:
+        with self._lock:
+            backlog = len(self._backlog)
+        running_since = self._running_since
+        return {
+            "alive": self.is_alive(),
+            "intervalSeconds": self.interval,
+            "runs": self.runs,
+            "failures": self.failures,
+            "backlog": backlog,
+            "runningSince": running_since.isoformat() if running_since else None,
+            "lastRun": self.last_run,
+        }
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake.set()
+
+
+if __name__ == "__main__":
+    for bind in shard_engines:
+        bind.echo = False
+    create_db_and_table()
+    t0 = time.perf_counter()
+    total = sum(recompute_scores(bind) for bind in shard_engines)
+    elapsed = time.perf_counter() - t0
+    print(f"{total} clients scored in {elapsed:.2f}s ({total / elapsed if elapsed else 0:,.0f} clients/s)")
@@ -0,0 +1,157 @@
+"""
+Credit scoring rules shared by the admin endpoints.
+
+`score_client` is the reference scalar implementation (the rules that used to
+live inline in admin_list_clients); `score_clients` applies the exact same
+rules to NumPy arrays so a whole client base is scored in one pass.
+"""
+from __future__ import annotations
+
+import time
+
+import numpy as np
+
+
+# Balance contribution: from 0 to +4 points
+BALANCE_TIERS = (250_000, 500_000, 1_000_000)
+
+# Debt ratio contribution: from -3 (très endetté) to +1 (peu endetté)
+DEBT_TIERS = ((0.8, -3.0), (0.6, -2.0), (0.45, -1.0), (0.30, 0.0))
+
+MIN_SCORE = 3.0
+MAX_SCORE = 9.0
+
+STATUSES = ("premium", "warning", "danger")
+STATUS_TEXTS = {
+    "premium": "Excellent",
+    "warning": "Conditionnel",
+    "danger": "Risque élevé",
+}
+
+
+def score_client(balance: float, income_total: float, expense_total: float, month_count: int) -> dict:
+    """
+    Score one client from its balance and transaction totals
+    (expense_total is the signed sum of negative amounts).
+    """
+    month_count = int(month_count or 1)
+
+    # Simple monthly aggregates
+    avg_income = float(income_total / month_count) if income_total > 0 else 0.0
+    avg_expense = float(abs(expense_total) / month_count) if expense_total < 0 else 0.0
+
+    # Robust debt ratio heuristic (0 <= debt_ratio <= 1)
+    denom = avg_income + (float(balance) / 12.0) + 1.0
+    debt_ratio = avg_expense / denom
+    debt_ratio = max(0.0, min(debt_ratio, 1.0))
+
+    if balance <= 0:
+        balance_score = 0.0
+    elif balance < BALANCE_TIERS[0]:
+        balance_score = 1.0
+    elif balance < BALANCE_TIERS[1]:
+        balance_score = 2.0
+    elif balance < BALANCE_TIERS[2]:
+        balance_score = 3.0
+    else:
+        balance_score = 4.0
+
+    debt_score = 1.0
+    for threshold, points in DEBT_TIERS:
+        if debt_ratio > threshold:
+            debt_score = points
+            break
+
+    # Base score + contributions, borné entre 3 et 9
+    raw_score = 5.0 + balance_score + debt_score
+    credit_score = max(MIN_SCORE, min(raw_score, MAX_SCORE))
+
+    # Mapping statut :
+    #  - score >= 8.0  => premium (même si le taux d'endettement est un peu élevé)
+    #  - 6.5 <= score < 8.0 => conditionnel
+    #  - sinon => risque élevé
+    if credit_score >= 8.0:
+        status = "premium"
+    elif credit_score >= 6.5:
+        status = "warning"
+    else:
+        status = "danger"
+
+    return {
+        "monthlyIncome": avg_income,
+        "endebtmentRatio": debt_ratio,
+        "creditScore": credit_score,
+        "status": status,
+    }
+
+
+def score_clients(balances, income_totals, expense_totals, month_counts) -> dict:
+    """
+    Vectorized version of `score_client` over equally sized arrays.
+    Returns arrays under the same keys; "status" holds the status strings.
+    """
+    balances = np.asarray(balances, dtype=np.float64)
+    income_totals = np.asarray(income_totals, dtype=np.float64)
+    expense_totals = np.asarray(expense_totals, dtype=np.float64)
+    month_counts = np.asarray(month_counts, dtype=np.float64)
+    month_counts = np.where(month_counts > 0, month_counts, 1.0)
+
+    avg_income = np.where(income_totals > 0, income_totals / month_counts, 0.0)
+    avg_expense = np.where(expense_totals < 0, np.abs(expense_totals) / month_counts, 0.0)
+
+    denom = avg_income + (balances / 12.0) + 1.0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        debt_ratio = np.clip(avg_expense / denom, 0.0, 1.0)
+
+    balance_score = np.select(
+        [balances <= 0, balances < BALANCE_TIERS[0], balances < BALANCE_TIERS[1], balances < BALANCE_TIERS[2]],
+        [0.0, 1.0, 2.0, 3.0],
+        default=4.0,
+    )
+    debt_score = np.select(
+        [debt_ratio > threshold for threshold, _ in DEBT_TIERS],
+        [points for _, points in DEBT_TIERS],
+        default=1.0,
+    )
+
+    credit_score = np.clip(5.0 + balance_score + debt_score, MIN_SCORE, MAX_SCORE)
+    status_code = np.select([credit_score >= 8.0, credit_score >= 6.5], [0, 1], default=2)
+
+    return {
+        "monthlyIncome": avg_income,
+        "endebtmentRatio": debt_ratio,
+        "creditScore": credit_score,
+        "status": np.asarray(STATUSES)[status_code],
+    }
+
+
+def benchmark(n: int = 100_000, seed: int = 0) -> None:
+    """Compare the scalar loop with the vectorized pass on n random clients."""
+    rng = np.random.default_rng(seed)
+    balances = rng.uniform(-100_000, 3_000_000, n)
+    incomes = rng.uniform(0, 5_000_000, n)
+    expenses = -rng.uniform(0, 5_000_000, n)
+    months = rng.integers(0, 24, n)
+
+    t0 = time.perf_counter()
+    scalar = [
+        score_client(b, i, e, m)
+        for b, i, e, m in zip(balances.tolist(), incomes.tolist(), expenses.tolist(), months.tolist())
+    ]
+    t1 = time.perf_counter()
+    vector = score_clients(balances, incomes, expenses, months)
+    t2 = time.perf_counter()
+
+    assert [s["creditScore"] for s in scalar] == vector["creditScore"].tolist()
+    assert [s["endebtmentRatio"] for s in scalar] == vector["endebtmentRatio"].tolist()
+    assert [s["status"] for s in scalar] == vector["status"].tolist()
+
+    print(f"{n} clients")
+    print(f"  scalar:     {t1 - t0:.3f}s ({n / (t1 - t0):,.0f} clients/s)")
+    print(f"  vectorized: {t2 - t1:.3f}s ({n / (t2 - t1):,.0f} clients/s)")
+
+
+if __name__ == "__main__":
+    import sys
+
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
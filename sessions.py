@@ -0,0 +1,228 @@
+"""
+Server-side sessions for the Flask app.
+
+The session cookie only carries a signed random session id; the session data
+lives in a SessionStore together with the serialized profile of the logged-in
+user, so GET /api/auth/current-user can answer without a database query.
+Profiles are dropped from the store when the Client / Administrateur row
+changes (see add_profile_listener in tables__projet.py), and a client's when
+its transactions change, since the profile holds its balance.
+
+MemorySessionStore keeps everything in the process. Another backend (Redis,
+a database table...) only needs to implement the SessionStore methods.
+"""
+from __future__ import annotations
+
+import json
+import secrets
+import threading
+import time
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer
+from werkzeug.datastructures import CallbackDict
+
+UserKey = Tuple[str, int]   # ("client" | "admin", id)
+
+
+class SessionStore:
+    """
+    Backend interface. A record is a JSON-serializable dict:
+    {"data": session dict, "profile": user profile dict or None}.
+    """
+
+    def load(self, sid: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    def save(self, sid: str, record: dict, ttl: float) -> None:
+        raise NotImplementedError
+
+    def delete(self, sid: str) -> None:
+        raise NotImplementedError
+
+    def drop_profiles(self, users: Iterable[UserKey]) -> None:
+        """Forget the cached profile of these users in all their sessions."""
+        raise NotImplementedError
+
+    def drop_client_profiles(self, client_ids: Iterable[int]) -> None:
+        """add_transaction_listener callback: the profile of a client holds its balance."""
+        self.drop_profiles([("client", client_id) for client_id in client_ids])
+
+
+def _user_key(data: dict) -> Optional[UserKey]:
+    if data.get("user_type") and data.get("user_id"):
+        return data["user_type"], int(data["user_id"])
+    return None
+
+
+class MemorySessionStore(SessionStore):
+    def __init__(self, max_sessions: int = 100_000):
+        self.max_sessions = max_sessions
+        self._records: Dict[str, Tuple[float, str]] = {}   # sid -> (expires, serialized record)
+        self._sids_by_user: Dict[UserKey, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def load(self, sid: str) -> Optional[dict]:
+        with self._lock:
+            item = self._records.get(sid)
+            if item is None:
+                return None
+            if item[0] < time.time():
+                self._remove(sid)
+                return None
+            return json.loads(item[1])
+
+    def save(self, sid: str, record: dict, ttl: float) -> None:
+        serialized = json.dumps(record, separators=(",", ":"))
+        with self._lock:
+            if sid in self._records:
+                self._remove(sid)
+            elif len(self._records) >= self.max_sessions:
+                self._purge_expired()
+                if len(self._records) >= self.max_sessions:
+                    # Evict the session closest to expiry
+                    self._remove(min(self._records, key=lambda s: self._records[s][0]))
+            self._records[sid] = (time.time() + ttl, serialized)
+            user = _user_key(record["data"])
+            if user:
+                self._sids_by_user.setdefault(user, set()).add(sid)
+
+    def delete(self, sid: str) -> None:
+        with self._lock:
+            if sid in self._records:
+                self._remove(sid)
+
+    def drop_profiles(self, users: Iterable[UserKey]) -> None:
+        with self._lock:
+            for user in users:
+                for sid in self._sids_by_user.get(tuple(user), ()):
+                    expires, serialized = self._records[sid]
+                    record = json.loads(serialized)
+                    record["profile"] = None
+                    self._records[sid] = (expires, json.dumps(record, separators=(",", ":")))
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def _purge_expired(self) -> None:
+        now = time.time()
+        for sid in [s for s, (expires, _) in self._records.items() if expires < now]:
+            self._remove(sid)
+
+    def _remove(self, sid: str) -> None:
+        _, serialized = self._records.pop(sid)
+        user = _user_key(json.loads(serialized)["data"])
+        sids = self._sids_by_user.get(user)
+        if sids is not None:
+            sids.discard(sid)
+            if not sids:
+                del self._sids_by_user[user]
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid: Optional[str] = None, new: bool = False, profile: Optional[dict] = None):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self._profile = profile
+        self.profile_modified = False
+        self.replaced_sid: Optional[str] = None
+
+    @property
+    def profile(self) -> Optional[dict]:
+        """Cached profile of the logged-in user, or None if it must be read from the database."""
+        return self._profile
+
+    @profile.setter
+    def profile(self, value: Optional[dict]) -> None:
+        self._profile = value
+        self.profile_modified = True
+
+    def clear(self) -> None:
+        super().clear()
+        self._profile = None
+
+    def regenerate(self) -> None:
+        """
+        Start over under a new random session id (on login, against session
+        fixation): the data is cleared, and the record of the old id is deleted
+        when the response is saved.
+        """
+        if self.replaced_sid is None and not self.new:
+            self.replaced_sid = self.sid
+        self.clear()
+        self.sid = secrets.token_urlsafe(32)
+        self.new = True
+        self.modified = True
+
+
+class ServerSideSessionInterface(SessionInterface):
+    salt = "bank-session-id"
+
+    def __init__(self, store: SessionStore):
+        self.store = store
+
+    def _signer(self, app) -> Optional[Signer]:
+        if not app.secret_key:
+            return None
+        return Signer(app.secret_key, salt=self.salt)
+
+    def open_session(self, app, request) -> Optional[ServerSession]:
+        signer = self._signer(app)
+        if signer is None:
+            return None
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = signer.unsign(cookie).decode()
+            except BadSignature:
+                sid = None
+            record = self.store.load(sid) if sid else None
+            if record is not None:
+                return ServerSession(record["data"], sid=sid, profile=record.get("profile"))
+        return ServerSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session: ServerSession, response) -> None:
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+
+        if session.accessed:
+            response.vary.add("Cookie")
+        if session.replaced_sid is not None:
+            self.store.delete(session.replaced_sid)
+
+        if not session:
+            if session.modified:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path, secure=secure,
+                                       samesite=samesite, httponly=httponly)
+                response.vary.add("Cookie")
+            return
+
+        if session.modified or session.profile_modified:
+            self.store.save(
+                session.sid,
+                {"data": dict(session), "profile": session.profile},
+                app.permanent_session_lifetime.total_seconds(),
+            )
+        if session.new or self.should_set_cookie(app, session):
+            response.set_cookie(
+                name,
+                self._signer(app).sign(session.sid).decode(),
+                expires=self.get_expiration_time(app, session),
+                httponly=httponly,
+                domain=domain,
+                path=path,
+                secure=secure,
+                samesite=samesite,
+            )
+            response.vary.add("Cookie")
@@ -0,0 +1,81 @@
+"""
+Fan-out helpers for the hash-partitioned storage (BANK_SHARDS, see
+tables__projet.shard_engines).
+
+A client's rows all live on shard `client_id % SHARD_COUNT`, so per-client
+requests open a session on that one file. Bank-wide requests run the same
+statement on every shard in a thread pool and merge the results (SQLite
+releases the GIL while it executes, so the shards are read in parallel).
+
+Transaction and credit request ids are allocated by each file, so the API
+exposes them as global ids: local_id * SHARD_COUNT + shard. With a single
+shard the global id is the local id.
+"""
+from __future__ import annotations
+
+import contextvars
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
+
+from tables__projet import SHARD_COUNT, shard_of
+
+T = TypeVar("T")
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def fan_out(fn: Callable[[int], T], executor: Optional[ThreadPoolExecutor] = None) -> List[T]:
+    """
+    Run fn(shard) for every shard concurrently; results come back in shard
+    order. The pool is the one shared by the requests unless `executor` is
+    given: background jobs pass their own, so they never hold its workers.
+    """
+    global _executor
+    if SHARD_COUNT == 1:
+        return [fn(0)]
+    if executor is None:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=SHARD_COUNT, thread_name_prefix="shard")
+        executor = _executor
+    # Each task runs in a copy of the caller's context, so its statements are
+    # still counted in the request's metrics
+    futures = [executor.submit(contextvars.copy_context().run, fn, shard) for shard in range(SHARD_COUNT)]
+    return [future.result() for future in futures]
+
+
+def merge_sorted(lists: Iterable[Iterable[T]], key: Callable[[T], object], reverse: bool = False,
+                 limit: Optional[int] = None) -> List[T]:
+    """Merge per-shard result lists, each already sorted by key, keeping the first `limit` items."""
+    return list(islice(heapq.merge(*lists, key=key, reverse=reverse), limit))
+
+
+def global_id(local_id: int, shard: int) -> int:
+    return local_id * SHARD_COUNT + shard
+
+
+def split_global_id(gid: int) -> Tuple[int, int]:
+    """(shard, local id) of a global id."""
+    return gid % SHARD_COUNT, gid // SHARD_COUNT
+
+
+def row_global_id(local_id: int, client_id: int) -> int:
+    """Global id of a row of client_id (rows live on their client's shard)."""
+    return global_id(local_id, shard_of(client_id))
+
+
+def global_id_column(id_column, client_id_column):
+    """SQL expression of row_global_id, for keyset cursors over global ids."""
+    if SHARD_COUNT == 1:
+        return id_column
+    return id_column * SHARD_COUNT + client_id_column % SHARD_COUNT
+
+
+def ids_by_shard(gids: Iterable[int]) -> Dict[int, List[int]]:
+    """Group global ids by shard, as local ids."""
+    grouped: Dict[int, List[int]] = {}
+    for gid in gids:
+        shard, local_id = split_global_id(gid)
+        grouped.setdefault(shard, []).append(local_id)
+    return grouped
@@ -0,0 +1,223 @@
+"""
+Streaming statistics for the per-category rollups: running count / sum /
+sum of squares (mean, variance) and a mergeable quantile sketch.
+
+TDigest is the merging t-digest (Dunning): values are summarized by at most
+about `compression` weighted centroids, small near the tails and larger near
+the median, so percentiles are approximate but the digests of two months (or
+two clients) merge into the digest of their union. Digests with fewer values
+than centroids are exact.
+
+    python sketches.py [N]
+
+compares the sketch percentiles of N random amounts with numpy's exact ones.
+"""
+from __future__ import annotations
+
+import math
+import time
+from typing import Iterable, Optional
+
+import numpy as np
+
+DEFAULT_COMPRESSION = 200
+
+
+class TDigest:
+    def __init__(self, compression: float = DEFAULT_COMPRESSION):
+        self.compression = compression
+        self._means = np.empty(0)
+        self._weights = np.empty(0)
+        self._buffer: list = []
+        self.min = math.inf
+        self.max = -math.inf
+
+    @property
+    def count(self) -> float:
+        return float(self._weights.sum()) + len(self._buffer)
+
+    def add(self, value: float) -> None:
+        value = float(value)
+        self._buffer.append(value)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if len(self._buffer) >= 10 * self.compression:
+            self._compress()
+
+    def update(self, values: Iterable[float]) -> "TDigest":
+        if isinstance(values, np.ndarray):
+            if values.size:
+                self._compress(values.astype(float, copy=False))
+        else:
+            for value in values:
+                self.add(value)
+        return self
+
+    def merge(self, other: "TDigest") -> "TDigest":
+        """Fold `other` into this digest (returns self)."""
+        other._compress()
+        if other._weights.size:
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+            self._compress(other._means, other._weights)
+        return self
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Approximate value at quantile q (0..1), or None for an empty digest."""
+        self._compress()
+        means, weights = self._means, self._weights
+        if not weights.size:
+            return None
+        if weights.size == 1:
+            return float(means[0])
+        total = weights.sum()
+        if total <= self.compression:
+            # Every value is still kept as is
+            return float(np.quantile(np.repeat(means, weights.astype(int)), q))
+        target = min(max(q, 0.0), 1.0) * total
+        # Each centroid is centered on the middle of its cumulative weight
+        centers = np.cumsum(weights) - weights / 2
+        if target <= centers[0]:
+            if weights[0] <= 1:
+                return float(means[0])
+            return float(self.min + (means[0] - self.min) * target / centers[0])
+        if target >= centers[-1]:
+            if weights[-1] <= 1:
+                return float(means[-1])
+            return float(means[-1] + (self.max - means[-1]) * (target - centers[-1]) / (total - centers[-1]))
+        i = int(np.searchsorted(centers, target, side="right")) - 1
+        t = (target - centers[i]) / (centers[i + 1] - centers[i])
+        return float(means[i] + (means[i + 1] - means[i]) * t)
+
+    def to_bytes(self) -> bytes:
+        """min, max, then the centroid means and weights (little-endian float64)."""
+        self._compress()
+        return np.concatenate(([self.min, self.max], self._means, self._weights)).astype("<f8").tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: Optional[bytes], compression: float = DEFAULT_COMPRESSION) -> "TDigest":
+        digest = cls(compression)
+        if data:
+            values = np.frombuffer(data, dtype="<f8")
+            n = (values.size - 2) // 2
+            digest.min, digest.max = float(values[0]), float(values[1])
+            digest._means = values[2:2 + n].copy()
+            digest._weights = values[2 + n:].copy()
+        return digest
+
+    def _compress(self, means: Optional[np.ndarray] = None, weights: Optional[np.ndarray] = None) -> None:
+        buffered, self._buffer = self._buffer, []
+        if means is not None and weights is None:
+            self.min = min(self.min, float(means.min()))
+            self.max = max(self.max, float(means.max()))
+            weights = np.ones(means.size)
+        if means is None and not buffered:
+            return
+        size = self._means.size + len(buffered) + (means.size if means is not None else 0)
+        if size <= self.compression:
+            # Few enough values to keep them all (exact); equal values still merge.
+            # Plain lists: numpy's per-call overhead dominates on a handful of values
+            merged: dict = {}
+            for value in buffered:
+                merged[value] = merged.get(value, 0.0) + 1.0
+            for part_m, part_w in ((self._means, self._weights), (means, weights)):
+                if part_m is not None:
+                    for mean, weight in zip(part_m.tolist(), part_w.tolist()):
+                        merged[mean] = merged.get(mean, 0.0) + weight
+            ordered = sorted(merged)
+            self._means = np.array(ordered)
+            self._weights = np.array([merged[mean] for mean in ordered])
+            return
+        parts_m = [self._means, np.asarray(buffered, dtype=float)]
+        parts_w = [self._weights, np.ones(len(buffered))]
+        if means is not None:
+            parts_m.append(means)
+            parts_w.append(weights)
+        all_means = np.concatenate(parts_m)
+        all_weights = np.concatenate(parts_w)
+        order = np.argsort(all_means, kind="mergesort")
+        all_means, all_weights = all_means[order], all_weights[order]
+
+        total = all_weights.sum()
+        # Each value goes to the centroid of the unit of the k1 scale function
+        # k(q) = compression / (2 pi) * asin(2q - 1) where its quantile starts
+        # (one vectorized pass instead of a greedy loop over the values)
+        cumulative = np.cumsum(all_weights)
+        q = np.clip((cumulative - all_weights) / total, 0.0, 1.0)
+        k = self.compression / (2 * math.pi) * np.arcsin(2 * q - 1)
+        bins = np.floor(k - k[0]).astype(np.int64)
+        starts = np.flatnonzero(np.concatenate(([True], bins[1:] != bins[:-1])))
+        self._weights = np.add.reduceat(all_weights, starts)
+        self._means = np.add.reduceat(all_means * all_weights, starts) / self._weights
+
+
+class RunningStats:
+    """Count, sum, sum of squares and a TDigest of a stream of amounts (mergeable)."""
+
+    def __init__(self, count: int = 0, total: float = 0.0, sum_squares: float = 0.0,
+                 digest: Optional[TDigest] = None):
+        self.count = count
+        self.total = total
+        self.sum_squares = sum_squares
+        self.digest = digest if digest is not None else TDigest()
+
+    def update(self, values) -> "RunningStats":
+        if isinstance(values, np.ndarray):
+            values = values.astype(float, copy=False)
+            self.count += int(values.size)
+            self.total += float(values.sum())
+            self.sum_squares += float(np.square(values).sum())
+        else:
+            values = [float(value) for value in values]
+            self.count += len(values)
+            self.total += sum(values)
+            self.sum_squares += sum(value * value for value in values)
+        self.digest.update(values)
+        return self
+
+    def merge(self, other: "RunningStats") -> "RunningStats":
+        self.count += other.count
+        self.total += other.total
+        self.sum_squares += other.sum_squares
+        self.digest.merge(other.digest)
+        return self
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    @property
+    def variance(self) -> float:
+        """Population variance, from the running sums."""
+        if not self.count:
+            return 0.0
+        return max(self.sum_squares / self.count - self.mean ** 2, 0.0)
+
+
+def benchmark(n: int = 100_000) -> None:
+    """Sketch percentiles vs numpy on lognormal amounts, built in 36 monthly digests then merged."""
+    rng = np.random.default_rng(42)
+    values = -rng.lognormal(mean=10, sigma=1.2, size=n).round()
+    months = np.array_split(values, 36)
+
+    t0 = time.perf_counter()
+    digests = [TDigest().update(month) for month in months]
+    t1 = time.perf_counter()
+    merged = TDigest()
+    for digest in digests:
+        merged.merge(TDigest.from_bytes(digest.to_bytes()))
+    t2 = time.perf_counter()
+
+    print(f"{n} values, 36 monthly digests of {np.mean([len(d.to_bytes()) for d in digests]):.0f} bytes")
+    print(f"  build: {(t1 - t0) * 1000:8.1f} ms   merge: {(t2 - t1) * 1000:8.1f} ms")
+    for q in (0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99):
+        exact = float(np.quantile(values, q))
+        approx = merged.quantile(q)
+        rank = float(np.mean(values <= approx))
+        print(f"  p{q * 100:<4g} exact {exact:14,.0f}  sketch {approx:14,.0f}  rank error {abs(rank - q):.4f}")
+
+
+if __name__ == "__main__":
+    import sys
+
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
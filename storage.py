@@ -0,0 +1,273 @@
+"""
+SQLite storage profiles for the engine defined in tables__projet.py.
+
+A profile bundles the engine options (statement logging, connection pool
+bounds) and the PRAGMAs applied to every new pooled connection. The active
+profile is chosen with the BANK_STORAGE_PROFILE environment variable
+("development" by default, or "production").
+
+The production profile runs in WAL mode, so readers no longer block behind
+a writer. A background thread checkpoints the WAL periodically so it does
+not grow without bound.
+
+BANK_SHARDS=N (default 1) spreads the per-client tables over N files, so
+writers for different clients lock different files (see shard_file_name
+and tables__projet.shard_engines).
+
+    python storage.py [--seconds 5] [--readers 8] [--writers 2]
+
+benchmarks concurrent read/write throughput under each profile.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+
+@dataclass(frozen=True)
+class StorageProfile:
+    name: str
+    echo: bool = False
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30.0
+    busy_timeout_ms: int = 5000
+    pragmas: Dict[str, object] = field(default_factory=dict)
+    checkpoint_interval: Optional[float] = None   # seconds, None = no background checkpoints
+
+
+PROFILES = {
+    # Default SQLite settings and full SQL logging, as during development
+    "development": StorageProfile(
+        name="development",
+        echo=True,
+        pool_size=5,
+        max_overflow=10,
+        pragmas={},
+    ),
+    # Tuned for a threaded server (e.g. waitress/gunicorn --threads)
+    "production": StorageProfile(
+        name="production",
+        echo=False,
+        pool_size=8,
+        max_overflow=8,
+        pool_timeout=10.0,
+        pragmas={
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",          # durable at each checkpoint, safe with WAL
+            "cache_size": -64000,             # 64 MiB page cache per connection
+            "mmap_size": 268435456,           # 256 MiB memory-mapped reads
+            "temp_store": "MEMORY",
+            # Checkpoints normally run on the background thread; this is a safety net
+            # for processes that don't start it (CLI imports)
+            "wal_autocheckpoint": 10000,
+        },
+        checkpoint_interval=30.0,
+    ),
+}
+
+
+def get_profile(name: Optional[str] = None) -> StorageProfile:
+    name = name or os.environ.get("BANK_STORAGE_PROFILE", "development")
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown storage profile {name!r}; choose one of {sorted(PROFILES)}") from None
+
+
+def get_shard_count() -> int:
+    """Number of SQLite files the per-client tables are hash-partitioned over (BANK_SHARDS)."""
+    raw = os.environ.get("BANK_SHARDS", "1")
+    try:
+        count = int(raw)
+    except ValueError:
+        count = 0
+    if count < 1:
+        raise ValueError(f"BANK_SHARDS must be a positive integer, got {raw!r}")
+    return count
+
+
+def shard_file_name(sqlite_file_name: str, shard: int) -> str:
+    """Shard 0 is the main database file itself; shard k is <name>.shard<k>.db next to it."""
+    if shard == 0:
+        return sqlite_file_name
+    root, extension = os.path.splitext(sqlite_file_name)
+    return f"{root}.shard{shard}{extension or '.db'}"
+
+
+def make_engine(sqlite_file_name: str, profile: StorageProfile) -> Engine:
+    """Create the SQLite engine for `profile`, applying its PRAGMAs on every new connection."""
+    engine = create_engine(
+        f"sqlite:///{sqlite_file_name}",
+        connect_args={"check_same_thread": False, "timeout": profile.busy_timeout_ms / 1000},
+        echo=profile.echo,
+        poolclass=QueuePool,
+        pool_size=profile.pool_size,
+        max_overflow=profile.max_overflow,
+        pool_timeout=profile.pool_timeout,
+        pool_pre_ping=False,
+    )
+
+    _install_pragmas(engine, profile)
+    engine.storage_profile = profile
+    return engine
+
+
+def make_async_engine(sqlite_file_name: str, profile: StorageProfile):
+    """Async (aiosqlite) counterpart of make_engine, used by the ASGI app."""
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    async_engine = create_async_engine(
+        f"sqlite+aiosqlite:///{sqlite_file_name}",
+        connect_args={"timeout": profile.busy_timeout_ms / 1000},
+        echo=profile.echo,
+        pool_size=profile.pool_size,
+        max_overflow=profile.max_overflow,
+        pool_timeout=profile.pool_timeout,
+    )
+    _install_pragmas(async_engine.sync_engine, profile)
+    async_engine.sync_engine.storage_profile = profile
+    return async_engine
+
+
+def _install_pragmas(engine: Engine, profile: StorageProfile) -> None:
+    @event.listens_for(engine, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA busy_timeout={int(profile.busy_timeout_ms)}")
+        for pragma, value in profile.pragmas.items():
+            cursor.execute(f"PRAGMA {pragma}={value}")
+        cursor.close()
+
+
+class WalCheckpointer(threading.Thread):
+    """Daemon thread running PRAGMA wal_checkpoint every `interval` seconds."""
+
+    def __init__(self, engine: Engine, interval: float, mode: str = "PASSIVE"):
+        super().__init__(name="wal-checkpointer", daemon=True)
+        self.engine = engine
+        self.interval = interval
+        self.mode = mode
+        self.checkpoints = 0
+        self.last_result = None
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.checkpoint()
+
+    def checkpoint(self):
+        # Returns (busy, wal pages, pages checkpointed)
+        with self.engine.connect() as conn:
+            self.last_result = tuple(conn.exec_driver_sql(f"PRAGMA wal_checkpoint({self.mode})").one())
+        self.checkpoints += 1
+        return self.last_result
+
+    def stop(self):
+        self._stop_event.set()
+
+
+_checkpointers: Dict[int, WalCheckpointer] = {}
+_checkpointers_lock = threading.Lock()
+
+
+def start_wal_checkpointer(engine: Engine) -> Optional[WalCheckpointer]:
+    """Start (once per engine) the background checkpointer if the engine's profile asks for it."""
+    profile = getattr(engine, "storage_profile", None)
+    if profile is None or not profile.checkpoint_interval:
+        return None
+    with _checkpointers_lock:
+        checkpointer = _checkpointers.get(id(engine))
+        if checkpointer is None or not checkpointer.is_alive():
+            checkpointer = WalCheckpointer(engine, profile.checkpoint_interval)
+            checkpointer.start()
+            _checkpointers[id(engine)] = checkpointer
+        return checkpointer
+
+
+def benchmark(seconds: float = 5.0, readers: int = 8, writers: int = 2) -> None:
+    """Concurrent read/write throughput on a scratch database, once per profile."""
+    import tempfile
+    import time
+    from dataclasses import replace
+    from datetime import date
+
+    from sqlalchemy import func, insert, select
+    from sqlmodel import SQLModel
+
+    from tables__projet import Transaction
+
+    for name, profile in PROFILES.items():
+        profile = replace(profile, echo=False, checkpoint_interval=profile.checkpoint_interval and 1.0)
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = make_engine(os.path.join(tmp, "bench.db"), profile)
+            SQLModel.metadata.create_all(engine)
+            with engine.begin() as conn:
+                conn.execute(insert(Transaction.__table__), [
+                    {"id_client": i % 100, "nom_transaction": f"T{i}", "date_transaction": date(2025, 1, 1 + i % 28),
+                     "type_transaction": "paiement", "categorie": "Seed", "montant": float(i % 1000 - 500)}
+                    for i in range(20_000)
+                ])
+
+            checkpointer = WalCheckpointer(engine, profile.checkpoint_interval) if profile.checkpoint_interval else None
+            if checkpointer:
+                checkpointer.start()
+
+            deadline = time.perf_counter() + seconds
+            counts = {"reads": 0, "writes": 0, "errors": 0}
+            lock = threading.Lock()
+
+            def reader(i):
+                stmt = select(func.count(), func.sum(Transaction.montant)).where(Transaction.id_client == i % 100)
+                n = 0
+                while time.perf_counter() < deadline:
+                    with engine.connect() as conn:
+                        conn.execute(stmt).one()
+                    n += 1
+                with lock:
+                    counts["reads"] += n
+
+            def writer(i):
+                n = errors = 0
+                while time.perf_counter() < deadline:
+                    try:
+                        with engine.begin() as conn:
+                            conn.execute(insert(Transaction.__table__), {
+                                "id_client": i, "nom_transaction": "W", "date_transaction": date(2025, 2, 1),
+                                "type_transaction": "paiement", "categorie": "Bench", "montant": -1.0})
+                        n += 1
+                    except Exception:
+                        errors += 1
+                with lock:
+                    counts["writes"] += n
+                    counts["errors"] += errors
+
+            threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+            threads += [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            if checkpointer:
+                checkpointer.stop()
+            engine.dispose()
+
+        print(f"{name:12s} reads/s {counts['reads'] / seconds:10,.0f}   writes/s {counts['writes'] / seconds:8,.0f}"
+              f"   write errors {counts['errors']}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Concurrent read/write throughput per storage profile.")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    args = parser.parse_args()
+    benchmark(args.seconds, args.readers, args.writers)
@@ -1,8 +1,18 @@
-from sqlmodel import Field, SQLModel, create_engine,Session,Relationship
+from sqlmodel import Field, SQLModel, Session,Relationship, select
+from sqlalchemy import Index, bindparam, case, delete, event, func, insert, inspect, literal, tuple_, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from typing import List, Optional
 import hashlib
+import os
 import random
-from datetime import date, datetime
+from itertools import groupby
+import sys
+import types
+import weakref
+from datetime import date, datetime, timedelta
+
+from sketches import RunningStats, TDigest
+from storage import get_profile, get_shard_count, make_engine, shard_file_name
 
 
 def hash_mdp(mdp):
@@ -43,7 +53,20 @@ class Client(SQLModel, table=True):
     cryptogramme: int
     transactions: List["Transaction"] = Relationship(back_populates="client")
 
+# Case-insensitive name prefix search (admin credit-request search)
+Index("ix_client_nom_lower", func.lower(Client.nom))
+Index("ix_client_prenom_lower", func.lower(Client.prenom))
+
+def _year_month_default(context):
+    d = context.get_current_parameters()["date_transaction"]
+    return d.year * 100 + d.month if d else None
+
 class Transaction(SQLModel, table=True):
+    __table_args__ = (
+        # Analytics filter on a client and/or a date range, or group per category
+        Index("ix_transaction_client_date", "id_client", "date_transaction"),
+        Index("ix_transaction_categorie_date", "categorie", "date_transaction"),
+    )
     id_transaction: Optional[int] = Field(default=None, primary_key=True)
     id_client: int = Field(foreign_key="client.client_id")
     nom_transaction: str = Field(max_length=100)
@@ -51,9 +74,17 @@ class Transaction(SQLModel, table=True):
     type_transaction: str = Field(max_length=30)
     categorie: str = Field(max_length=150)
     montant: float = Field(default=0.0)
+    # YYYYMM of date_transaction, filled at insert time (ORM and Core inserts)
+    year_month: Optional[int] = Field(default=None, index=True, sa_column_kwargs={"default": _year_month_default})
     client: Optional["Client"] = Relationship(back_populates="transactions")
 
 class CreditRequest(SQLModel, table=True):
+    __table_args__ = (
+        # Admin list / search: newest first, overall, per status or per client
+        Index("ix_creditrequest_created", "created_at"),
+        Index("ix_creditrequest_status_created", "status", "created_at"),
+        Index("ix_creditrequest_client_created", "client_id", "created_at"),
+    )
     id: Optional[int] = Field(default=None, primary_key=True)
     client_id: int = Field(foreign_key="client.client_id")
     amount: float
@@ -62,18 +93,753 @@ class CreditRequest(SQLModel, table=True):
     status: str = Field(default="pending")
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
-sqlite_file_name = "database.db"
+class ClientSummary(SQLModel, table=True):
+    """Running per-client totals over Transaction, updated on every insert."""
+    client_id: int = Field(primary_key=True, foreign_key="client.client_id")
+    income_total: float = Field(default=0.0)      # sum of positive amounts
+    expense_total: float = Field(default=0.0)     # sum of negative amounts (signed)
+    amount_total: float = Field(default=0.0)      # sum of all amounts
+    transaction_count: int = Field(default=0)
+    month_count: int = Field(default=0)           # distinct active YYYY-MM
+
+class ClientScore(SQLModel, table=True):
+    """
+    Credit score of a client (scoring.score_clients), precomputed in the background
+    by score_jobs.py. solde_initial and transaction_count are the inputs it was
+    computed from: a row whose inputs no longer match is stale.
+    """
+    client_id: int = Field(primary_key=True, foreign_key="client.client_id")
+    monthly_income: float = Field(default=0.0)
+    credit_score: float = Field(default=0.0)
+    endebtment_ratio: float = Field(default=0.0)
+    status: str = Field(max_length=10)
+    solde_initial: float = Field(default=0.0)
+    transaction_count: int = Field(default=0)
+    computed_at: datetime = Field(default_factory=datetime.utcnow)
+
+def _day_year_month_default(context):
+    d = context.get_current_parameters()["day"]
+    return d.year * 100 + d.month
+
+class DailyRollup(SQLModel, table=True):
+    """Per-client, per-day totals over Transaction, updated on every insert (finest time-series tier)."""
+    __table_args__ = (
+        # All-clients time series over a date range
+        Index("ix_dailyrollup_day", "day"),
+    )
+    client_id: int = Field(primary_key=True, foreign_key="client.client_id")
+    day: date = Field(primary_key=True)
+    # YYYYMM of day, filled at insert time
+    year_month: Optional[int] = Field(default=None, sa_column_kwargs={"default": _day_year_month_default})
+    income: float = Field(default=0.0)            # sum of amounts >= 0
+    expense: float = Field(default=0.0)           # sum of negative amounts (signed)
+    net: float = Field(default=0.0)
+    transaction_count: int = Field(default=0)
+
+class MonthlyRollup(SQLModel, table=True):
+    """Per-client, per-month totals over Transaction, updated on every insert."""
+    client_id: int = Field(primary_key=True, foreign_key="client.client_id")
+    year: int = Field(primary_key=True)
+    month: int = Field(primary_key=True)
+    income: float = Field(default=0.0)            # sum of amounts >= 0
+    expense: float = Field(default=0.0)           # sum of negative amounts (signed)
+    net: float = Field(default=0.0)
+    transaction_count: int = Field(default=0)
+
+class YearlyRollup(SQLModel, table=True):
+    """Per-client, per-year totals over Transaction, updated on every insert."""
+    client_id: int = Field(primary_key=True, foreign_key="client.client_id")
+    year: int = Field(primary_key=True)
+    income: float = Field(default=0.0)            # sum of amounts >= 0
+    expense: float = Field(default=0.0)           # sum of negative amounts (signed)
+    net: float = Field(default=0.0)
+    transaction_count: int = Field(default=0)
+
+# Time-series tiers, finest first: rollup model -> primary key columns
+PERIOD_ROLLUPS = {
+    DailyRollup: ("client_id", "day"),
+    MonthlyRollup: ("client_id", "year", "month"),
+    YearlyRollup: ("client_id", "year"),
+}
+
+
+def _period_keys(client_id: int, d: date):
+    """(rollup model, primary key) of every PERIOD_ROLLUPS row a transaction of `d` falls in."""
+    return (
+        (DailyRollup, (client_id, d)),
+        (MonthlyRollup, (client_id, d.year, d.month)),
+        (YearlyRollup, (client_id, d.year)),
+    )
+
+class BalanceSnapshot(SQLModel, table=True):
+    """
+    Sum of a client's transactions dated up to as_of (balance: Client.solde_initial
+    plus amount_total). Written by compact_balance_snapshots, shifted on backdated inserts.
+    """
+    client_id: int = Field(primary_key=True, foreign_key="client.client_id")
+    as_of: date = Field(primary_key=True)
+    amount_total: float = Field(default=0.0)
+    transaction_count: int = Field(default=0)
+
+# CategoryRollup.client_id of the bank-wide rows
+ALL_CLIENTS = 0
+
+class CategoryRollup(SQLModel, table=True):
+    """
+    Per-client (and bank-wide, client_id = ALL_CLIENTS), per-month, per-category
+    running statistics over Transaction, updated on every insert.
+    """
+    client_id: int = Field(primary_key=True)
+    year_month: int = Field(primary_key=True)     # YYYYMM
+    categorie: str = Field(primary_key=True, max_length=150)
+    transaction_count: int = Field(default=0)
+    income: float = Field(default=0.0)            # sum of amounts >= 0
+    expense: float = Field(default=0.0)           # sum of negative amounts (signed)
+    amount_sum_squares: float = Field(default=0.0)
+    digest: bytes = Field(default=b"")            # sketches.TDigest of the amounts
+
+# The CategoryRollup columns folded by _fold_category_amounts
+CATEGORY_STAT_COLUMNS = ("transaction_count", "income", "expense", "amount_sum_squares", "digest")
+
+class IngestionJob(SQLModel, table=True):
+    """Progress of a bulk transaction import, committed with each batch so it can resume."""
+    source: str = Field(primary_key=True)         # absolute path of the imported file
+    rows_read: int = Field(default=0)             # input rows consumed (inserted or rejected)
+    rows_inserted: int = Field(default=0)
+    rows_rejected: int = Field(default=0)
+    finished: bool = Field(default=False)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+sqlite_file_name = os.environ.get("BANK_DB_FILE", "database.db")
 sqlite_url = f"sqlite:///{sqlite_file_name}"
-connect_args = {"check_same_thread": False}
-engine = create_engine(sqlite_url, connect_args=connect_args, echo=True)
+# Engine options and PRAGMAs come from the storage profile (BANK_STORAGE_PROFILE)
+storage_profile = get_profile()
+engine = make_engine(sqlite_file_name, storage_profile)
+# Clients and their rows (logins, transactions, rollups, credit requests) are
+# hash-partitioned over BANK_SHARDS files. Shard 0 is the main file, which
+# also holds the administrators and the ingestion jobs.
+SHARD_COUNT = get_shard_count()
+shard_engines = [engine] + [
+    make_engine(shard_file_name(sqlite_file_name, shard), storage_profile) for shard in range(1, SHARD_COUNT)
+]
+
+
+def shard_of(client_id: int) -> int:
+    """Shard holding a client's rows (client ids are integers, so the hash is a modulo)."""
+    return client_id % SHARD_COUNT
+
+
+def engine_for(client_id: int):
+    return shard_engines[shard_of(client_id)]
+
 
 def create_db_and_table():
-    SQLModel.metadata.create_all(engine)
+    """Create or migrate the schema of every shard (see migrate)."""
+    for bind in shard_engines:
+        migrate(bind)
+
+
+def _migrate_unversioned(conn):
+    """
+    Databases from before schema versioning: create the missing tables, add
+    the columns and indexes that create_all doesn't add to existing tables,
+    and backfill the summary tables from the transactions (the flush hooks
+    only keep them up to date from here on).
+    """
+    SQLModel.metadata.create_all(conn)
+    table = Transaction.__table__
+    columns = {c["name"] for c in inspect(conn).get_columns(table.name)}
+    if "year_month" not in columns:
+        conn.exec_driver_sql('ALTER TABLE "transaction" ADD COLUMN year_month INTEGER')
+        conn.exec_driver_sql(
+            'UPDATE "transaction" SET year_month = CAST(strftime(\'%Y%m\', date_transaction) AS INTEGER)'
+        )
+    # Index names straight from sqlite_master: reflection skips expression indexes
+    existing = {row[0] for row in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    for indexed_table in (table, CreditRequest.__table__, Client.__table__):
+        for index in indexed_table.indexes:
+            if index.name not in existing:
+                index.create(conn)
+    if conn.exec_driver_sql('SELECT 1 FROM "transaction" LIMIT 1').first() is not None:
+        # In the migration's transaction; the tiers build on each other
+        rebuild_client_summaries(conn)
+        rebuild_daily_rollups(conn)
+        rebuild_monthly_rollups(conn)
+        rebuild_yearly_rollups(conn)
+        rebuild_balance_snapshots(conn)
+        rebuild_category_rollups(conn)
+
+
+def _add_client_score(conn):
+    """Version 2: the ClientScore table (filled by score_jobs.py)."""
+    ClientScore.__table__.create(conn, checkfirst=True)
+
+
+# Schema migrations: MIGRATIONS[k] takes a database from version k to k + 1
+# (the version is SQLite's PRAGMA user_version). Append one whenever the
+# models change; empty files are created from the models at the latest version.
+MIGRATIONS = [
+    _migrate_unversioned,
+    _add_client_score,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def _schema_version(conn) -> int:
+    return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def migrate(bind=None) -> int:
+    """
+    Bring one shard's schema (the main file by default) up to SCHEMA_VERSION
+    and return the number of migrations applied. A current database costs one
+    PRAGMA read, without any reflection.
+    """
+    bind = bind or engine
+    with bind.connect() as conn:
+        if _schema_version(conn) == SCHEMA_VERSION:
+            return 0
+    with bind.begin() as conn:
+        # Write lock first: a concurrent process (another worker) waits here,
+        # then finds the schema migrated
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+        version = _schema_version(conn)
+        if version > SCHEMA_VERSION:
+            raise RuntimeError(f"Database schema version {version} is newer than this code ({SCHEMA_VERSION})")
+        if version == 0 and conn.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE type = 'table'").first() is None:
+            SQLModel.metadata.create_all(conn)
+            applied = 0
+        else:
+            for migration in MIGRATIONS[version:]:
+                migration(conn)
+            applied = SCHEMA_VERSION - version
+        conn.exec_driver_sql(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        return applied
 
 def reset_db():
-    """Drop and recreate all tables (for development/seeding)."""
-    SQLModel.metadata.drop_all(engine)
-    SQLModel.metadata.create_all(engine)
+    """Drop and recreate all tables on every shard (for development/seeding)."""
+    for bind in shard_engines:
+        SQLModel.metadata.drop_all(bind)
+        with bind.begin() as conn:
+            conn.exec_driver_sql("PRAGMA user_version = 0")
+        migrate(bind)
+
+
+def _add_listener(listeners: list, callback):
+    """
+    Register callback in listeners and return a function that removes it. A
+    bound method is held weakly and unregistered when its object is collected,
+    so the listeners of an app built by create_app go away with it instead of
+    piling up.
+    """
+    def remove(_=None):
+        try:
+            listeners.remove(ref)
+        except ValueError:
+            pass
+
+    if isinstance(callback, types.MethodType):
+        ref = weakref.WeakMethod(callback, remove)
+    else:
+        def ref():
+            return callback
+    listeners.append(ref)
+    return remove
+
+
+def _call_listeners(listeners: list, changed) -> None:
+    for ref in list(listeners):
+        callback = ref()
+        if callback is not None:
+            callback(changed)
+
+
+# Callbacks called with the set of client ids whose transactions changed, once
+# the change is committed (used to invalidate in-process caches).
+_transaction_listeners = []
+
+
+def add_transaction_listener(callback):
+    """Call callback(client_ids) after each commit that changed transactions; returns its remover."""
+    return _add_listener(_transaction_listeners, callback)
+
+
+def _mark_clients_changed(session, client_ids):
+    session.info.setdefault("changed_clients", set()).update(client_ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _notify_transaction_listeners(session):
+    changed = session.info.pop("changed_clients", None)
+    if changed:
+        _call_listeners(_transaction_listeners, changed)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_clients(session):
+    session.info.pop("changed_clients", None)
+    session.info.pop("changed_profiles", None)
+
+
+# Callbacks called with the set of ("client" | "admin", id) whose profile row
+# was updated or deleted, once committed (used to drop cached profiles).
+_profile_listeners = []
+
+
+def add_profile_listener(callback):
+    """Call callback(profile keys) after each commit that changed profiles; returns its remover."""
+    return _add_listener(_profile_listeners, callback)
+
+
+@event.listens_for(Session, "before_flush")
+def _track_profile_changes(session, flush_context, instances):
+    changed = set()
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Client) and obj.client_id is not None:
+            changed.add(("client", obj.client_id))
+        elif isinstance(obj, Administrateur) and obj.id is not None:
+            changed.add(("admin", obj.id))
+    if changed:
+        session.info.setdefault("changed_profiles", set()).update(changed)
+
+
+@event.listens_for(Session, "after_commit")
+def _notify_profile_listeners(session):
+    changed = session.info.pop("changed_profiles", None)
+    if changed:
+        _call_listeners(_profile_listeners, changed)
+
+
+def _hold_write_lock(session) -> None:
+    """
+    Give the session's transaction SQLite's write lock before a read-modify-write
+    of the summary tables: BEGIN IMMEDIATE, unless the transaction has already
+    written (and so holds the lock). A concurrent writer then waits (busy_timeout)
+    until this one commits, instead of reading the same rows and overwriting its
+    increments.
+    """
+    connection = session.connection()
+    if not connection.connection.driver_connection.in_transaction:
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+@event.listens_for(Session, "before_flush")
+def _update_client_summaries(session, flush_context, instances):
+    """Fold every pending Transaction into its ClientSummary and daily / monthly / yearly rollup rows."""
+    rows = [
+        {"id_client": obj.id_client, "date_transaction": obj.date_transaction, "montant": obj.montant}
+        for obj in session.new if isinstance(obj, Transaction)
+    ]
+    if not rows:
+        return
+    _hold_write_lock(session)
+    _fold_transaction_totals(session, rows)
+
+
+@event.listens_for(Session, "before_flush")
+def _update_category_rollups(session, flush_context, instances):
+    """Fold every pending Transaction into its client's and the bank-wide CategoryRollup rows."""
+    rows = [
+        {"id_client": obj.id_client, "date_transaction": obj.date_transaction,
+         "montant": obj.montant, "categorie": obj.categorie}
+        for obj in session.new if isinstance(obj, Transaction)
+    ]
+    if rows:
+        _hold_write_lock(session)
+        _upsert_category_rollups(session, rows)
+
+
+@event.listens_for(Session, "before_flush")
+def _update_balance_snapshots(session, flush_context, instances):
+    """Add pending transactions dated on or before a client's snapshots to those snapshots."""
+    deltas = {}
+    for obj in session.new:
+        if isinstance(obj, Transaction):
+            delta = deltas.setdefault((obj.id_client, obj.date_transaction), [0.0, 0])
+            delta[0] += float(obj.montant or 0)
+            delta[1] += 1
+    if deltas:
+        _shift_balance_snapshots(session, deltas)
+
+
+def _shift_balance_snapshots(session, deltas):
+    """
+    Keep BalanceSnapshot exact when transactions are inserted: `deltas` maps
+    (client_id, day) to [amount, count] and is added to every snapshot of the
+    client taken on or after that day. Usually none is (snapshots are of past days).
+    """
+    latest = dict(session.execute(
+        select(BalanceSnapshot.client_id, func.max(BalanceSnapshot.as_of))
+        .where(BalanceSnapshot.client_id.in_({client_id for client_id, _ in deltas}))
+        .group_by(BalanceSnapshot.client_id)
+    ).all())
+    backdated = [
+        {"b_client_id": client_id, "b_day": day, "b_amount": amount, "b_count": count}
+        for (client_id, day), (amount, count) in deltas.items()
+        if client_id in latest and day <= latest[client_id]
+    ]
+    if not backdated:
+        return
+    table = BalanceSnapshot.__table__
+    session.execute(
+        update(table)
+        .where(table.c.client_id == bindparam("b_client_id"), table.c.as_of >= bindparam("b_day"))
+        .values(
+            amount_total=table.c.amount_total + bindparam("b_amount"),
+            transaction_count=table.c.transaction_count + bindparam("b_count"),
+        ),
+        backdated,
+    )
+
+
+def _category_rollup_stats(row) -> RunningStats:
+    """RunningStats of a CategoryRollup row mapping."""
+    return RunningStats(row["transaction_count"], row["income"] + row["expense"],
+                        row["amount_sum_squares"], TDigest.from_bytes(row["digest"]))
+
+
+def _fold_category_amounts(current, amounts) -> dict:
+    """
+    CATEGORY_STAT_COLUMNS values after adding `amounts` to `current` (a row
+    mapping, or None for a new row). Works on plain values: building ORM
+    objects would dominate bulk inserts.
+    """
+    if current is None:
+        stats, income, expense = RunningStats(), 0.0, 0.0
+    else:
+        stats, income, expense = _category_rollup_stats(current), current["income"], current["expense"]
+    stats.update(amounts)
+    return {
+        "transaction_count": stats.count,
+        "income": income + sum(a for a in amounts if a >= 0),
+        "expense": expense + sum(a for a in amounts if a < 0),
+        "amount_sum_squares": stats.sum_squares,
+        "digest": stats.digest.to_bytes(),
+    }
+
+
+# The rebuild_* / check_* / compact helpers below work on one shard (bind, the
+# main file by default); the command line runs them on every shard. A bind that
+# is a Connection already in a transaction (a migration) is joined: their
+# commit leaves that transaction to its owner.
+def rebuild_client_summaries(bind=None):
+    """Recompute ClientSummary from scratch (backfill after upgrade or repair)."""
+    stmt = select(
+        Transaction.id_client,
+        func.sum(case((Transaction.montant > 0, Transaction.montant), else_=0)),
+        func.sum(case((Transaction.montant < 0, Transaction.montant), else_=0)),
+        func.sum(Transaction.montant),
+        func.count(Transaction.id_transaction),
+        func.count(func.distinct(Transaction.year_month)),
+    ).group_by(Transaction.id_client)
+    with Session(bind or engine) as session:
+        rows = session.exec(stmt).all()
+        session.exec(delete(ClientSummary))
+        for client_id, income, expense, total, count, months in rows:
+            session.add(ClientSummary(
+                client_id=client_id,
+                income_total=float(income or 0),
+                expense_total=float(expense or 0),
+                amount_total=float(total or 0),
+                transaction_count=int(count),
+                month_count=int(months),
+            ))
+        session.commit()
+        return len(rows)
+
+
+def _rebuild_period_rollups(model, source_stmt, bind=None) -> int:
+    """Replace the rows of a PERIOD_ROLLUPS table by those of source_stmt (one INSERT ... SELECT)."""
+    columns = [*PERIOD_ROLLUPS[model], "income", "expense", "net", "transaction_count"]
+    if model is DailyRollup:
+        columns.append("year_month")
+    with Session(bind or engine) as session:
+        session.exec(delete(model))
+        result = session.execute(insert(model.__table__).from_select(columns, source_stmt))
+        session.commit()
+        return result.rowcount
+
+
+def rebuild_daily_rollups(bind=None):
+    """Recompute DailyRollup from the raw transactions (backfill after upgrade or repair)."""
+    return _rebuild_period_rollups(DailyRollup, select(
+        Transaction.id_client,
+        Transaction.date_transaction,
+        func.sum(case((Transaction.montant >= 0, Transaction.montant), else_=0)),
+        func.sum(case((Transaction.montant < 0, Transaction.montant), else_=0)),
+        func.sum(Transaction.montant),
+        func.count(Transaction.id_transaction),
+        func.min(Transaction.year_month),
+    ).group_by(Transaction.id_client, Transaction.date_transaction), bind)
+
+
+def rebuild_monthly_rollups(bind=None):
+    """Recompute MonthlyRollup from DailyRollup (rebuild the daily tier first)."""
+    return _rebuild_period_rollups(MonthlyRollup, select(
+        DailyRollup.client_id,
+        DailyRollup.year_month // 100,
+        DailyRollup.year_month % 100,
+        func.sum(DailyRollup.income),
+        func.sum(DailyRollup.expense),
+        func.sum(DailyRollup.net),
+        func.sum(DailyRollup.transaction_count),
+    ).group_by(DailyRollup.client_id, DailyRollup.year_month), bind)
+
+
+def rebuild_yearly_rollups(bind=None):
+    """Recompute YearlyRollup from MonthlyRollup (rebuild the monthly tier first)."""
+    return _rebuild_period_rollups(YearlyRollup, select(
+        MonthlyRollup.client_id,
+        MonthlyRollup.year,
+        func.sum(MonthlyRollup.income),
+        func.sum(MonthlyRollup.expense),
+        func.sum(MonthlyRollup.net),
+        func.sum(MonthlyRollup.transaction_count),
+    ).group_by(MonthlyRollup.client_id, MonthlyRollup.year), bind)
+
+
+def rebuild_category_rollups(bind=None):
+    """Recompute CategoryRollup from scratch (backfill after upgrade or repair)."""
+    stmt = select(
+        Transaction.id_client, Transaction.year_month, Transaction.categorie, Transaction.montant
+    ).order_by(Transaction.id_client, Transaction.year_month, Transaction.categorie)
+    table = CategoryRollup.__table__
+    bank_wide = {}   # (year_month, categorie) -> amounts, folded once at the end
+    n_rows = 0
+    with Session(bind or engine) as session:
+        session.exec(delete(CategoryRollup))
+        batch = []
+        # Transactions come sorted by key: each client x month x category is folded once
+        result = session.exec(stmt.execution_options(yield_per=5000))
+        for key, group in groupby(result, key=lambda row: tuple(row[:3])):
+            amounts = [float(row[3] or 0) for row in group]
+            batch.append({"client_id": key[0], "year_month": key[1], "categorie": key[2],
+                          **_fold_category_amounts(None, amounts)})
+            bank_wide.setdefault(key[1:], []).extend(amounts)
+            if len(batch) >= 5000:
+                session.execute(insert(table), batch)
+                n_rows += len(batch)
+                batch = []
+        for (year_month, categorie), amounts in bank_wide.items():
+            batch.append({"client_id": ALL_CLIENTS, "year_month": year_month, "categorie": categorie,
+                          **_fold_category_amounts(None, amounts)})
+        if batch:
+            session.execute(insert(table), batch)
+            n_rows += len(batch)
+        session.commit()
+        return n_rows
+
+
+def check_category_rollups(bind=None):
+    """Compare CategoryRollup counts and sums with the raw transactions; return the keys that differ."""
+    per_client = select(
+        Transaction.id_client, Transaction.year_month, Transaction.categorie,
+        func.sum(Transaction.montant), func.count(Transaction.id_transaction),
+    ).group_by(Transaction.id_client, Transaction.year_month, Transaction.categorie)
+    bank_wide = select(
+        Transaction.year_month, Transaction.categorie,
+        func.sum(Transaction.montant), func.count(Transaction.id_transaction),
+    ).group_by(Transaction.year_month, Transaction.categorie)
+    with Session(bind or engine) as session:
+        expected = {tuple(r[:3]): r[3:] for r in session.exec(per_client).all()}
+        expected.update({(ALL_CLIENTS, *r[:2]): r[2:] for r in session.exec(bank_wide).all()})
+        stored = {
+            (r.client_id, r.year_month, r.categorie): r
+            for r in session.exec(select(CategoryRollup)).all()
+        }
+
+    mismatches = []
+    for key in sorted(set(expected) | set(stored)):
+        rollup = stored.get(key)
+        total, count = expected.get(key, (0, 0))
+        if (
+            rollup is None
+            or abs(rollup.income + rollup.expense - float(total or 0)) > 1e-6 * max(1.0, abs(float(total or 0)))
+            or rollup.transaction_count != count
+            or TDigest.from_bytes(rollup.digest).count != count
+        ):
+            mismatches.append(key)
+    return mismatches
+
+
+def _check_period_rollups(model, raw_keys, bind=None) -> list:
+    """Compare a PERIOD_ROLLUPS table with the raw transactions grouped by raw_keys; return the keys that differ."""
+    table = model.__table__
+    stmt = select(
+        *raw_keys,
+        func.sum(Transaction.montant),
+        func.count(Transaction.id_transaction),
+    ).group_by(*raw_keys)
+    stored_stmt = select(
+        *(table.c[name] for name in PERIOD_ROLLUPS[model]), table.c.net, table.c.transaction_count
+    )
+    with Session(bind or engine) as session:
+        expected = {tuple(r[:-2]): r[-2:] for r in session.exec(stmt).all()}
+        stored = {tuple(r[:-2]): r[-2:] for r in session.exec(stored_stmt).all()}
+
+    mismatches = []
+    for key in sorted(set(expected) | set(stored)):
+        rollup = stored.get(key)
+        net, count = expected.get(key, (0, 0))
+        if (
+            rollup is None
+            or abs(rollup[0] - float(net or 0)) > 1e-6
+            or rollup[1] != count
+        ):
+            mismatches.append(key)
+    return mismatches
+
+
+def check_daily_rollups(bind=None):
+    """Compare DailyRollup with the raw transactions; return the (client, day) keys that differ."""
+    return _check_period_rollups(DailyRollup, (Transaction.id_client, Transaction.date_transaction), bind)
+
+
+def check_monthly_rollups(bind=None):
+    """Compare MonthlyRollup with the raw transactions; return the (client, year, month) keys that differ."""
+    return _check_period_rollups(
+        MonthlyRollup, (Transaction.id_client, Transaction.year_month // 100, Transaction.year_month % 100), bind
+    )
+
+
+def check_yearly_rollups(bind=None):
+    """Compare YearlyRollup with the raw transactions; return the (client, year) keys that differ."""
+    return _check_period_rollups(YearlyRollup, (Transaction.id_client, Transaction.year_month // 100), bind)
+
+
+def check_client_summaries(bind=None):
+    """Compare ClientSummary with the raw transactions; return the client ids that differ."""
+    stmt = select(
+        Transaction.id_client,
+        func.sum(case((Transaction.montant > 0, Transaction.montant), else_=0)),
+        func.sum(case((Transaction.montant < 0, Transaction.montant), else_=0)),
+        func.count(Transaction.id_transaction),
+        func.count(func.distinct(Transaction.year_month)),
+    ).group_by(Transaction.id_client)
+    with Session(bind or engine) as session:
+        expected = {row[0]: row[1:] for row in session.exec(stmt).all()}
+        stored = {s.client_id: s for s in session.exec(select(ClientSummary)).all()}
+
+    mismatches = []
+    for client_id in sorted(set(expected) | set(stored)):
+        summary = stored.get(client_id)
+        income, expense, count, months = expected.get(client_id, (0, 0, 0, 0))
+        if (
+            summary is None
+            or abs(summary.income_total - float(income or 0)) > 1e-6
+            or abs(summary.expense_total - float(expense or 0)) > 1e-6
+            or summary.transaction_count != count
+            or summary.month_count != months
+        ):
+            mismatches.append(client_id)
+    return mismatches
+
+
+def _balance_parts(client_id_column, as_of: Optional[date]):
+    """
+    Correlated (snapshot amount, snapshot count, tail amount, tail count) of the
+    client in client_id_column at the end of as_of (None: today and later): its
+    latest snapshot up to as_of, then the DailyRollup rows after that snapshot.
+    """
+    snapshots = BalanceSnapshot.__table__.alias("latest_snapshot")
+    latest = select(func.max(snapshots.c.as_of)).where(snapshots.c.client_id == client_id_column)
+    if as_of is not None:
+        latest = latest.where(snapshots.c.as_of <= as_of)
+    latest = latest.correlate_except(snapshots).scalar_subquery()
+
+    tail = [DailyRollup.client_id == client_id_column, DailyRollup.day > func.coalesce(latest, date.min)]
+    if as_of is not None:
+        tail.append(DailyRollup.day <= as_of)
+
+    def snapshot(column):
+        return select(column).where(
+            BalanceSnapshot.client_id == client_id_column, BalanceSnapshot.as_of == latest
+        ).correlate_except(BalanceSnapshot).scalar_subquery()
+
+    def tail_sum(column):
+        return select(func.sum(column)).where(*tail).correlate_except(DailyRollup).scalar_subquery()
+
+    return (
+        func.coalesce(snapshot(BalanceSnapshot.amount_total), 0.0),
+        func.coalesce(snapshot(BalanceSnapshot.transaction_count), 0),
+        func.coalesce(tail_sum(DailyRollup.net), 0.0),
+        func.coalesce(tail_sum(DailyRollup.transaction_count), 0),
+    )
+
+
+def client_balance(as_of: Optional[date] = None):
+    """
+    SQL expression for the balance of each selected Client at the end of as_of
+    (current balance by default): solde_initial, plus the latest BalanceSnapshot,
+    plus the few daily rollup rows after it.
+    """
+    snapshot_amount, _, tail_amount, _ = _balance_parts(Client.client_id, as_of)
+    return (Client.solde_initial + snapshot_amount + tail_amount).label("balance")
+
+
+def compact_balance_snapshots(as_of: Optional[date] = None, bind=None) -> int:
+    """
+    Roll each client's tail up to as_of (default: the end of last month) into a
+    new snapshot dated as_of. Clients without transactions since their latest
+    snapshot are skipped, so running it again is a no-op. Returns the number of
+    snapshots written.
+    """
+    if as_of is None:
+        as_of = date.today().replace(day=1) - timedelta(days=1)
+    snapshot_amount, snapshot_count, tail_amount, tail_count = _balance_parts(Client.client_id, as_of)
+    source = select(
+        Client.client_id,
+        literal(as_of, BalanceSnapshot.__table__.c.as_of.type),
+        snapshot_amount + tail_amount,
+        snapshot_count + tail_count,
+    ).where(tail_count > 0)
+    with Session(bind or engine) as session:
+        result = session.execute(insert(BalanceSnapshot.__table__).from_select(
+            ["client_id", "as_of", "amount_total", "transaction_count"], source
+        ))
+        session.commit()
+        return result.rowcount
+
+
+def rebuild_balance_snapshots(bind=None):
+    """Recompute every existing BalanceSnapshot from DailyRollup (rebuild the daily tier first)."""
+    table = BalanceSnapshot.__table__
+    before = [DailyRollup.client_id == table.c.client_id, DailyRollup.day <= table.c.as_of]
+    with Session(bind or engine) as session:
+        result = session.execute(update(table).values(
+            amount_total=func.coalesce(select(func.sum(DailyRollup.net)).where(*before).scalar_subquery(), 0.0),
+            transaction_count=func.coalesce(
+                select(func.sum(DailyRollup.transaction_count)).where(*before).scalar_subquery(), 0
+            ),
+        ))
+        session.commit()
+        return result.rowcount
+
+
+def check_balance_snapshots(bind=None):
+    """Compare BalanceSnapshot with the raw transactions; return the (client, as_of) keys that differ."""
+    snapshot = BalanceSnapshot.__table__
+    stmt = (
+        select(
+            snapshot.c.client_id,
+            snapshot.c.as_of,
+            snapshot.c.amount_total,
+            snapshot.c.transaction_count,
+            func.sum(Transaction.montant),
+            func.count(Transaction.id_transaction),
+        )
+        .select_from(snapshot)
+        .outerjoin(Transaction, (Transaction.id_client == snapshot.c.client_id)
+                   & (Transaction.date_transaction <= snapshot.c.as_of))
+        .group_by(snapshot.c.client_id, snapshot.c.as_of)
+    )
+    with Session(bind or engine) as session:
+        rows = session.exec(stmt).all()
+    return [
+        (client_id, as_of)
+        for client_id, as_of, amount, count, expected_amount, expected_count in rows
+        if abs(amount - float(expected_amount or 0)) > 1e-6 or count != expected_count
+    ]
 
 
 def add_admin(nom: str, prenom:str, mot__de__passe: str, email: str,role:str):
@@ -91,10 +857,20 @@ def add_admin(nom: str, prenom:str, mot__de__passe: str, email: str,role:str):
         session.commit()
         # session.refresh(new_admin)
 
+def _next_client_id() -> int:
+    """Client ids are allocated across all shards, since the id decides which shard holds the client."""
+    top = 0
+    for bind in shard_engines:
+        with Session(bind) as session:
+            top = max(top, session.exec(select(func.max(Client.client_id))).one() or 0)
+    return top + 1
+
 def add_client(nom:str, prenom:str, date_naissance:date, email:str, telephone:str, adresse:str, 
                profession:str,solde_initial:int,IBAN:str, RIB:str, numero_compte:str, numero_carte:str, date_expiration:str, cryptogramme:int):
-    with Session(engine) as session: 
+    client_id = _next_client_id()
+    with Session(engine_for(client_id)) as session: 
         new_client=Client(
+        client_id=client_id,
         nom=nom,
         prenom=prenom,
         date_naissance=date_naissance,
@@ -115,7 +891,7 @@ def add_client(nom:str, prenom:str, date_naissance:date, email:str, telephone:st
         # session.refresh(new_client)
 
 def add_transaction( id_client:int, nom_transaction:str, date_transaction:date, type_transaction:str, categorie:str,montant:int):
-     with Session(engine) as session: 
+     with Session(engine_for(id_client)) as session: 
         new_trans=Transaction(
             id_client=id_client,
             nom_transaction=nom_transaction,
@@ -127,6 +903,166 @@ def add_transaction( id_client:int, nom_transaction:str, date_transaction:date,
         session.add(new_trans)
         session.commit()
     
+def _upsert_client_summaries(session, summaries) -> None:
+    """
+    Add per-client deltas (client_id -> [income, expense, total, count, new
+    months]) to ClientSummary in SQL (col = col + excluded.col), so concurrent
+    writers can't overwrite each other's increments.
+    """
+    summary_table = ClientSummary.__table__
+    stmt = sqlite_insert(summary_table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[summary_table.c.client_id],
+        set_={
+            name: summary_table.c[name] + stmt.excluded[name]
+            for name in ("income_total", "expense_total", "amount_total", "transaction_count", "month_count")
+        },
+    )
+    session.execute(stmt, [
+        {
+            "client_id": client_id,
+            "income_total": income,
+            "expense_total": expense,
+            "amount_total": total,
+            "transaction_count": count,
+            "month_count": months,
+        }
+        for client_id, (income, expense, total, count, months) in summaries.items()
+    ])
+
+
+def _fold_transaction_totals(session, rows) -> dict:
+    """
+    Add transaction rows (dicts with id_client, date_transaction, montant) to
+    ClientSummary and the daily / monthly / yearly rollups, in SQL
+    (col = col + excluded.col). The caller's transaction must hold the write
+    lock (_hold_write_lock, or a write already made): the months read as new
+    must still be new when the rollups are upserted. Returns the per-tier
+    deltas: PERIOD_ROLLUPS model -> key -> [income, expense, net, count].
+    """
+    summaries = {}
+    rollups = {model: {} for model in PERIOD_ROLLUPS}
+    for row in rows:
+        montant = float(row["montant"] or 0)
+        s = summaries.setdefault(row["id_client"], [0.0, 0.0, 0.0, 0, 0])
+        s[2] += montant
+        s[3] += 1
+        if montant > 0:
+            s[0] += montant
+        elif montant < 0:
+            s[1] += montant
+        for model, key in _period_keys(row["id_client"], row["date_transaction"]):
+            r = rollups[model].setdefault(key, [0.0, 0.0, 0.0, 0])
+            r[2] += montant
+            r[3] += 1
+            if montant >= 0:
+                r[0] += montant
+            else:
+                r[1] += montant
+
+    for key in _new_months(session, rollups[MonthlyRollup]):
+        summaries[key[0]][4] += 1
+
+    _upsert_client_summaries(session, summaries)
+
+    for model, totals in rollups.items():
+        key_names = PERIOD_ROLLUPS[model]
+        rollup_table = model.__table__
+        stmt = sqlite_insert(rollup_table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[rollup_table.c[name] for name in key_names],
+            set_={
+                name: rollup_table.c[name] + stmt.excluded[name]
+                for name in ("income", "expense", "net", "transaction_count")
+            },
+        )
+        session.execute(stmt, [
+            {
+                **dict(zip(key_names, key)),
+                "income": income,
+                "expense": expense,
+                "net": net,
+                "transaction_count": count,
+            }
+            for key, (income, expense, net, count) in totals.items()
+        ])
+    _mark_clients_changed(session, summaries)
+    return rollups
+
+
+def _new_months(session, keys) -> list:
+    """The (client_id, year, month) keys that have no MonthlyRollup row yet (only those keys are read)."""
+    keys = list(keys)
+    existing = set()
+    # Row-value IN, a chunk at a time: each key binds 3 parameters, and SQLite
+    # before 3.32 allows 999 per statement
+    chunk = 999 // 3
+    for start in range(0, len(keys), chunk):
+        existing.update(session.execute(
+            select(MonthlyRollup.client_id, MonthlyRollup.year, MonthlyRollup.month)
+            .where(tuple_(MonthlyRollup.client_id, MonthlyRollup.year, MonthlyRollup.month)
+                   .in_(keys[start:start + chunk]))
+        ).all())
+    return [key for key in keys if key not in existing]
+
+
+def add_transactions_batch(session, rows):
+    """
+    Insert many transactions with a single executemany, then fold them into
+    ClientSummary and the daily / monthly / yearly rollups with set-based
+    upserts (the ORM flush hook does not see Core inserts). `rows` are dicts
+    of Transaction columns; the caller owns the transaction and commits.
+    """
+    if not rows:
+        return
+    session.execute(insert(Transaction.__table__), rows)
+
+    rollups = _fold_transaction_totals(session, rows)
+
+    _shift_balance_snapshots(session, {
+        key: [net, count] for key, (_, _, net, count) in rollups[DailyRollup].items()
+    })
+    _upsert_category_rollups(session, rows)
+
+
+def _upsert_category_rollups(session, rows):
+    """
+    Merge a batch of transaction rows into CategoryRollup (read, fold in Python,
+    upsert). The t-digest can't be merged in SQL, so the caller's transaction
+    must hold the write lock (_hold_write_lock, or a write already made) for
+    the rows read here not to change before they are written back.
+    """
+    values = {}
+    for row in rows:
+        d = row["date_transaction"]
+        year_month = d.year * 100 + d.month
+        for client_id in (row["id_client"], ALL_CLIENTS):
+            values.setdefault((client_id, year_month, row["categorie"]), []).append(float(row["montant"] or 0))
+
+    client_ids = {key[0] for key in values}
+    months = {key[1] for key in values}
+    existing = {
+        (r.client_id, r.year_month, r.categorie): r._mapping
+        for r in session.execute(
+            select(*CategoryRollup.__table__.c)
+            .where(CategoryRollup.client_id.in_(client_ids), CategoryRollup.year_month.in_(months))
+        )
+    }
+    merged = [
+        {"client_id": key[0], "year_month": key[1], "categorie": key[2],
+         **_fold_category_amounts(existing.get(key), amounts)}
+        for key, amounts in values.items()
+    ]
+
+    table = CategoryRollup.__table__
+    stmt = sqlite_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.client_id, table.c.year_month, table.c.categorie],
+        set_={name: stmt.excluded[name] for name in CATEGORY_STAT_COLUMNS},
+    )
+    session.execute(stmt, merged)
+
+
 def main():
     # For development: reset the schema to match the current models
     reset_db()
@@ -229,12 +1165,6 @@ def main():
         # Ajout et commit
         session.add(admin1)
         session.add(admin2)
-        session.add(client1)
-        session.add(client2)
-        session.add(client3)
-        session.add(con_clent1)
-        session.add(con_clent2)
-        session.add(con_clent3)
         session.commit()
         transactions_data =[
             # Client 1
@@ -281,8 +1211,8 @@ def main():
         
 
         random.shuffle(transactions_data)
-        for id_client, nom_transaction, date_transaction, type_transaction, categorie,montant in transactions_data:
-            add_transaction(id_client, nom_transaction, date_transaction, type_transaction, categorie,montant)
+        columns = ("id_client", "nom_transaction", "date_transaction", "type_transaction", "categorie", "montant")
+        transactions = [dict(zip(columns, t)) for t in transactions_data]
 
         # Demandes de crédit initiales (exemple)
         credit_requests_seed = [
@@ -290,12 +1220,76 @@ def main():
             CreditRequest(client_id=2, amount=800_000, duration_months=12, purpose="Crédit à la consommation", status="pending"),
             CreditRequest(client_id=3, amount=5_000_000, duration_months=36, purpose="Achat immobilier", status="rejected"),
         ]
-        session.add_all(credit_requests_seed)
-        session.commit()
+
+        # Each client goes to its shard, with its login, transactions and credit
+        # requests (shards computed up front: committed objects are expired)
+        seed_rows = [
+            (shard_of(row.client_id), row)
+            for row in (client1, client2, client3, con_clent1, con_clent2, con_clent3)
+        ]
+        seed_requests = [(shard_of(r.client_id), r) for r in credit_requests_seed]
+        for shard, bind in enumerate(shard_engines):
+            with Session(bind) as shard_session:
+                shard_session.add_all([row for row_shard, row in seed_rows if row_shard == shard])
+                shard_session.commit()
+                add_transactions_batch(shard_session, [t for t in transactions if shard_of(t["id_client"]) == shard])
+                shard_session.commit()
+                shard_session.add_all([r for r_shard, r in seed_requests if r_shard == shard])
+                shard_session.commit()
 
 
 if __name__ == "__main__":
-    main()
+    command = sys.argv[1] if len(sys.argv) > 1 else "seed"
+    if command == "seed":
+        main()
+    elif command == "migrate":
+        for shard, bind in enumerate(shard_engines):
+            print(f"shard {shard}: {migrate(bind)} migrations applied, schema version {SCHEMA_VERSION}")
+    elif command == "rebuild-summaries":
+        create_db_and_table()
+        # Each time-series tier is rebuilt from the one below it
+        for label, rebuild in (
+            ("client summaries", rebuild_client_summaries),
+            ("daily rollups", rebuild_daily_rollups),
+            ("monthly rollups", rebuild_monthly_rollups),
+            ("yearly rollups", rebuild_yearly_rollups),
+            ("balance snapshots", rebuild_balance_snapshots),
+            ("category rollups", rebuild_category_rollups),
+        ):
+            print(f"{sum(rebuild(bind) for bind in shard_engines)} {label} rebuilt")
+    elif command == "compact-balances":
+        # Periodic job (e.g. monthly cron): python tables__projet.py compact-balances [YYYY-MM-DD]
+        create_db_and_table()
+        as_of = date.fromisoformat(sys.argv[2]) if len(sys.argv) > 2 else None
+        print(f"{sum(compact_balance_snapshots(as_of, bind) for bind in shard_engines)} balance snapshots written")
+    elif command == "check-summaries":
+        # Shards hold disjoint clients, so their mismatch lists just add up
+        # (bank-wide category keys are per-shard partial rollups)
+        mismatches = [m for bind in shard_engines for m in check_client_summaries(bind)]
+        daily_mismatches = [m for bind in shard_engines for m in check_daily_rollups(bind)]
+        rollup_mismatches = [m for bind in shard_engines for m in check_monthly_rollups(bind)]
+        yearly_mismatches = [m for bind in shard_engines for m in check_yearly_rollups(bind)]
+        category_mismatches = [m for bind in shard_engines for m in check_category_rollups(bind)]
+        snapshot_mismatches = [m for bind in shard_engines for m in check_balance_snapshots(bind)]
+        if mismatches:
+            print(f"Out-of-date summaries for clients: {mismatches}")
+        if daily_mismatches:
+            print(f"Out-of-date daily rollups (client, day): {daily_mismatches}")
+        if rollup_mismatches:
+            print(f"Out-of-date monthly rollups (client, year, month): {rollup_mismatches}")
+        if yearly_mismatches:
+            print(f"Out-of-date yearly rollups (client, year): {yearly_mismatches}")
+        if category_mismatches:
+            print(f"Out-of-date category rollups (client, year_month, category): {category_mismatches}")
+        if snapshot_mismatches:
+            print(f"Out-of-date balance snapshots (client, as_of): {snapshot_mismatches}")
+        if (mismatches or daily_mismatches or rollup_mismatches or yearly_mismatches or category_mismatches
+                or snapshot_mismatches):
+            sys.exit(1)
+        print("Client summaries, daily / monthly / yearly and category rollups and balance snapshots are consistent")
+    else:
+        print("Usage: python tables__projet.py [seed|migrate|rebuild-summaries|check-summaries|compact-balances]")
+        sys.exit(2)
    
     
 
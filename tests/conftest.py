@@ -0,0 +1,51 @@
+"""
+Test setup: the suite runs on a scratch SQLite file (BANK_DB_FILE, set before
+tables__projet is imported), never on the repository's database.db.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ["BANK_DB_FILE"] = os.path.join(tempfile.mkdtemp(prefix="bank-tests-"), "test.db")
+
+import datagen  # noqa: E402
+from tables__projet import shard_engines  # noqa: E402
+
+for bind in shard_engines:
+    bind.echo = False
+
+
+@pytest.fixture
+def seed():
+    """seed(n_clients, transactions_per_client): reset the database to a datagen data set."""
+    def load(n_clients: int, transactions_per_client: int = 5) -> dict:
+        return datagen.generate(n_clients, transactions_per_client, verbose=False)
+    return load
+
+
+@pytest.fixture
+def make_app():
+    """A Flask app of create_app() without the background score scheduler (its queries would be counted)."""
+    from app import create_app
+
+    def build():
+        app = create_app()
+        app.config["SCORE_REFRESH_INTERVAL"] = 0
+        return app
+    return build
+
+
+@pytest.fixture
+def admin_client():
+    """admin_client(app): a test client logged in as the datagen administrator."""
+    def login(app):
+        client = app.test_client()
+        response = client.post("/api/auth/login/admin",
+                               json={"email": datagen.ADMIN_EMAIL, "password": datagen.ADMIN_PASSWORD})
+        assert response.status_code == 200, response.get_data(as_text=True)
+        return client
+    return login
@@ -0,0 +1,40 @@
+"""The admin client list runs the same number of SQL statements whatever the number of clients."""
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from tables__projet import shard_engines
+
+
+@contextmanager
+def count_statements():
+    """Collect the SQL statements sent to every shard engine while the block runs."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    for bind in shard_engines:
+        event.listen(bind, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        for bind in shard_engines:
+            event.remove(bind, "before_cursor_execute", record)
+
+
+@pytest.mark.parametrize("query", ["", "?limit=20", "?stream=1"])
+def test_admin_clients_statement_count_is_constant(seed, make_app, admin_client, query):
+    counts = {}
+    for n_clients in (5, 60):
+        seed(n_clients)
+        client = admin_client(make_app())
+        client.get("/health")   # first request: schema check and background services
+        with count_statements() as statements:
+            response = client.get(f"/api/admin/clients{query}")
+            body = response.get_json()
+        assert response.status_code == 200
+        assert len(body["clients"]) == min(n_clients, 20 if "limit" in query else n_clients)
+        counts[n_clients] = len(statements)
+    assert counts[5] == counts[60], counts
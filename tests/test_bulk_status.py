@@ -0,0 +1,68 @@
+"""Bulk credit request status updates report what each shard actually committed."""
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session, select
+
+from tables__projet import CreditRequest, shard_engines
+
+
+def _fail_updates(conn, cursor, statement, parameters, context, executemany):
+    if statement.startswith("UPDATE creditrequest"):
+        raise OperationalError(statement, parameters, Exception("disk I/O error"))
+
+
+def _pending_ids(client, n=None):
+    response = client.get("/api/admin/credit-requests?status=pending&limit=1000")
+    ids = [item["id"] for item in response.get_json()["requests"]][:n]
+    assert n is None or len(ids) == n
+    return ids
+
+
+def test_bulk_status_updates(seed, make_app, admin_client):
+    seed(4)
+    client = admin_client(make_app())
+    ids = _pending_ids(client, 2)
+    response = client.post("/api/admin/credit-requests/bulk-status",
+                           json={"status": "approved", "ids": [*ids, 999999]})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["success"] and body["updated"] == 2
+    assert [r["outcome"] for r in body["results"]] == ["updated", "updated", "not_found"]
+
+    response = client.post("/api/admin/credit-requests/bulk-status",
+                           json={"status": "approved", "ids": ids[:1]})
+    assert [r["outcome"] for r in response.get_json()["results"]] == ["unchanged"]
+
+    pending = _pending_ids(client)
+    response = client.post("/api/admin/credit-requests/bulk-status",
+                           json={"status": "rejected", "filter": {"status": "pending"}})
+    assert sorted(r["id"] for r in response.get_json()["results"]) == sorted(pending)
+    assert _pending_ids(client) == []
+
+
+def _statuses():
+    statuses = []
+    for bind in shard_engines:
+        with Session(bind) as db_session:
+            statuses += db_session.exec(select(CreditRequest.status).order_by(CreditRequest.id)).all()
+    return statuses
+
+
+def test_bulk_status_reports_failed_shards(seed, make_app, admin_client):
+    seed(4)
+    client = admin_client(make_app())
+    before = _statuses()
+    for bind in shard_engines:
+        event.listen(bind, "before_cursor_execute", _fail_updates)
+    try:
+        response = client.post("/api/admin/credit-requests/bulk-status",
+                               json={"status": "approved", "ids": _pending_ids(client, 2)})
+    finally:
+        for bind in shard_engines:
+            event.remove(bind, "before_cursor_execute", _fail_updates)
+
+    assert response.status_code == 500
+    body = response.get_json()
+    assert not body["success"] and body["updated"] == 0 and "error" in body
+    assert [r["outcome"] for r in body["results"]] == ["failed", "failed"]
+    assert _statuses() == before
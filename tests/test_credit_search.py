@@ -0,0 +1,42 @@
+"""Credit request search filters (client name prefix on the lower(nom) / lower(prenom) indexes, amounts)."""
+from sqlmodel import Session, select
+
+from tables__projet import Client, CreditRequest, engine_for
+
+
+def test_credit_request_search_filters(seed, make_app, admin_client):
+    seed(3)
+    with Session(engine_for(2)) as db_session:
+        db_session.get(Client, 2).prenom = "Quillevere"
+        db_session.commit()
+    with Session(engine_for(3)) as db_session:
+        for credit in db_session.exec(select(CreditRequest).where(CreditRequest.client_id == 3)):
+            credit.amount = 10.0 ** 9
+        db_session.commit()
+    client = admin_client(make_app())
+
+    def search(**params):
+        response = client.get("/api/admin/credit-requests", query_string=params)
+        assert response.status_code == 200
+        return response.get_json()["requests"]
+
+    assert {item["clientId"] for item in search(name="quille")} == {2}
+    assert {item["clientId"] for item in search(name="QUILLEVERE")} == {2}
+    assert {item["clientId"] for item in search(min_amount=10 ** 8)} == {3}
+    for status in ("pending", "approved", "rejected"):
+        assert {item["status"] for item in search(status=status)} <= {status}
+
+
+def test_name_filter_folds_ascii_like_sqlite(seed, make_app, admin_client):
+    seed(3)
+    with Session(engine_for(2)) as db_session:
+        client = db_session.get(Client, 2)
+        client.prenom = "Élise"
+        db_session.commit()
+    client = admin_client(make_app())
+
+    for name in ("Élise", "ÉLISE", " Éli "):
+        response = client.get("/api/admin/credit-requests", query_string={"name": name})
+        assert response.status_code == 200
+        requests = response.get_json()["requests"]
+        assert requests and {item["clientId"] for item in requests} == {2}, name
@@ -0,0 +1,16 @@
+"""The dashboard of an admin whose cached profile was dropped, for clients on every shard."""
+import datagen
+
+
+def test_dashboard_reloads_a_dropped_admin_profile(seed, make_app, admin_client):
+    seed(6, 2)
+    app = make_app()
+    client = admin_client(app)
+    store = app.session_interface.store
+    for client_id in range(1, 7):  # clients on every shard, the administrator on the main file
+        store.drop_profiles([("admin", 1)])
+        response = client.get(f"/api/dashboard?client_id={client_id}")
+        assert response.status_code == 200, response.get_data(as_text=True)
+        body = response.get_json()
+        assert body["userType"] == "admin"
+        assert body["user"]["email"] == datagen.ADMIN_EMAIL
@@ -0,0 +1,37 @@
+"""Bulk ingestion resumes, and never inserts a file's rows twice."""
+import pytest
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from ingestion import ingest_transactions
+from tables__projet import Transaction, check_client_summaries, shard_engines
+
+
+def _transaction_count():
+    total = 0
+    for bind in shard_engines:
+        with Session(bind) as db_session:
+            total += db_session.exec(select(func.count(Transaction.id_transaction))).one()
+    return total
+
+
+def test_finished_import_is_not_repeated(seed, tmp_path):
+    seed(3, 2)
+    path = tmp_path / "releve.csv"
+    path.write_text(
+        "id_client,nom_transaction,date_transaction,type_transaction,categorie,montant\n"
+        "1,Salaire,2025-01-31,credit,Revenus,1000\n"
+        "2,Loyer,2025-02-01,debit,Logement,-500\n"
+        "99,Inconnu,2025-02-01,debit,Divers,-1\n"
+    )
+    before = _transaction_count()
+    job = ingest_transactions(str(path), batch_size=2, verbose=False)
+    assert (job.rows_inserted, job.rows_rejected, job.finished) == (2, 1, True)
+    assert _transaction_count() == before + 2
+
+    assert ingest_transactions(str(path), verbose=False).rows_inserted == 2
+    with pytest.raises(ValueError):
+        ingest_transactions(str(path), restart=True, verbose=False)
+    assert _transaction_count() == before + 2
+    for bind in shard_engines:
+        assert check_client_summaries(bind) == []
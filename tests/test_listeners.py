@@ -0,0 +1,35 @@
+"""Commit listeners don't pile up when apps are built and dropped."""
+import gc
+from datetime import date
+
+from sqlmodel import Session
+
+import tables__projet
+from tables__projet import Client, Transaction, add_transaction_listener, engine_for
+
+
+def _listener_counts():
+    gc.collect()
+    return len(tables__projet._transaction_listeners), len(tables__projet._profile_listeners)
+
+
+def test_dropped_apps_release_their_listeners(make_app):
+    make_app()
+    before = _listener_counts()
+    for _ in range(3):
+        make_app()
+    assert _listener_counts() == before
+
+
+def test_remove_transaction_listener(seed):
+    seed(2)
+    calls = []
+    remove = add_transaction_listener(calls.append)
+    with Session(engine_for(1)) as session:
+        client_id = session.get(Client, 1).client_id
+        for day in (date(2025, 1, 2), date(2025, 1, 3)):
+            session.add(Transaction(id_client=client_id, nom_transaction="test", date_transaction=day,
+                                    type_transaction="debit", categorie="test", montant=-1.0))
+            session.commit()
+            remove()
+    assert calls == [{client_id}]
@@ -0,0 +1,27 @@
+"""
+The analytics and credit-request search queries are answered through their
+indexes (the checks of `benchmark.py --explain`, on a small data set).
+"""
+import pytest
+
+import benchmark
+from tables__projet import engine
+
+N_CLIENTS = 20
+
+
+@pytest.fixture(scope="module")
+def seeded():
+    import datagen
+    datagen.generate(N_CLIENTS, 10, verbose=False)
+
+
+@pytest.mark.parametrize(
+    "statements, index",
+    [pytest.param(statements, index, id=name) for name, statements, index in benchmark.query_plan_checks(N_CLIENTS)],
+)
+def test_query_uses_index(seeded, statements, index):
+    with engine.connect() as conn:
+        for stmt in statements:
+            plan = benchmark.query_plan(conn, stmt)
+            assert any(f"USING INDEX {index}" in step for step in plan), plan
@@ -0,0 +1,37 @@
+"""Analytics responses are cached with an ETag and dropped when the client's transactions change."""
+from datetime import date
+
+from sqlalchemy import event
+from sqlmodel import Session
+
+from tables__projet import Transaction, engine_for, shard_engines
+
+
+def test_analytics_cache_etag_and_invalidation(seed, make_app):
+    seed(3)
+    client = make_app().test_client()
+    url = "/api/transactions/monthly?client_id=1"
+    first = client.get(url)
+    assert first.status_code == 200 and first.headers["ETag"]
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    for bind in shard_engines:
+        event.listen(bind, "before_cursor_execute", record)
+    try:
+        not_modified = client.get(url, headers={"If-None-Match": first.headers["ETag"]})
+    finally:
+        for bind in shard_engines:
+            event.remove(bind, "before_cursor_execute", record)
+    assert not_modified.status_code == 304 and statements == []
+
+    with Session(engine_for(1)) as session:
+        session.add(Transaction(id_client=1, nom_transaction="Prime", date_transaction=date(2025, 1, 15),
+                                type_transaction="credit", categorie="Revenus", montant=50.0))
+        session.commit()
+    second = client.get(url, headers={"If-None-Match": first.headers["ETag"]})
+    assert second.status_code == 200
+    assert second.headers["ETag"] != first.headers["ETag"]
@@ -0,0 +1,18 @@
+"""The background score jobs don't run on the thread pool the requests fan out on."""
+import threading
+
+import score_jobs
+from score_jobs import ScoreScheduler
+
+
+def test_score_job_keeps_the_request_pool_free(seed, monkeypatch):
+    seed(6)
+    threads = []
+
+    def recompute(bind, client_ids=None, batch_size=score_jobs.DEFAULT_BATCH_SIZE):
+        threads.append(threading.current_thread().name)
+        return 0
+
+    monkeypatch.setattr(score_jobs, "recompute_scores", recompute)
+    ScoreScheduler().run_job(full=True)
+    assert threads and not any(name.startswith("shard") for name in threads), threads
@@ -0,0 +1,64 @@
+"""
+Server-side sessions: current-user comes from the cached profile until the
+row changes, and logging in issues a new session id (no session fixation).
+"""
+from flask import session
+from sqlalchemy import event
+from sqlmodel import Session
+
+import datagen
+from tables__projet import Administrateur, engine
+
+
+def test_current_user_is_served_from_the_session_store(seed, make_app, admin_client):
+    seed(3)
+    client = admin_client(make_app())
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        response = client.get("/api/auth/current-user")
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    assert response.status_code == 200 and response.get_json()["userType"] == "admin"
+    assert statements == []
+
+    with Session(engine) as db_session:
+        admin = db_session.get(Administrateur, response.get_json()["user"]["id"])
+        admin.nom = "RENAMED"
+        db_session.commit()
+    assert client.get("/api/auth/current-user").get_json()["user"]["name"] == "RENAMED"
+
+
+def _sid(client, app):
+    cookie = client.get_cookie(app.config["SESSION_COOKIE_NAME"])
+    return app.session_interface._signer(app).unsign(cookie.value).decode()
+
+
+def test_login_replaces_the_session_id(seed, make_app):
+    seed(3)
+    app = make_app()
+    store = app.session_interface.store
+
+    # A session created before the login (an id an attacker could have planted)
+    @app.get("/test/visit")
+    def visit():
+        session["visited"] = True
+        return "ok"
+
+    client = app.test_client()
+    client.get("/test/visit")
+    planted = _sid(client, app)
+    assert store.load(planted) is not None
+
+    response = client.post("/api/auth/login/admin", json={"email": datagen.ADMIN_EMAIL, "password": datagen.ADMIN_PASSWORD})
+    assert response.status_code == 200
+    sid = _sid(client, app)
+    assert sid != planted
+    assert store.load(planted) is None
+    assert store.load(sid)["data"]["user_type"] == "admin"
+    assert "visited" not in store.load(sid)["data"]
+    assert client.get("/api/auth/current-user").status_code == 200
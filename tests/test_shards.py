@@ -0,0 +1,23 @@
+"""Global ids and per-shard placement (run with BANK_SHARDS=3 to spread the clients over three files)."""
+from shards import global_id, ids_by_shard, split_global_id
+from tables__projet import SHARD_COUNT, shard_of
+
+
+def test_global_ids_round_trip():
+    gids = [global_id(local_id, shard) for shard in range(SHARD_COUNT) for local_id in range(1, 6)]
+    assert len(set(gids)) == len(gids)
+    for shard in range(SHARD_COUNT):
+        assert split_global_id(global_id(7, shard)) == (shard, 7)
+    assert ids_by_shard(gids) == {shard: [1, 2, 3, 4, 5] for shard in range(SHARD_COUNT)}
+
+
+def test_lists_merge_every_shard(seed, make_app, admin_client):
+    seed(7)
+    client = admin_client(make_app())
+    clients = client.get("/api/admin/clients").get_json()["clients"]
+    assert [item["id"] for item in clients] == list(range(1, 8))
+
+    requests = client.get("/api/admin/credit-requests").get_json()["requests"]
+    assert sorted(item["clientId"] for item in requests) == list(range(1, 8))
+    for item in requests:
+        assert split_global_id(item["id"])[0] == shard_of(item["clientId"])